@@ -395,6 +395,28 @@ class CropImageAnalyzer:
             'error': error_message
         }
 
+def handle_request(request_data, analyzer=None):
+    """
+    Analyze the image named in one request payload ({"imagePath", "question", "language"});
+    analyzer lets a long-running service reuse one CropImageAnalyzer
+    """
+    image_path = request_data.get('imagePath')
+    question = request_data.get('question', '')
+    language = request_data.get('language', 'en')
+    
+    if not image_path or not os.path.exists(image_path):
+        return {
+            'response': 'Image file not found',
+            'confidence': 0.0,
+            'detectedProblems': [],
+            'recommendations': [],
+            'error': 'Image file not found'
+        }
+    
+    # Initialize analyzer and process image
+    analyzer = analyzer or CropImageAnalyzer()
+    return analyzer.analyze_image(image_path, question, language)
+
 def main():
     """
     Main function to process image analysis requests
@@ -404,23 +426,7 @@ def main():
         input_data = sys.stdin.read()
         request_data = json.loads(input_data)
         
-        image_path = request_data.get('imagePath')
-        question = request_data.get('question', '')
-        language = request_data.get('language', 'en')
-        
-        if not image_path or not os.path.exists(image_path):
-            print(json.dumps({
-                'response': 'Image file not found',
-                'confidence': 0.0,
-                'detectedProblems': [],
-                'recommendations': [],
-                'error': 'Image file not found'
-            }))
-            return
-        
-        # Initialize analyzer and process image
-        analyzer = CropImageAnalyzer()
-        result = analyzer.analyze_image(image_path, question, language)
+        result = handle_request(request_data)
         
         # Output result as JSON
         print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Chunk Mode Benchmark
+Compares character chunking with token-budget chunking on the same problems:
+chunk count, tokens per chunk, chunks truncated by the model, embedding time
+and flat index size.
+
+Usage:
+    python benchmark_chunk_modes.py --data "farmer_dataset_part_*.json" --limit 5000
+    python benchmark_chunk_modes.py --chunk-tokens 128 --overlap-tokens 24
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+import farmer_rag_system
+from dataset_loader import ProblemFiles
+from farmer_rag_system import FarmerRAGSystem
+
+def token_counts(rag_system, texts):
+    """Model tokens per text, without special tokens"""
+    tokenizer = rag_system.get_embedding_model().tokenizer
+    return np.array([len(tokenizer(text, add_special_tokens=False)['input_ids']) for text in texts])
+
+def benchmark_mode(rag_system, problems, batch_size):
+    """
+    Chunk and embed the problems in the system's current chunk mode
+    """
+    start = time.perf_counter()
+    chunks = rag_system.process_and_chunk_data(problems)
+    chunk_seconds = time.perf_counter() - start
+    texts = [chunk['text'] for chunk in chunks]
+    tokens = token_counts(rag_system, texts)
+
+    start = time.perf_counter()
+    embeddings = rag_system.embedding_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    embed_seconds = time.perf_counter() - start
+
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    index = farmer_rag_system.faiss.IndexFlatIP(embeddings.shape[1])
+    index.add(embeddings)
+
+    return {
+        "chunks": len(chunks),
+        "tokens_per_chunk_mean": round(float(tokens.mean()), 1) if len(tokens) else 0.0,
+        "tokens_per_chunk_max": int(tokens.max()) if len(tokens) else 0,
+        # Chunks the model silently cuts off at its maximum sequence length
+        "truncated_chunks": int((tokens > rag_system.model_token_budget()).sum()),
+        "chunk_seconds": round(chunk_seconds, 3),
+        "embed_seconds": round(embed_seconds, 3),
+        "index_bytes": int(farmer_rag_system.faiss.serialize_index(index).nbytes)
+    }
+
+def main():
+    """
+    Run both chunk modes and print a comparison
+    """
+    parser = argparse.ArgumentParser(description='Compare character and token-budget chunking')
+    parser.add_argument('--data', default='farmer_dataset_part_*.json', help='dataset files or glob pattern')
+    parser.add_argument('--limit', type=int, default=5000, help='number of problems to use')
+    parser.add_argument('--chunk-size', type=int, default=200, help='character mode chunk size')
+    parser.add_argument('--overlap', type=int, default=50, help='character mode overlap')
+    parser.add_argument('--chunk-tokens', type=int, default=None,
+                        help='token mode budget (default: the model maximum sequence length)')
+    parser.add_argument('--overlap-tokens', type=int, default=32, help='token mode overlap')
+    parser.add_argument('--batch-size', type=int, default=32, help='encode batch size')
+    parser.add_argument('--output', default=None, help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    if not farmer_rag_system.dependencies_available():
+        print("❌ sentence-transformers and faiss are required: pip install sentence-transformers faiss-cpu")
+        sys.exit(1)
+
+    try:
+        problems = list(itertools.islice(ProblemFiles(args.data), args.limit))
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    rag_system = FarmerRAGSystem()
+    rag_system.chunk_size = args.chunk_size
+    rag_system.overlap_size = args.overlap
+    rag_system.get_embedding_model()
+    print(f"📊 {len(problems)} problems, model reads up to {rag_system.model_token_budget()} tokens")
+
+    report = {"problems": len(problems), "modes": {}}
+    for mode in ("characters", "tokens"):
+        rag_system.set_chunk_mode(mode, args.chunk_tokens, args.overlap_tokens)
+        result = benchmark_mode(rag_system, problems, args.batch_size)
+        if mode == "characters":
+            result["chunk_size"], result["overlap"] = args.chunk_size, args.overlap
+        else:
+            result["chunk_tokens"], result["overlap_tokens"] = rag_system.chunk_tokens, args.overlap_tokens
+        report["modes"][mode] = result
+        print(f"  {mode:<10} chunks={result['chunks']}  tokens/chunk={result['tokens_per_chunk_mean']} "
+              f"(max {result['tokens_per_chunk_max']}, {result['truncated_chunks']} truncated)  "
+              f"embed={result['embed_seconds']:.2f} s  index={result['index_bytes'] / 1e6:.1f} MB")
+
+    characters, tokens = report["modes"]["characters"], report["modes"]["tokens"]
+    if characters["chunks"] and characters["embed_seconds"]:
+        print(f"✅ Token mode: {tokens['chunks'] / characters['chunks']:.2f}x chunks, "
+              f"{tokens['embed_seconds'] / characters['embed_seconds']:.2f}x embedding time, "
+              f"{tokens['index_bytes'] / characters['index_bytes']:.2f}x index size")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
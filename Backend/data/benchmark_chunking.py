@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Chunking Benchmark
+Measures FarmerRAGSystem.chunk_text throughput over the dataset part files
+against the original character-scanning chunker, checks that both produce
+the same chunks, and times worst-case inputs.
+
+Usage:
+    python benchmark_chunking.py                                   # farmer_dataset_part_*.json
+    python benchmark_chunking.py --data "data/part_*.json" --chunk-size 200 --overlap 50
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import List
+
+from dataset_loader import ProblemFiles
+from farmer_rag_system import FarmerRAGSystem
+
+def reference_chunk_text(text: str, chunk_size: int = 200, overlap: int = 50) -> List[str]:
+    """
+    The original chunker: scans characters around every boundary
+    """
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end < len(text):
+            for i in range(end - 20, min(end + 20, len(text))):
+                if text[i] in '.!?':
+                    end = i + 1
+                    break
+
+            if end >= len(text):
+                end = len(text)
+            elif not text[end].isspace():
+                while end > start and not text[end].isspace():
+                    end -= 1
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        start = max(start + 1, end - overlap)
+
+        if start >= len(text):
+            break
+
+    return chunks
+
+def time_chunker(chunker, texts, chunk_size, overlap):
+    """
+    Chunk every text; returns the chunks per text, total seconds and the slowest text
+    """
+    results = []
+    total = 0.0
+    worst_seconds, worst_index = 0.0, -1
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        results.append(chunker(text, chunk_size, overlap))
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        if elapsed > worst_seconds:
+            worst_seconds, worst_index = elapsed, i
+    return results, total, worst_seconds, worst_index
+
+def adversarial_texts(length: int):
+    """
+    Inputs that stress boundary search: no whitespace, no sentence ends, and punctuation everywhere
+    """
+    words = "aphid blight rust wilt mildew borer".split()
+    return {
+        "no_whitespace": "x" * length,
+        "no_sentence_end": " ".join(words[i % len(words)] for i in range(length // 6)),
+        "dense_punctuation": "Spray. Water! Why? " * (length // 19)
+    }
+
+def main():
+    """
+    Run the benchmark and print a throughput report
+    """
+    parser = argparse.ArgumentParser(description='Benchmark chunk_text against the original chunker')
+    parser.add_argument('--data', default='farmer_dataset_part_*.json', help='dataset files or glob pattern')
+    parser.add_argument('--chunk-size', type=int, default=200, help='chunk size in characters')
+    parser.add_argument('--overlap', type=int, default=50, help='overlap in characters')
+    parser.add_argument('--worst-case-length', type=int, default=20000,
+                        help='length of the synthetic worst-case texts')
+    parser.add_argument('--output', default=None, help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    try:
+        dataset = ProblemFiles(args.data)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    rag_system = FarmerRAGSystem()
+    chunkers = {"chunk_text": rag_system.chunk_text, "reference": reference_chunk_text}
+    report = {"chunk_size": args.chunk_size, "overlap": args.overlap, "parts": [], "worst_case": []}
+    totals = {name: {"chunks": 0, "seconds": 0.0} for name in chunkers}
+    mismatched = 0
+
+    print(f"📊 Chunking {len(dataset.paths)} files, chunk_size={args.chunk_size}, overlap={args.overlap}")
+    for path in dataset.paths:
+        texts = [f"{problem['problem']} {problem['solution']}" for problem in ProblemFiles([path])]
+        part = {"file": path, "texts": len(texts), "characters": sum(len(text) for text in texts)}
+        outputs = {}
+        for name, chunker in chunkers.items():
+            chunks, seconds, worst_seconds, worst_index = time_chunker(chunker, texts, args.chunk_size, args.overlap)
+            outputs[name] = chunks
+            num_chunks = sum(len(text_chunks) for text_chunks in chunks)
+            totals[name]["chunks"] += num_chunks
+            totals[name]["seconds"] += seconds
+            part[name] = {
+                "chunks": num_chunks,
+                "seconds": round(seconds, 4),
+                "chunks_per_second": round(num_chunks / seconds) if seconds else None,
+                "worst_text_ms": round(worst_seconds * 1000, 3),
+                "worst_text_characters": len(texts[worst_index]) if worst_index >= 0 else 0
+            }
+        part["mismatched_texts"] = sum(a != b for a, b in zip(outputs["chunk_text"], outputs["reference"]))
+        mismatched += part["mismatched_texts"]
+        report["parts"].append(part)
+        print(f"  {path}: {part['chunk_text']['chunks']} chunks  "
+              f"{part['chunk_text']['chunks_per_second']}/s vs {part['reference']['chunks_per_second']}/s reference  "
+              f"worst={part['chunk_text']['worst_text_ms']:.3f} ms  mismatches={part['mismatched_texts']}")
+
+    for name, total in totals.items():
+        total["chunks_per_second"] = round(total["chunks"] / total["seconds"]) if total["seconds"] else None
+    report["totals"] = totals
+    report["mismatched_texts"] = mismatched
+
+    # Synthetic worst cases: chunk count and time for each chunker
+    for case, text in adversarial_texts(args.worst_case_length).items():
+        result = {"case": case, "characters": len(text)}
+        for name, chunker in chunkers.items():
+            start = time.perf_counter()
+            chunks = chunker(text, args.chunk_size, args.overlap)
+            result[name] = {"chunks": len(chunks), "ms": round((time.perf_counter() - start) * 1000, 3)}
+        report["worst_case"].append(result)
+        print(f"  worst case {case:<18} chunk_text: {result['chunk_text']['chunks']} chunks in "
+              f"{result['chunk_text']['ms']:.2f} ms, reference: {result['reference']['chunks']} chunks in "
+              f"{result['reference']['ms']:.2f} ms")
+
+    print(f"✅ chunk_text: {totals['chunk_text']['chunks_per_second']} chunks/s, "
+          f"reference: {totals['reference']['chunks_per_second']} chunks/s, "
+          f"{mismatched} texts chunked differently")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Encoder Backend Benchmark
+Compares the query encoder backends of FarmerRAGSystem against full-precision
+torch: single-query encode latency (p50/p99, as query_to_vector pays it),
+batch throughput, cosine drift of the embeddings, and how many of the torch
+top-k documents each backend still retrieves.
+
+The first onnx_int8 run includes the one-time ONNX export and quantization in
+its load time.
+
+Usage:
+    python benchmark_encoder_backends.py --data "farmer_dataset_part_*.json" --num-queries 500
+    python benchmark_encoder_backends.py --backends torch,onnx_int8 --queries queries.txt --output encoders.json
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import time
+
+import numpy as np
+
+import farmer_rag_system
+from dataset_loader import ProblemFiles
+from farmer_rag_system import ENCODER_BACKENDS, FarmerRAGSystem
+
+def load_texts(data, num_queries, corpus_size, query_file=None):
+    """
+    Queries (from query_file, or each problem's first sentence) and corpus documents
+    """
+    problems = list(itertools.islice(ProblemFiles(data), max(num_queries, corpus_size)))
+    documents = [f"{problem['problem']} {problem['solution']}" for problem in problems[:corpus_size]]
+    if query_file:
+        with open(query_file, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()][:num_queries]
+    else:
+        queries = [problem['problem'].split('. ')[0] for problem in problems[:num_queries]]
+    return queries, documents
+
+def normalized(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def benchmark_backend(backend, queries, warmup, batch_size):
+    """
+    Load one backend, then time single-query encodes and one batched pass.
+    Returns the timings, the normalized query embeddings and the model.
+    """
+    rag_system = FarmerRAGSystem(backend=backend)
+    start = time.perf_counter()
+    model = rag_system.get_embedding_model()
+    load_seconds = time.perf_counter() - start
+    if model is None or rag_system.backend != backend:
+        return None, None, None
+
+    for query in queries[:warmup]:
+        model.encode([query], convert_to_numpy=True)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        model.encode([query], convert_to_numpy=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    vectors = model.encode(queries, batch_size=batch_size, convert_to_numpy=True)
+    batch_seconds = time.perf_counter() - start
+
+    result = {
+        "load_seconds": round(load_seconds, 3),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "latency_ms_p99": round(float(np.percentile(latencies, 99)), 3),
+        "latency_ms_mean": round(float(np.mean(latencies)), 3),
+        "batch_queries_per_second": round(len(queries) / batch_seconds, 1) if batch_seconds else None
+    }
+    return result, normalized(vectors), model
+
+def main():
+    """
+    Run every backend and print a comparison against torch
+    """
+    parser = argparse.ArgumentParser(description='Compare query encoder backends against torch')
+    parser.add_argument('--data', default='farmer_dataset_part_*.json', help='dataset files or glob pattern')
+    parser.add_argument('--queries', default=None, help='file with one query per line (default: problem sentences)')
+    parser.add_argument('--backends', default=','.join(ENCODER_BACKENDS),
+                        help=f'comma-separated backends ({", ".join(ENCODER_BACKENDS)})')
+    parser.add_argument('--num-queries', type=int, default=500, help='number of queries to time')
+    parser.add_argument('--corpus', type=int, default=2000, help='documents used for the top-k agreement check')
+    parser.add_argument('--k', type=int, default=10, help='top-k for the agreement check')
+    parser.add_argument('--warmup', type=int, default=20, help='untimed encodes before measuring')
+    parser.add_argument('--batch-size', type=int, default=32, help='batch size of the throughput pass')
+    parser.add_argument('--output', default=None, help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    backends = [backend.strip() for backend in args.backends.split(',') if backend.strip()]
+    unknown = [backend for backend in backends if backend not in ENCODER_BACKENDS]
+    if unknown:
+        print(f"❌ Unknown backends: {', '.join(unknown)}. Choose from: {', '.join(ENCODER_BACKENDS)}")
+        sys.exit(1)
+    # Every backend is measured against torch
+    backends = ["torch"] + [backend for backend in backends if backend != "torch"]
+
+    if not farmer_rag_system.dependencies_available():
+        print("❌ sentence-transformers and faiss are required: pip install sentence-transformers faiss-cpu")
+        sys.exit(1)
+
+    try:
+        queries, documents = load_texts(args.data, args.num_queries, args.corpus, args.queries)
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"📊 {len(queries)} queries, {len(documents)} documents for top-{args.k} agreement")
+
+    report = {"queries": len(queries), "documents": len(documents), "k": args.k, "backends": {}}
+    reference = None
+    reference_top = None
+    document_vectors = None
+    for backend in backends:
+        result, vectors, model = benchmark_backend(backend, queries, args.warmup, args.batch_size)
+        if result is None:
+            print(f"  {backend:<10} ⚠️ unavailable, skipped")
+            report["backends"][backend] = {"available": False}
+            continue
+
+        if backend == "torch":
+            reference = vectors
+            document_vectors = normalized(model.encode(documents, batch_size=args.batch_size, convert_to_numpy=True))
+            k = min(args.k, len(documents))
+            reference_top = np.argsort(-(reference @ document_vectors.T), axis=1)[:, :k]
+        elif reference is not None:
+            # Drift of the same query's embedding, and overlap of its top-k documents with torch's
+            cosines = np.sum(vectors * reference, axis=1)
+            top = np.argsort(-(vectors @ document_vectors.T), axis=1)[:, :reference_top.shape[1]]
+            overlap = [len(set(a) & set(b)) / max(len(a), 1) for a, b in zip(top.tolist(), reference_top.tolist())]
+            result.update({
+                "cosine_mean": round(float(cosines.mean()), 6),
+                "cosine_min": round(float(cosines.min()), 6),
+                "cosine_p1": round(float(np.percentile(cosines, 1)), 6),
+                f"top{args.k}_overlap": round(float(np.mean(overlap)), 4)
+            })
+
+        result["available"] = True
+        report["backends"][backend] = result
+        drift = ""
+        if "cosine_mean" in result:
+            drift = (f"  cosine vs torch mean={result['cosine_mean']:.4f} min={result['cosine_min']:.4f}  "
+                     f"top-{args.k} overlap={result[f'top{args.k}_overlap']:.1%}")
+        print(f"  {backend:<10} p50={result['latency_ms_p50']:.2f} ms  p99={result['latency_ms_p99']:.2f} ms  "
+              f"batch={result['batch_queries_per_second']}/s{drift}")
+
+    torch_result = report["backends"]["torch"]
+    for backend, result in report["backends"].items():
+        if backend != "torch" and result.get("available") and torch_result.get("available"):
+            print(f"✅ {backend}: {torch_result['latency_ms_p50'] / result['latency_ms_p50']:.2f}x faster at p50, "
+                  f"{torch_result['latency_ms_p99'] / result['latency_ms_p99']:.2f}x at p99")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
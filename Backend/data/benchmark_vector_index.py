@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Vector Index Benchmark
+Compares approximate FAISS index types against the exact Flat baseline:
+recall@k, per-query search latency, build time and index size.
+
+Usage:
+    python benchmark_vector_index.py --system rag_system --types flat,ivf_flat,ivf_pq,hnsw --k 10
+    python benchmark_vector_index.py --types flat,flat:fp16,flat:int8,hnsw:int8   # scalar quantization
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+import farmer_rag_system
+from farmer_rag_system import FarmerRAGSystem, resolve_index_config, create_faiss_index
+
+def load_corpus_vectors(rag_system):
+    """
+    Recover the normalized corpus vectors from a saved system's embeddings or index
+    """
+    if rag_system.embeddings is not None:
+        vectors = np.array(rag_system.embeddings, dtype=np.float32)
+        farmer_rag_system.faiss.normalize_L2(vectors)
+        return vectors
+    
+    index = rag_system.vector_index
+    if index is None:
+        raise RuntimeError("Saved system has no vector index")
+    try:
+        return index.reconstruct_n(0, index.ntotal)
+    except RuntimeError as e:
+        raise RuntimeError(f"Cannot reconstruct vectors from a {rag_system.index_config.get('type')} index: {e}")
+
+def make_queries(rag_system, vectors, num_queries, query_file=None, noise=0.05, seed=0):
+    """
+    Query vectors: encoded text queries from query_file, or perturbed corpus vectors
+    """
+    if query_file:
+        with open(query_file, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+        return rag_system.queries_to_vectors(queries)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), min(num_queries, len(vectors)), replace=False)
+    queries = vectors[picks] + rng.normal(0, noise, (len(picks), vectors.shape[1])).astype(np.float32)
+    farmer_rag_system.faiss.normalize_L2(queries)
+    return queries
+
+def benchmark_index(vectors, queries, ground_truth, ground_scores, k, index_type, index_params):
+    """
+    Build one index type and measure recall@k and score error against exact search, plus latency.
+    index_type may carry a quantization suffix, e.g. "flat:int8".
+    """
+    faiss = farmer_rag_system.faiss
+    index_type, _, quantization = index_type.partition(':')
+    if quantization:
+        index_params = dict(index_params, quantization=quantization)
+    config = resolve_index_config(index_type, len(vectors), **index_params)
+
+    start = time.perf_counter()
+    index = create_faiss_index(vectors.copy(), config)
+    build_seconds = time.perf_counter() - start
+
+    # Per-query latency, as in the serving path
+    latencies = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    scores = np.empty((len(queries), k), dtype=np.float32)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        similarities, indices = index.search(queries[i:i + 1], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found[i] = indices[0]
+        scores[i] = similarities[0]
+
+    recall = np.mean([
+        len(set(found[i]) & set(ground_truth[i])) / k
+        for i in range(len(queries))
+    ])
+
+    return {
+        "index": config,
+        "recall_at_k": round(float(recall), 4),
+        # Mean |similarity - exact similarity| at each rank: the accuracy cost of compression
+        "score_delta_mean": round(float(np.mean(np.abs(scores - ground_scores))), 5),
+        "latency_ms_p50": round(float(np.percentile(latencies, 50)), 4),
+        "latency_ms_p99": round(float(np.percentile(latencies, 99)), 4),
+        "build_seconds": round(build_seconds, 3),
+        "index_bytes": int(faiss.serialize_index(index).nbytes)
+    }
+
+def main():
+    """
+    Run the benchmark and print a recall/latency report
+    """
+    parser = argparse.ArgumentParser(description='Benchmark FAISS index types against exact search')
+    parser.add_argument('--system', default='rag_system', help='saved RAG system directory')
+    parser.add_argument('--types', default='flat,ivf_flat,ivf_pq,hnsw', help='comma-separated index types')
+    parser.add_argument('--params', default='{}',
+                        help='JSON object of per-type parameter overrides, e.g. {"ivf_flat": {"nprobe": 32}}')
+    parser.add_argument('--k', type=int, default=10, help='neighbours per query')
+    parser.add_argument('--queries', type=int, default=500, help='number of sampled query vectors')
+    parser.add_argument('--query-file', default=None, help='text file with one query per line (needs the model)')
+    parser.add_argument('--output', default=None, help='write the report as JSON to this path')
+    args = parser.parse_args()
+
+    if not farmer_rag_system.faiss_available():
+        print("❌ faiss is required for this benchmark: pip install faiss-cpu")
+        sys.exit(1)
+
+    rag_system = FarmerRAGSystem()
+    rag_system.load_system(args.system)
+
+    vectors = load_corpus_vectors(rag_system)
+    queries = make_queries(rag_system, vectors, args.queries, args.query_file)
+    print(f"📊 Corpus: {len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={args.k}")
+
+    # Exact ground truth from a Flat index
+    exact = farmer_rag_system.faiss.IndexFlatIP(vectors.shape[1])
+    exact.add(vectors)
+    ground_scores, ground_truth = exact.search(queries, args.k)
+
+    params = json.loads(args.params)
+    report = []
+    for index_type in [t.strip() for t in args.types.split(',') if t.strip()]:
+        try:
+            result = benchmark_index(vectors, queries, ground_truth, ground_scores, args.k, index_type, params.get(index_type, {}))
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {index_type}: {e}")
+            continue
+        report.append(result)
+        print(f"  {index_type:<13} recall@{args.k}={result['recall_at_k']:.4f}  "
+              f"score_delta={result['score_delta_mean']:.5f}  "
+              f"p50={result['latency_ms_p50']:.3f} ms  p99={result['latency_ms_p99']:.3f} ms  "
+              f"build={result['build_seconds']:.2f} s  size={result['index_bytes'] / 1e6:.1f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"num_vectors": len(vectors), "k": args.k, "results": report}, f, indent=2)
+        print(f"💾 Report saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
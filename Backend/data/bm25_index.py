@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+BM25 Lexical Index
+Sparse inverted index over chunk text with Okapi BM25 scoring.
+
+Postings are stored term-major in flat numpy arrays (CSR layout): for term t,
+documents and precomputed BM25 impacts live in docs/impacts[offsets[t]:offsets[t+1]].
+Scoring a query is one concatenation of a few postings slices plus a bincount,
+with no model and no torch, so it also serves as the retrieval path on
+machines that cannot load the embedding model.
+"""
+
+import re
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed set of documents (chunk rows 0..num_docs-1)
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: np.ndarray, docs: np.ndarray,
+                 impacts: np.ndarray, idf: np.ndarray, num_docs: int, avg_doc_length: float,
+                 k1: float = 1.2, b: float = 0.75):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.docs = docs
+        self.impacts = impacts
+        self.idf = idf
+        self.num_docs = num_docs
+        self.avg_doc_length = avg_doc_length
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        """
+        Tokenize every document once and lay the postings out term by term
+        """
+        vocabulary: Dict[str, int] = {}
+        term_ids = array('i')
+        doc_ids = array('i')
+        term_freqs = array('i')
+        doc_lengths = array('i')
+
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                doc_ids.append(doc)
+                term_freqs.append(freq)
+
+        num_docs = len(doc_lengths)
+        term_ids = np.frombuffer(term_ids, dtype=np.int32)
+        doc_ids = np.frombuffer(doc_ids, dtype=np.int32)
+        term_freqs = np.frombuffer(term_freqs, dtype=np.int32).astype(np.float32)
+        doc_lengths = np.frombuffer(doc_lengths, dtype=np.int32).astype(np.float32)
+        avg_doc_length = float(doc_lengths.mean()) if num_docs else 0.0
+
+        # Term-major order; the stable sort keeps each term's documents ascending
+        order = np.argsort(term_ids, kind='stable')
+        doc_freqs = np.bincount(term_ids, minlength=len(vocabulary))
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(doc_freqs, out=offsets[1:])
+
+        # Non-negative idf variant (as in Lucene)
+        idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+        term_ids = term_ids[order]
+        docs = doc_ids[order]
+        freqs = term_freqs[order]
+        length_norm = k1 * (1 - b + b * doc_lengths[docs] / max(avg_doc_length, 1e-9))
+        impacts = (idf[term_ids] * freqs * (k1 + 1) / (freqs + length_norm)).astype(np.float32)
+
+        return cls(vocabulary, offsets, np.ascontiguousarray(docs), impacts, idf,
+                   num_docs, avg_doc_length, k1, b)
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+    def query_terms(self, query: str) -> List[int]:
+        """Distinct vocabulary ids of the query's terms (unknown terms cannot match)"""
+        return list(dict.fromkeys(
+            self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary
+        ))
+
+    def max_score(self, query: str) -> float:
+        """
+        Upper bound of any document's score for query (every term at saturating frequency),
+        used to map scores onto 0..1
+        """
+        term_ids = self.query_terms(query)
+        return float(self.idf[term_ids].sum() * (self.k1 + 1)) if term_ids else 0.0
+
+    def score_all(self, query: str) -> np.ndarray:
+        """BM25 score of every document for query"""
+        term_ids = self.query_terms(query)
+        if not term_ids:
+            return np.zeros(self.num_docs, dtype=np.float64)
+        docs = np.concatenate([self.docs[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        weights = np.concatenate([self.impacts[self.offsets[t]:self.offsets[t + 1]] for t in term_ids])
+        return np.bincount(docs, weights=weights, minlength=self.num_docs)
+
+    def score_text(self, query: str, text: str) -> float:
+        """
+        BM25 score of a document outside the index (e.g. a chunk added later),
+        using this index's term statistics
+        """
+        term_ids = set(self.query_terms(query))
+        tokens = tokenize(text)
+        if not term_ids or not tokens:
+            return 0.0
+        length_norm = self.k1 * (1 - self.b + self.b * len(tokens) / max(self.avg_doc_length, 1e-9))
+        score = 0.0
+        for term, freq in Counter(tokens).items():
+            term_id = self.vocabulary.get(term)
+            if term_id in term_ids:
+                score += float(self.idf[term_id]) * freq * (self.k1 + 1) / (freq + length_norm)
+        return score
+
+    @staticmethod
+    def top_k(scores: np.ndarray, top_k: int, selected: Optional[np.ndarray] = None,
+              excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best-scoring positions (score > 0) in descending order, optionally restricted to
+        the selected positions or skipping the excluded ones
+        """
+        if selected is not None:
+            candidates = selected[scores[selected] > 0]
+        else:
+            candidates = np.flatnonzero(scores > 0)
+            if excluded is not None and len(excluded):
+                candidates = np.setdiff1d(candidates, excluded, assume_unique=True)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        order = np.argsort(-scores[candidates], kind='stable')
+        candidates = candidates[order]
+        return scores[candidates], candidates.astype(np.int64)
+
+    def save(self, path: str, index_version: Optional[str] = None) -> None:
+        """Write the index as an uncompressed .npz, stamped with the index_version of its chunks"""
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                terms=np.frombuffer("\n".join(terms).encode('utf-8'), dtype=np.uint8),
+                offsets=self.offsets,
+                docs=self.docs,
+                impacts=self.impacts,
+                idf=self.idf,
+                params=np.array([self.num_docs, self.avg_doc_length, self.k1, self.b], dtype=np.float64),
+                index_version=np.frombuffer((index_version or "").encode('utf-8'), dtype=np.uint8)
+            )
+
+    @staticmethod
+    def saved_version(path: str) -> Optional[str]:
+        """index_version a saved index was stamped with (None for unstamped files)"""
+        with np.load(path) as data:
+            if "index_version" not in data.files:
+                return None
+            return data["index_version"].tobytes().decode('utf-8') or None
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            terms = data["terms"].tobytes().decode('utf-8')
+            vocabulary = {term: i for i, term in enumerate(terms.split("\n"))} if terms else {}
+            num_docs, avg_doc_length, k1, b = data["params"].tolist()
+            return cls(vocabulary, data["offsets"], data["docs"], data["impacts"], data["idf"],
+                       int(num_docs), avg_doc_length, k1, b)
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Binary Chunk Store
+Compact, memory-mapped on-disk format for RAG chunk records
+
+Layout of a chunk store file:
+    8 bytes   magic b"FRCHUNK1"
+    8 bytes   little-endian uint64 header length
+    N bytes   JSON header (columns, vocabularies, string pool location)
+    ...       8-byte aligned numpy arrays referenced from the header
+
+Every string that is not a categorical value lives once in a shared UTF-8
+string pool (offsets array + blob), so repeated text such as a problem's
+solution is stored a single time. Categorical fields (crop, category, ...)
+are integer codes into small vocabularies kept in the header. Reading
+maps the file with mmap: opening is near-instant, pages are shared between
+processes, and a chunk dict is only built when it is indexed.
+"""
+
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+MAGIC = b"FRCHUNK1"
+
+# Fields stored as integer codes into a per-field vocabulary
+CATEGORICAL_FIELDS = ('category', 'crop', 'severity', 'season', 'region', 'chunk_type')
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+def write_chunk_store(chunks: Iterable[Dict[str, Any]], path: str) -> int:
+    """
+    Write chunk dicts to a binary chunk store at path, returns the number of chunks written.
+    Integer fields become int64 columns, categorical fields become int32 codes and
+    all other strings are interned in the shared string pool.
+    """
+    field_order: List[str] = []
+    field_kinds: Dict[str, str] = {}
+    columns: Dict[str, List[int]] = {}
+    vocabularies: Dict[str, Dict[str, int]] = {}
+    pool_index: Dict[str, int] = {}
+    pool: List[bytes] = []
+    num_chunks = 0
+
+    for chunk in chunks:
+        for field, value in chunk.items():
+            if field not in field_kinds:
+                if isinstance(value, bool) or not isinstance(value, (int, str)):
+                    raise TypeError(f"Unsupported chunk field type for '{field}': {type(value).__name__}")
+                if isinstance(value, int):
+                    kind = 'int'
+                elif field in CATEGORICAL_FIELDS:
+                    kind = 'category'
+                    vocabularies[field] = {}
+                else:
+                    kind = 'string'
+                field_kinds[field] = kind
+                field_order.append(field)
+                # Chunks seen before this field appeared get a missing marker
+                columns[field] = [-1] * num_chunks
+
+            kind = field_kinds[field]
+            if kind == 'int':
+                columns[field].append(int(value))
+            elif kind == 'category':
+                vocabulary = vocabularies[field]
+                columns[field].append(vocabulary.setdefault(value, len(vocabulary)))
+            else:
+                ref = pool_index.get(value)
+                if ref is None:
+                    ref = pool_index[value] = len(pool)
+                    pool.append(value.encode('utf-8'))
+                columns[field].append(ref)
+
+        num_chunks += 1
+        for field in field_order:
+            if len(columns[field]) < num_chunks:
+                columns[field].append(-1)
+
+    arrays: Dict[str, np.ndarray] = {}
+    for field in field_order:
+        dtype = np.int32 if field_kinds[field] == 'category' else np.int64
+        arrays[field] = np.asarray(columns[field], dtype=dtype)
+
+    pool_offsets = np.zeros(len(pool) + 1, dtype=np.uint64)
+    if pool:
+        np.cumsum([len(item) for item in pool], out=pool_offsets[1:])
+    pool_blob = b"".join(pool)
+
+    # Lay out the data section relative to the end of the header
+    layout = []
+    data_offset = 0
+    column_meta = {}
+    for field in field_order:
+        array = arrays[field]
+        data_offset = _align(data_offset)
+        column_meta[field] = {"kind": field_kinds[field], "dtype": array.dtype.str, "offset": data_offset}
+        layout.append((data_offset, array.tobytes()))
+        data_offset += array.nbytes
+
+    data_offset = _align(data_offset)
+    pool_meta = {"count": len(pool), "offsets": data_offset}
+    layout.append((data_offset, pool_offsets.tobytes()))
+    data_offset += pool_offsets.nbytes
+    pool_meta["blob"] = data_offset
+    pool_meta["blob_size"] = len(pool_blob)
+    layout.append((data_offset, pool_blob))
+    data_offset += len(pool_blob)
+
+    header = {
+        "version": 1,
+        "num_chunks": num_chunks,
+        "fields": field_order,
+        "columns": column_meta,
+        "vocabularies": {field: list(vocab) for field, vocab in vocabularies.items()},
+        "string_pool": pool_meta
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    # Write to a temporary file and swap it in, so readers mapping the old file are unaffected
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for offset, payload in layout:
+            f.seek(data_start + offset)
+            f.write(payload)
+        # Make sure empty trailing arrays still fall inside the file
+        f.truncate(data_start + data_offset)
+    os.replace(tmp_path, path)
+
+    return num_chunks
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped view over a chunk store file.
+    Behaves like a list of chunk dicts: len(), indexing and iteration.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._file.close()
+            raise ValueError(f"Not a chunk store: {path}")
+
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"Not a chunk store: {path}")
+
+        (header_len,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_len].decode('utf-8'))
+        data_start = _align(header_start + header_len)
+
+        self.num_chunks = header["num_chunks"]
+        self.fields = header["fields"]
+        self.vocabularies = header["vocabularies"]
+        self._kinds = {field: meta["kind"] for field, meta in header["columns"].items()}
+        self._columns = {
+            field: np.frombuffer(self._mmap, dtype=np.dtype(meta["dtype"]),
+                                 count=self.num_chunks, offset=data_start + meta["offset"])
+            for field, meta in header["columns"].items()
+        }
+
+        pool = header["string_pool"]
+        self._pool_offsets = np.frombuffer(self._mmap, dtype=np.uint64, count=pool["count"] + 1,
+                                           offset=data_start + pool["offsets"])
+        self._pool_start = data_start + pool["blob"]
+
+    def __len__(self) -> int:
+        return self.num_chunks
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        idx = int(idx)
+        if idx < 0:
+            idx += self.num_chunks
+        if not 0 <= idx < self.num_chunks:
+            raise IndexError("chunk index out of range")
+
+        chunk = {}
+        for field in self.fields:
+            value = int(self._columns[field][idx])
+            if value < 0 and self._kinds[field] != 'int':
+                continue  # field missing for this chunk
+            kind = self._kinds[field]
+            if kind == 'category':
+                chunk[field] = self.vocabularies[field][value]
+            elif kind == 'string':
+                chunk[field] = self.get_string(value)
+            else:
+                chunk[field] = value
+        return chunk
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for idx in range(self.num_chunks):
+            yield self[idx]
+
+    def get_string(self, ref: int) -> str:
+        """Decode one entry of the shared string pool"""
+        start = self._pool_start + int(self._pool_offsets[ref])
+        end = self._pool_start + int(self._pool_offsets[ref + 1])
+        return self._mmap[start:end].decode('utf-8')
+
+    def values(self, field: str) -> List[Any]:
+        """Decoded values of one field for every record, without building whole records"""
+        column = self._columns[field]
+        kind = self._kinds[field]
+        if kind == 'int':
+            return column.tolist()
+        if kind == 'category':
+            vocabulary = self.vocabularies[field]
+            return [vocabulary[code] if code >= 0 else None for code in column.tolist()]
+        return [self.get_string(ref) if ref >= 0 else None for ref in column.tolist()]
+
+    def column(self, field: str) -> np.ndarray:
+        """Raw column array: int64 values, int32 vocabulary codes or int64 string pool refs"""
+        return self._columns[field]
+
+    def close(self) -> None:
+        """Release the memory map (views returned by column() become invalid)"""
+        self._columns = {}
+        self._pool_offsets = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            # numpy views still reference the map; it is released when they are collected
+            pass
+        self._file.close()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Problem Dataset Loader
+Streams problem records from one or many dataset files, e.g. the
+farmer_dataset_part_N.json files written by farmer_problems_generator.
+
+Files are parsed incrementally (one array element at a time), so only the
+record being processed is held in memory, never a whole file. Records in
+the generator's question/answer schema are mapped to the problem/solution
+schema used by FarmerRAGSystem.
+"""
+
+import glob
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Union
+
+# Generator schema -> RAG schema
+FIELD_ALIASES = {'question': 'problem', 'answer': 'solution'}
+
+def normalize_problem(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Map a record in either schema to one with 'problem' and 'solution' keys
+    """
+    if 'problem' in record and 'solution' in record and not any(alias in record for alias in FIELD_ALIASES):
+        return record
+
+    normalized = {}
+    for key, value in record.items():
+        target = FIELD_ALIASES.get(key, key)
+        # An explicit problem/solution wins over its alias
+        if target not in record or target == key:
+            normalized[target] = value
+    if 'problem' not in normalized or 'solution' not in normalized:
+        raise ValueError(f"Record {record.get('id')} has neither problem/solution nor question/answer fields")
+    return normalized
+
+def iter_json_array(path: str, read_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yield the elements of a top-level JSON array one by one, reading the file in blocks
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer = f.read(read_size)
+        pos = 0
+        eof = not buffer
+
+        def refill():
+            nonlocal buffer, pos, eof
+            block = f.read(read_size)
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+
+        def next_token() -> str:
+            nonlocal pos
+            while True:
+                while pos < len(buffer) and buffer[pos].isspace():
+                    pos += 1
+                if pos < len(buffer):
+                    return buffer[pos]
+                if eof:
+                    return ''
+                refill()
+
+        if next_token() != '[':
+            raise ValueError(f"{path}: expected a JSON array of records")
+        pos += 1
+        if next_token() == ']':
+            return
+
+        while True:
+            if next_token() == '':
+                raise ValueError(f"{path}: unexpected end of file inside the JSON array")
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                refill()
+                continue
+            if not eof and (end == len(buffer) or buffer[end] not in ' \t\r\n,]'):
+                # A number cut off at the block boundary parses as a shorter number
+                refill()
+                continue
+
+            yield element
+            pos = end
+            token = next_token()
+            if token == ']':
+                return
+            if token != ',':
+                raise ValueError(f"{path}: malformed JSON array near offset {pos}")
+            pos += 1
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Raw records from a JSON array file or a JSON Lines (.jsonl) file
+    """
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        yield from iter_json_array(path)
+
+def _natural_key(path: str) -> List[Any]:
+    # farmer_dataset_part_2.json sorts before farmer_dataset_part_10.json
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', path)]
+
+def resolve_paths(patterns: Union[str, Iterable[str]]) -> List[str]:
+    """
+    Expand one or more paths/glob patterns into an ordered, de-duplicated file list
+    """
+    patterns = [patterns] if isinstance(patterns, str) else list(patterns)
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern), key=_natural_key)
+        if not matches and os.path.exists(pattern):
+            matches = [pattern]
+        paths.extend(matches)
+    paths = list(dict.fromkeys(paths))
+    if not paths:
+        raise FileNotFoundError(f"No dataset files match: {', '.join(patterns)}")
+    return paths
+
+class ProblemFiles:
+    """
+    Re-iterable stream of normalized problem records from a set of dataset files;
+    each iteration reads the files again, one record at a time
+    """
+
+    def __init__(self, patterns: Union[str, Iterable[str]]):
+        self.paths = resolve_paths(patterns)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for path in self.paths:
+            for record in iter_records(path):
+                yield normalize_problem(record)
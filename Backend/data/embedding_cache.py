@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Embedding Cache
+Content-addressed on-disk cache of chunk embeddings, so re-indexing only
+runs the transformer over chunks whose text changed
+
+Each model gets its own set of append-only files in the cache directory:
+    <model>.json    model name and embedding dimension
+    <model>.keys    16-byte blake2b digests of (model name, chunk text), one per row
+    <model>.f32     float32 embedding rows in the same order, memory-mapped for reads
+
+Vectors are appended before their keys, so a key never points at a row
+that is not on disk; a torn tail left by an interrupted write is dropped
+on open.
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+KEY_BYTES = 16
+
+class EmbeddingCache:
+    """
+    Persistent mapping hash(model_name, text) -> embedding vector
+    """
+
+    def __init__(self, cache_dir: str, model_name: str):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        slug = re.sub(r'[^A-Za-z0-9._-]+', '_', model_name)
+        self.meta_path = os.path.join(cache_dir, f"{slug}.json")
+        self.keys_path = os.path.join(cache_dir, f"{slug}.keys")
+        self.vectors_path = os.path.join(cache_dir, f"{slug}.f32")
+        self.dimension = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[bytes, int] = {}
+        self._vectors = None
+        self._open()
+
+    def key(self, text: str) -> bytes:
+        """Cache key of a chunk text for this model"""
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode('utf-8'), digest_size=KEY_BYTES).digest()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _open(self) -> None:
+        """Read the key index and map the vectors of an existing cache"""
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path, 'r') as f:
+            self.dimension = json.load(f)["dimension"]
+
+        keys = b""
+        if os.path.exists(self.keys_path):
+            with open(self.keys_path, 'rb') as f:
+                keys = f.read()
+        vector_rows = 0
+        if os.path.exists(self.vectors_path):
+            vector_rows = os.path.getsize(self.vectors_path) // (self.dimension * 4)
+
+        num_rows = min(len(keys) // KEY_BYTES, vector_rows)
+        if len(keys) != num_rows * KEY_BYTES:
+            os.truncate(self.keys_path, num_rows * KEY_BYTES)
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) != num_rows * self.dimension * 4:
+            os.truncate(self.vectors_path, num_rows * self.dimension * 4)
+
+        self._rows = {keys[row * KEY_BYTES:(row + 1) * KEY_BYTES]: row for row in range(num_rows)}
+        self._map_vectors()
+
+    def _map_vectors(self) -> None:
+        num_rows = len(self._rows)
+        if num_rows:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                      shape=(num_rows, self.dimension))
+
+    def lookup(self, texts: List[str]) -> Tuple[np.ndarray, List[int]]:
+        """
+        Cached embeddings for texts. Returns the (len(texts), dimension) matrix, or None
+        when the cache is empty, and the positions of the texts that were not cached.
+        """
+        positions = [self._rows.get(self.key(text)) for text in texts]
+        missing = [i for i, row in enumerate(positions) if row is None]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        if self.dimension is None:
+            return None, missing
+
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        found = np.array([i for i, row in enumerate(positions) if row is not None], dtype=np.int64)
+        if len(found):
+            rows = np.array([positions[i] for i in found], dtype=np.int64)
+            # Read rows in file order for sequential page access
+            order = np.argsort(rows, kind='stable')
+            embeddings[found[order]] = self._vectors[rows[order]]
+        return embeddings, missing
+
+    def add(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """Append embeddings of texts that are not cached yet"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.dimension is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.dimension = embeddings.shape[1]
+            with open(self.meta_path, 'w') as f:
+                json.dump({"model_name": self.model_name, "dimension": self.dimension}, f, indent=2)
+        elif embeddings.shape[1] != self.dimension:
+            raise ValueError(f"Cache holds {self.dimension}-d embeddings, got {embeddings.shape[1]}-d")
+
+        new_keys = {}
+        for text, vector in zip(texts, embeddings):
+            key = self.key(text)
+            if key not in self._rows and key not in new_keys:
+                new_keys[key] = vector
+        if not new_keys:
+            return
+
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.stack(list(new_keys.values())).tobytes())
+        with open(self.keys_path, 'ab') as f:
+            f.write(b"".join(new_keys))
+
+        for key in new_keys:
+            self._rows[key] = len(self._rows)
+        self._map_vectors()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
@@ -4,63 +4,634 @@ Farmer RAG (Retrieval-Augmented Generation) System
 Complete RAG implementation with text processing, chunking, vectorization, and retrieval
 """
 
+import bisect
+import glob
 import json
 import numpy as np
 import re
 import os
-from typing import List, Dict, Tuple, Any
+import platform
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Any, Optional, Iterable
 from datetime import datetime
 import pickle
 import warnings
+from chunk_store import ChunkStore, write_chunk_store
+from index_delta import IndexDelta
+from embedding_cache import EmbeddingCache
+from parallel_embedding import embed_texts_parallel
+from dataset_loader import ProblemFiles, normalize_problem
+from parallel_chunking import iter_chunk_batches
+from sharded_index import ShardedIndex, partition_rows
+from bm25_index import BM25Index
+from reranker import RERANKERS
 warnings.filterwarnings('ignore')
 
-try:
-    from sentence_transformers import SentenceTransformer
-    import faiss
-    SENTENCE_TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    print("⚠️ sentence-transformers and faiss not available. Installing...")
-    import subprocess
-    import sys
+# sentence-transformers (torch) and faiss are heavy, so they are imported on
+# first use instead of at module import. Chunking, metadata and stats tools
+# never pay for them.
+SentenceTransformer = None
+faiss = None
+_MISSING_DEPENDENCIES = set()
+
+def _import_sentence_transformers() -> bool:
+    """Import sentence-transformers on first use"""
+    global SentenceTransformer
+    if SentenceTransformer is not None:
+        return True
+    if 'sentence-transformers' in _MISSING_DEPENDENCIES:
+        return False
+    
+    try:
+        from sentence_transformers import SentenceTransformer as _SentenceTransformer
+        SentenceTransformer = _SentenceTransformer
+        return True
+    except ImportError:
+        _MISSING_DEPENDENCIES.add('sentence-transformers')
+        print("❌ sentence-transformers not available. Please install: pip install sentence-transformers")
+        return False
+
+def _import_faiss() -> bool:
+    """Import faiss on first use"""
+    global faiss
+    if faiss is not None:
+        return True
+    if 'faiss' in _MISSING_DEPENDENCIES:
+        return False
     
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "sentence-transformers", "faiss-cpu"])
-        from sentence_transformers import SentenceTransformer
-        import faiss
-        SENTENCE_TRANSFORMERS_AVAILABLE = True
-        print("✅ Successfully installed sentence-transformers and faiss")
-    except Exception as e:
-        print(f"❌ Failed to install dependencies: {e}")
-        print("Please install manually: pip install sentence-transformers faiss-cpu")
-        SENTENCE_TRANSFORMERS_AVAILABLE = False
+        import faiss as _faiss
+        faiss = _faiss
+        return True
+    except ImportError:
+        _MISSING_DEPENDENCIES.add('faiss')
+        print("❌ faiss not available. Please install: pip install faiss-cpu")
+        return False
+
+def faiss_available() -> bool:
+    """Check (and load) faiss, which is all that is needed to work with saved indexes"""
+    return _import_faiss()
+
+def dependencies_available() -> bool:
+    """Check (and load) the dependencies needed for embedding and vector search"""
+    return _import_sentence_transformers() and _import_faiss()
+
+# Query/document encoder backends: "torch" runs the model in PyTorch, "onnx" on onnxruntime,
+# "onnx_int8" on onnxruntime with int8 weights (exported once into ONNX_MODEL_DIR).
+# The ONNX backends need: pip install sentence-transformers[onnx]
+ENCODER_BACKENDS = ("torch", "onnx", "onnx_int8")
+ONNX_MODEL_DIR = "onnx_models"
+
+def default_onnx_quantization() -> str:
+    """Dynamic quantization preset for this CPU: "arm64" on ARM, "avx2" (any modern x86) otherwise"""
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx2"
+
+# Supported vector index types and their default parameters.
+# nlist=None picks roughly 4*sqrt(n) inverted lists for the corpus size.
+# quantization stores vectors as "fp16" (2x smaller) or "int8" (4x smaller)
+# scalar-quantized codes instead of float32.
+INDEX_TYPES = {
+    "flat": {"quantization": None},
+    "ivf_flat": {"nlist": None, "nprobe": 16, "quantization": None},
+    "ivf_pq": {"nlist": None, "nprobe": 16, "pq_m": 48, "pq_bits": 8},
+    "hnsw": {"hnsw_m": 32, "ef_construction": 200, "ef_search": 64, "quantization": None}
+}
+
+SCALAR_QUANTIZATION_TYPES = ("fp16", "int8")
+
+# Upper bound on vectors used to train IVF/PQ quantizers
+MAX_TRAINING_VECTORS = 100000
+
+# k-means training points wanted per centroid (faiss warns below this). IVF trains nlist
+# centroids and every PQ sub-quantizer 2**pq_bits, so small corpora get fewer pq_bits,
+# down to MIN_PQ_BITS (16 centroids); below that ivf_pq is refused.
+MIN_POINTS_PER_CENTROID = 39
+MIN_PQ_BITS = 4
+
+# Chunk boundaries, located once per text by chunk_text()
+SENTENCE_END_PATTERN = re.compile(r"[.!?]")
+LAST_WHITESPACE_PATTERN = re.compile(r"\s\S*\Z")
+
+# Chunking modes: "characters" cuts chunk_size-character chunks with overlap_size overlap;
+# "tokens" packs whole sentences up to chunk_tokens tokens of the embedding model's tokenizer
+# (default: what the model reads without truncation) with overlap_tokens tokens of overlap.
+CHUNK_MODES = ("characters", "tokens")
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"[.!?]+(?=\s|$)")
+
+# Retrieval modes: "dense" searches the embeddings, "lexical" uses only the BM25
+# index (no torch or faiss needed) and "hybrid" fuses both rankings.
+RETRIEVAL_MODES = ("dense", "hybrid", "lexical")
+
+# Hybrid fusion. "linear" ranks by dense_weight * cosine + (1 - dense_weight) * BM25
+# scaled to 0..1; "rrf" (reciprocal rank fusion) ranks by the sum of 1 / (rrf_k + rank).
+# Each retriever contributes max(top_k, candidates) results to the fusion.
+FUSION_METHODS = ("linear", "rrf")
+FUSION_DEFAULTS = {"method": "linear", "dense_weight": 0.7, "rrf_k": 60, "candidates": 50}
+
+# Optional second stage: rescore max(top_k, candidates) first-stage results with a
+# reranker ("lexical" or "cross_encoder"). The budget starts after first-stage retrieval;
+# a query whose time_budget_ms is spent before or during reranking keeps its first-stage order.
+RERANK_DEFAULTS = {"candidates": 20, "time_budget_ms": 50.0}
+
+def resolve_index_config(index_type: str = "flat", num_vectors: int = 0, **index_params) -> Dict[str, Any]:
+    """
+    Merge user parameters with the defaults for index_type and fill in automatic values
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'. Choose from: {', '.join(INDEX_TYPES)}")
+    
+    unknown = set(index_params) - set(INDEX_TYPES[index_type])
+    if unknown:
+        raise ValueError(f"Unsupported parameters for {index_type} index: {', '.join(sorted(unknown))}")
+    
+    config = {"type": index_type, **INDEX_TYPES[index_type], **index_params}
+    if config.get("quantization") not in (None,) + SCALAR_QUANTIZATION_TYPES:
+        raise ValueError(f"Unknown quantization '{config['quantization']}'. Choose from: {', '.join(SCALAR_QUANTIZATION_TYPES)}")
+    if "nlist" in config and config["nlist"] is None:
+        # Aim for ~4*sqrt(n) lists while keeping ~39 training points per centroid
+        config["nlist"] = max(1, min(int(4 * np.sqrt(num_vectors)), num_vectors // MIN_POINTS_PER_CENTROID))
+    if index_type == "ivf_pq":
+        # Largest code size whose codebooks get enough training points
+        max_bits = (num_vectors // MIN_POINTS_PER_CENTROID).bit_length() - 1
+        if "pq_bits" not in index_params:
+            config["pq_bits"] = min(config["pq_bits"], max_bits)
+        if config["pq_bits"] > max_bits or config["pq_bits"] < MIN_PQ_BITS:
+            bits = max(config["pq_bits"], MIN_PQ_BITS)
+            raise ValueError(f"ivf_pq with {bits}-bit codes needs at least {MIN_POINTS_PER_CENTROID * 2 ** bits} "
+                             f"vectors to train, got {num_vectors}; use flat or ivf_flat for a corpus this small")
+    return config
+
+def create_faiss_index(embeddings: np.ndarray, config: Dict[str, Any]):
+    """
+    Create, train and populate a FAISS inner-product index described by config.
+    embeddings must already be L2-normalized float32.
+    """
+    num_vectors, dimension = embeddings.shape
+    index_type = config["type"]
+    quantization = config.get("quantization")
+    if quantization:
+        scalar_type = faiss.ScalarQuantizer.QT_fp16 if quantization == "fp16" else faiss.ScalarQuantizer.QT_8bit
+    
+    if index_type == "flat":
+        if quantization:
+            index = faiss.IndexScalarQuantizer(dimension, scalar_type, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        if quantization:
+            index = faiss.IndexHNSWSQ(dimension, scalar_type, config["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, config["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = config["ef_construction"]
+    else:
+        quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf_flat":
+            if quantization:
+                index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, config["nlist"], scalar_type,
+                                                      faiss.METRIC_INNER_PRODUCT)
+            else:
+                index = faiss.IndexIVFFlat(quantizer, dimension, config["nlist"], faiss.METRIC_INNER_PRODUCT)
+        else:
+            if dimension % config["pq_m"] != 0:
+                raise ValueError(f"pq_m={config['pq_m']} must divide the embedding dimension {dimension}")
+            min_vectors = MIN_POINTS_PER_CENTROID * 2 ** config["pq_bits"]
+            if num_vectors < min_vectors:
+                raise ValueError(f"ivf_pq with {config['pq_bits']}-bit codes needs at least {min_vectors} "
+                                 f"vectors to train, got {num_vectors}")
+            index = faiss.IndexIVFPQ(quantizer, dimension, config["nlist"], config["pq_m"],
+                                     config["pq_bits"], faiss.METRIC_INNER_PRODUCT)
+    
+    # IVF centroids, PQ codebooks and int8 value ranges are learned from the data
+    if not index.is_trained:
+        training_vectors = embeddings
+        if num_vectors > MAX_TRAINING_VECTORS:
+            sample = np.random.default_rng(0).choice(num_vectors, MAX_TRAINING_VECTORS, replace=False)
+            training_vectors = embeddings[np.sort(sample)]
+        index.train(training_vectors)
+    
+    index.add(embeddings)
+    apply_search_params(index, config)
+    return index
+
+def apply_search_params(index, config: Dict[str, Any]) -> None:
+    """
+    Set query-time parameters (nprobe / efSearch), which are not persisted by faiss.write_index
+    """
+    if config.get("type", "flat") in ("ivf_flat", "ivf_pq"):
+        faiss.extract_index_ivf(index).nprobe = config["nprobe"]
+    elif config.get("type") == "hnsw":
+        index.hnsw.efSearch = config["ef_search"]
+
+# Chunk metadata fields that searches can be restricted on
+FILTER_FIELDS = ('crop', 'category', 'season', 'region', 'severity')
+
+# Chunks tagged with these values apply to every season/region, so they match any filter value
+WILDCARD_VALUES = {'season': 'all', 'region': 'all'}
+
+class MetadataIndex:
+    """
+    Per-field inverted index from metadata value to the sorted positions of the
+    chunks carrying it, used to pre-filter vector search
+    """
+    
+    def __init__(self, chunks):
+        self.num_chunks = len(chunks)
+        self.postings = {}
+        
+        for field in FILTER_FIELDS:
+            if isinstance(chunks, ChunkStore):
+                if field not in chunks.fields:
+                    continue
+                codes = np.asarray(chunks.column(field), dtype=np.int64)
+                vocabulary = chunks.vocabularies[field]
+            else:
+                lookup = {}
+                codes = np.fromiter(
+                    (lookup.setdefault(chunk.get(field), len(lookup)) for chunk in chunks),
+                    dtype=np.int64, count=self.num_chunks
+                )
+                vocabulary = list(lookup)
+            
+            # Group positions by code with one stable sort instead of a scan per value
+            order = np.argsort(codes, kind='stable')
+            sorted_codes = codes[order]
+            field_postings = {}
+            for code, value in enumerate(vocabulary):
+                start, end = np.searchsorted(sorted_codes, [code, code + 1])
+                if end > start and value is not None:
+                    field_postings[str(value).lower()] = order[start:end]
+            self.postings[field] = field_postings
+    
+    @staticmethod
+    def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, set]:
+        """
+        Validate filters into field -> set of accepted lowercase values (wildcards included)
+        """
+        normalized = {}
+        for field, wanted in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Cannot filter on '{field}'. Supported fields: {', '.join(FILTER_FIELDS)}")
+            if wanted is None or wanted == []:
+                continue
+            
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            values = {str(value).strip().lower() for value in values}
+            if field in WILDCARD_VALUES:
+                values.add(WILDCARD_VALUES[field])
+            normalized[field] = values
+        return normalized
+    
+    @staticmethod
+    def matches(chunk: Dict[str, Any], normalized_filters: Dict[str, set]) -> bool:
+        """Whether a single chunk passes filters returned by normalize_filters()"""
+        return all(
+            str(chunk.get(field)).lower() in values
+            for field, values in normalized_filters.items()
+            if chunk.get(field) is not None
+        )
+    
+    def select(self, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Sorted chunk positions matching every field filter (any of the values within a field).
+        Returns None when filters do not restrict anything.
+        """
+        selected = None
+        for field, values in self.normalize_filters(filters).items():
+            if field not in self.postings:
+                continue
+            
+            field_postings = self.postings[field]
+            matches = [field_postings[value] for value in values if value in field_postings]
+            field_selected = np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+            
+            selected = field_selected if selected is None else np.intersect1d(selected, field_selected, assume_unique=True)
+        
+        return selected if selected is None else selected.astype(np.int64)
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by entry count, with an
+    optional time-to-live and hit/miss counters
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Return the cached value for key (refreshing its recency) or default"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            self.misses += 1
+            return default
+    
+    def put(self, key, value) -> None:
+        """Store value under key, evicting the least recently used entries beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Cache size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
 
 class FarmerRAGSystem:
     """
     Complete RAG system for farmer problem-solving
     """
     
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2",
+                 query_cache_size: int = 1024, query_cache_ttl: Optional[float] = None,
+                 retrieval_mode: str = "dense", backend: str = "torch", **fusion_params):
         """Initialize the RAG system"""
+        if backend not in ENCODER_BACKENDS:
+            raise ValueError(f"Unknown encoder backend '{backend}'. Choose from: {', '.join(ENCODER_BACKENDS)}")
         self.model_name = model_name
         self.embedding_model = None
-        self.vector_index = None
+        # Why the model could not be loaded; loading is not retried on every query
+        self.embedding_model_error = None
+        self.backend = backend
+        # Quantized ONNX exports are written here once and reused
+        self.onnx_model_dir = ONNX_MODEL_DIR
+        self.onnx_quantization = None
+        self.query_cache = LRUCache(query_cache_size, query_cache_ttl)
+        self._vector_index = None
+        self._vector_index_path = None
         self.chunks_data = []
+        self._metadata_index = None
         self.problems_data = []
+        # Problem-level text is stored once and referenced from chunks by original_id
+        self.problem_texts = []
+        self._problem_rows = {}
+        # Normalized embeddings of the base chunks (memory-mapped after load_system())
+        self.embeddings = None
+        self._index_version = None
+        self.index_config = {"type": "flat"}
+        # Partitioning of a sharded index ({"num_shards", "partition", "index_params"}), None when unsharded
+        self.shard_config = None
         self.chunk_size = 200
         self.overlap_size = 50
+        self.chunk_mode = "characters"
+        self.chunk_tokens = None
+        self.overlap_tokens = 32
+        # Problems added/updated/removed since the base index was built
+        self._system_dir = None
+        self._delta = IndexDelta()
+        self._base_problem_rows = None
+        self._next_chunk_id = None
+        self.embedding_cache_stats = None
+        # BM25 index over chunk text, read or built on first lexical search
+        self._lexical_index = None
+        self._lexical_index_path = None
+        self._lexical_fallback_reported = False
+        self.retrieval_mode = "dense"
+        self.fusion = dict(FUSION_DEFAULTS)
+        self.set_retrieval_mode(retrieval_mode, **fusion_params)
+        self.reranker = None
+        self.rerank_config = dict(RERANK_DEFAULTS)
+        self.rerank_stats = {"reranked": 0, "skipped": 0}
+    
+    def set_retrieval_mode(self, mode: str, **fusion_params) -> None:
+        """
+        Choose dense, hybrid or lexical retrieval and adjust the hybrid fusion parameters
+        (method, dense_weight, rrf_k, candidates)
+        """
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{mode}'. Choose from: {', '.join(RETRIEVAL_MODES)}")
+        unknown = set(fusion_params) - set(FUSION_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unsupported fusion parameters: {', '.join(sorted(unknown))}")
         
-        if SENTENCE_TRANSFORMERS_AVAILABLE:
-            print(f"🤖 Loading embedding model: {model_name}")
-            self.embedding_model = SentenceTransformer(model_name)
+        fusion = {**self.fusion, **fusion_params}
+        if fusion["method"] not in FUSION_METHODS:
+            raise ValueError(f"Unknown fusion method '{fusion['method']}'. Choose from: {', '.join(FUSION_METHODS)}")
+        if not 0.0 <= fusion["dense_weight"] <= 1.0:
+            raise ValueError("dense_weight must be between 0 and 1")
+        self.retrieval_mode = mode
+        self.fusion = fusion
+    
+    def set_reranker(self, method: Optional[str] = None, candidates: int = 20, time_budget_ms: float = 50.0,
+                     **reranker_params) -> None:
+        """
+        Enable a second-stage reranker ("lexical" or "cross_encoder"; None disables it).
+        reranker_params go to the reranker, e.g. model_name for the cross-encoder.
+        """
+        if method is None:
+            self.reranker = None
+            return
+        if method not in RERANKERS:
+            raise ValueError(f"Unknown reranker '{method}'. Choose from: {', '.join(RERANKERS)}")
+        if candidates < 1 or time_budget_ms <= 0:
+            raise ValueError("candidates and time_budget_ms must be positive")
+        self.reranker = RERANKERS[method](**reranker_params)
+        self.rerank_config = {"candidates": candidates, "time_budget_ms": time_budget_ms}
+        self._prepare_reranker()
+    
+    def _prepare_reranker(self) -> None:
+        """
+        Hand the lexical reranker the current BM25 index, building it if needed. Runs before
+        any query's budget starts, so the build is never charged to a rerank.
+        """
+        if self.reranker is not None and self.reranker.name == "lexical":
+            self.reranker.lexical_index = self.lexical_index
+    
+    def set_chunk_mode(self, mode: str, chunk_tokens: Optional[int] = None, overlap_tokens: int = 32) -> None:
+        """
+        Chunk by characters or by model tokens; takes effect at the next process_and_chunk_data()
+        """
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"Unknown chunk mode '{mode}'. Choose from: {', '.join(CHUNK_MODES)}")
+        if chunk_tokens is not None and not 0 <= overlap_tokens < chunk_tokens:
+            raise ValueError("overlap_tokens must be at least 0 and smaller than chunk_tokens")
+        self.chunk_mode = mode
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+    
+    def model_token_budget(self) -> Optional[int]:
+        """
+        Tokens of text the embedding model reads before truncating (max sequence length minus
+        special tokens), or None without the model
+        """
+        model = self.get_embedding_model()
+        if model is None:
+            return None
+        tokenizer = model.tokenizer
+        special_tokens = tokenizer.num_special_tokens_to_add() if hasattr(tokenizer, 'num_special_tokens_to_add') else 2
+        return model.max_seq_length - special_tokens
+    
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        """BM25 index over the base chunks, loaded from disk or built on first access"""
+        if self._lexical_index is None and self._lexical_index_path:
+            index = BM25Index.load(self._lexical_index_path)
+            self._lexical_index_path = None
+            if len(index) == len(self.chunks_data):
+                self._lexical_index = index
+        if self._lexical_index is None and len(self.chunks_data):
+            print(f"🔄 Building BM25 index over {len(self.chunks_data)} chunks...")
+            if isinstance(self.chunks_data, ChunkStore):
+                texts = self.chunks_data.values('text')
+            else:
+                texts = (chunk['text'] for chunk in self.chunks_data)
+            self._lexical_index = BM25Index.build(texts)
+        return self._lexical_index
+    
+    def _reset_lexical_index(self) -> None:
+        self._lexical_index = None
+        self._lexical_index_path = None
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        """Version of the searchable contents: the base index plus the number of delta edits"""
+        if self._index_version is None or self._delta.is_empty:
+            return self._index_version
+        return f"{self._index_version}+{self._delta.num_ops}"
+    
+    @index_version.setter
+    def index_version(self, version: Optional[str]) -> None:
+        self._index_version = version
+    
+    @property
+    def vector_index(self):
+        """FAISS index, read from disk on first access after load_system()"""
+        if self._vector_index is None and self._vector_index_path and _import_faiss():
+            self._vector_index = faiss.read_index(self._vector_index_path)
+            self._vector_index_path = None
+            apply_search_params(self._vector_index, self.index_config)
+        return self._vector_index
+    
+    @vector_index.setter
+    def vector_index(self, index) -> None:
+        self._vector_index = index
+        self._vector_index_path = None
+    
+    @property
+    def encoder_id(self) -> str:
+        """Model name plus non-default backend, which keys cached document embeddings"""
+        return self.model_name if self.backend == "torch" else f"{self.model_name}@{self.backend}"
+    
+    def get_embedding_model(self):
+        """
+        Load the embedding model on first use. Returns None when sentence-transformers is
+        missing or the model cannot be loaded (e.g. it cannot be downloaded).
+        """
+        if self.embedding_model is None and self.embedding_model_error is None and _import_sentence_transformers():
+            print(f"🤖 Loading embedding model: {self.model_name} ({self.backend} backend)")
+            if self.backend != "torch":
+                try:
+                    self.embedding_model = self._load_onnx_model()
+                except Exception as e:
+                    print(f"❌ {self.backend} backend unavailable, using torch "
+                          f"(pip install sentence-transformers[onnx]): {e}")
+                    self.backend = "torch"
+            if self.embedding_model is None:
+                try:
+                    self.embedding_model = SentenceTransformer(self.model_name)
+                except Exception as e:
+                    self.embedding_model_error = str(e)
+                    print(f"❌ Could not load embedding model {self.model_name}: {e}")
+                    return None
             print("✅ Embedding model loaded successfully")
-        else:
-            print("❌ Cannot initialize embedding model - dependencies not available")
+        return self.embedding_model
+    
+    def _load_onnx_model(self):
+        """
+        The model on onnxruntime. For onnx_int8 the model is exported to ONNX with dynamic
+        int8 weight quantization on first use and the export is reused afterwards.
+        """
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, backend="onnx")
+        
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        quantization = self.onnx_quantization or default_onnx_quantization()
+        export_dir = os.path.join(self.onnx_model_dir, re.sub(r'[^A-Za-z0-9._-]+', '_', self.model_name))
+        file_name = f"onnx/model_qint8_{quantization}.onnx"
+        if not os.path.exists(os.path.join(export_dir, file_name)):
+            print(f"🔄 Exporting {self.model_name} to ONNX with int8 quantization ({quantization})...")
+            model = SentenceTransformer(self.model_name, backend="onnx")
+            model.save(export_dir)
+            export_dynamic_quantized_onnx_model(model, quantization, export_dir)
+            print(f"💾 Quantized model saved to {export_dir}/{file_name}")
+        return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+    
+    def warmup(self) -> bool:
+        """
+        Eagerly load the embedding model and vector index so the first query is fast.
+        Without them the BM25 index is loaded instead, so lexical search stays available.
+        """
+        if self.reranker is not None:
+            self._prepare_reranker()
+            self.reranker.warmup()
+        if self.retrieval_mode == "lexical" or not dependencies_available():
+            return self.lexical_index is not None
+        
+        model = self.get_embedding_model()
+        if model is None:
+            return self.lexical_index is not None
+        index = self.vector_index
+        if isinstance(index, ShardedIndex):
+            index.load()
+        if self.retrieval_mode == "hybrid":
+            self.lexical_index
+        
+        # Run one encode so lazy framework initialisation happens here, not on a user query
+        model.encode(["warmup"], convert_to_numpy=True)
+        
+        return index is not None or self.lexical_index is not None
     
-    def load_problems_data(self, json_file: str) -> None:
-        """Load problems dataset from JSON file"""
+    def load_problems_data(self, json_file) -> None:
+        """
+        Load problems dataset from JSON file.
+        A glob pattern such as "farmer_dataset_part_*.json" (or a list of paths) is not
+        read here: the files are streamed record by record when the data is processed.
+        """
+        if not isinstance(json_file, str) or any(char in json_file for char in '*?['):
+            try:
+                self.problems_data = ProblemFiles(json_file)
+            except FileNotFoundError as e:
+                print(f"❌ {e}")
+                print("Please run farmer_problems_generator.py first to create the dataset")
+                return
+            print(f"✅ Streaming problems from {len(self.problems_data.paths)} dataset files")
+            return
+        
         try:
             with open(json_file, 'r', encoding='utf-8') as f:
-                self.problems_data = json.load(f)
+                self.problems_data = [normalize_problem(record) for record in json.load(f)]
             print(f"✅ Loaded {len(self.problems_data)} problems from {json_file}")
         except FileNotFoundError:
             print(f"❌ File not found: {json_file}")
@@ -70,29 +641,42 @@ class FarmerRAGSystem:
     
     def chunk_text(self, text: str, chunk_size: int = 200, overlap: int = 50) -> List[str]:
         """
-        Break text into overlapping chunks
+        Break text into overlapping chunks.
+        Each chunk ends at the first sentence end (.!?) within 20 characters of chunk_size,
+        otherwise at the last whitespace before that point. Both boundaries are found with
+        one bounded regex search each instead of character loops.
+        When the chunk has no whitespace before that point (a word longer than the chunk),
+        it is cut at the boundary itself; the original character scan instead advanced one
+        character at a time and dropped the start of the word.
         """
         if len(text) <= chunk_size:
             return [text]
         
+        text_length = len(text)
         chunks = []
         start = 0
         
-        while start < len(text):
+        while start < text_length:
             end = start + chunk_size
             
-            # Try to break at sentence boundary
-            if end < len(text):
-                # Look for sentence endings near the chunk boundary
-                for i in range(end - 20, min(end + 20, len(text))):
-                    if text[i] in '.!?':
-                        end = i + 1
-                        break
+            if end < text_length:
+                # First sentence ending near the chunk boundary
+                match = SENTENCE_END_PATTERN.search(text, max(end - 20, 0), min(end + 20, text_length))
+                if match:
+                    end = match.end()
                 
-                # If no sentence boundary found, break at word boundary
-                if end >= len(text) or (end < len(text) and not text[end].isspace()):
-                    while end > start and not text[end].isspace():
-                        end -= 1
+                if end >= text_length:
+                    # Sentence ends with the text: take the rest
+                    end = text_length
+                elif not text[end].isspace():
+                    # Otherwise break at the last word boundary inside the chunk
+                    space = text.rfind(' ', start + 1, end)
+                    # Other whitespace (newlines, tabs) may follow the last space
+                    match = LAST_WHITESPACE_PATTERN.search(text, max(space, start) + 1, end)
+                    if match:
+                        end = match.start()
+                    elif space >= 0:
+                        end = space
             
             chunk = text[start:end].strip()
             if chunk:
@@ -100,53 +684,253 @@ class FarmerRAGSystem:
             
             # Move start position with overlap
             start = max(start + 1, end - overlap)
+        
+        return chunks
+    
+    def chunk_text_tokens(self, text: str, max_tokens: int, overlap_tokens: int = 32) -> List[str]:
+        """
+        Break text into chunks of at most max_tokens model tokens.
+        Chunks end after the last sentence that fits, or at a word boundary when a single
+        sentence is longer than the budget; the next chunk starts overlap_tokens tokens
+        earlier, moved forward to a word start. The text is tokenized once.
+        """
+        tokenizer = self.get_embedding_model().tokenizer
+        encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)
+        offsets = encoding['offset_mapping']
+        num_tokens = len(offsets)
+        if num_tokens <= max_tokens:
+            return [text.strip()] if text.strip() else []
+        
+        # Token positions where a sentence or a word ends, as exclusive token indexes
+        token_ends = [end for _, end in offsets]
+        sentence_boundaries = sorted({
+            bisect.bisect_left(token_ends, match.end()) + 1
+            for match in SENTENCE_BOUNDARY_PATTERN.finditer(text)
+        })
+        word_starts = [
+            i for i, (char_start, _) in enumerate(offsets)
+            if char_start > 0 and text[char_start - 1].isspace()
+        ]
+        
+        chunks = []
+        start = 0
+        end = 0
+        while start < num_tokens:
+            # Every chunk must reach past the previous one, not just re-cut its overlap
+            floor = max(start, end)
+            limit = start + max_tokens
+            if limit >= num_tokens:
+                end = num_tokens
+            else:
+                i = bisect.bisect_right(sentence_boundaries, limit) - 1
+                if i >= 0 and sentence_boundaries[i] > floor:
+                    end = sentence_boundaries[i]
+                else:
+                    i = bisect.bisect_right(word_starts, limit) - 1
+                    end = word_starts[i] if i >= 0 and word_starts[i] > floor else limit
             
-            if start >= len(text):
+            chunk = text[offsets[start][0]:offsets[end - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= num_tokens:
                 break
+            
+            # Overlap by up to overlap_tokens, starting on a word
+            next_start = max(start + 1, end - overlap_tokens)
+            i = bisect.bisect_left(word_starts, next_start)
+            start = word_starts[i] if i < len(word_starts) and word_starts[i] < end else end
         
         return chunks
     
-    def process_and_chunk_data(self) -> List[Dict]:
+    def split_text(self, text: str) -> List[str]:
+        """Chunk text in the configured chunk mode"""
+        if self.chunk_mode == "tokens":
+            return self.chunk_text_tokens(text, self.chunk_tokens, self.overlap_tokens)
+        return self.chunk_text(text, self.chunk_size, self.overlap_size)
+    
+    def process_and_chunk_data(self, problems: Optional[Iterable[Dict[str, Any]]] = None,
+                               num_workers: int = 0, batch_size: int = 256) -> List[Dict]:
         """
-        Process problems data and create chunks with metadata
+        Process problems data and create chunks with metadata.
+        Chunks only hold their own text span; the full problem and solution
+        are kept once per problem and looked up with get_problem().
+        problems may be any iterable (e.g. a generator) and defaults to problems_data.
+        num_workers > 0 (or -1 for one per core) chunks batches of batch_size problems
+        in worker processes; chunk ids are the same as in a serial run.
         """
-        print("🔄 Processing and chunking data...")
+        if not self._prepare_chunking():
+            return []
         chunks = []
-        chunk_id = 0
+        problem_texts = []
         
-        for problem_data in self.problems_data:
-            # Combine problem and solution for comprehensive context
-            full_text = f"{problem_data['problem']} {problem_data['solution']}"
-            
-            # Create chunks
-            text_chunks = self.chunk_text(full_text, self.chunk_size, self.overlap_size)
-            
-            for chunk_text in text_chunks:
-                chunk = {
-                    'chunk_id': chunk_id,
-                    'original_id': problem_data['id'],
-                    'text': chunk_text,
-                    'category': problem_data['category'],
-                    'crop': problem_data['crop'],
-                    'severity': problem_data.get('severity', 'medium'),
-                    'season': problem_data.get('season', 'all'),
-                    'region': problem_data.get('region', 'all'),
-                    'problem': problem_data['problem'],
-                    'solution': problem_data['solution'],
-                    'chunk_type': 'problem_solution'
-                }
-                chunks.append(chunk)
-                chunk_id += 1
+        problems = self.problems_data if problems is None else problems
+        for batch_records, batch_chunks in iter_chunk_batches(self, problems, num_workers, batch_size):
+            problem_texts.extend(batch_records)
+            chunks.extend(batch_chunks)
         
-        self.chunks_data = chunks
-        print(f"✅ Created {len(chunks)} chunks from {len(self.problems_data)} problems")
+        self._set_chunks(chunks, problem_texts)
+        print(f"✅ Created {len(chunks)} chunks from {len(problem_texts)} problems")
         return chunks
     
-    def create_embeddings(self) -> np.ndarray:
+    def process_and_embed_data(self, problems: Optional[Iterable[Dict[str, Any]]] = None, num_workers: int = -1,
+                               batch_size: int = 256, cache_dir: Optional[str] = "embedding_cache") -> np.ndarray:
+        """
+        Chunk and embed problems in one streaming pass: worker processes chunk batches
+        ahead while this process encodes the batches already chunked, so chunking
+        overlaps with encoding. Leaves the chunks in place like process_and_chunk_data()
+        and returns the embeddings for build_vector_index().
+        """
+        if self.get_embedding_model() is None:
+            print("❌ Cannot create embeddings - sentence-transformers not available")
+            return None
+        if not self._prepare_chunking():
+            return None
+        
+        cache = EmbeddingCache(cache_dir, self.encoder_id) if cache_dir else None
+        chunks = []
+        problem_texts = []
+        blocks = []
+        encoded = 0
+        
+        problems = self.problems_data if problems is None else problems
+        batches = iter_chunk_batches(self, problems, num_workers, batch_size)
+        for batch_number, (batch_records, batch_chunks) in enumerate(batches):
+            problem_texts.extend(batch_records)
+            chunks.extend(batch_chunks)
+            if batch_chunks:
+                embeddings, batch_encoded = self._encode_texts([chunk['text'] for chunk in batch_chunks], cache,
+                                                               show_progress_bar=False)
+                blocks.append(embeddings)
+                encoded += batch_encoded
+            if batch_number % 20 == 0:
+                print(f"   🔄 {len(problem_texts)} problems, {len(chunks)} chunks embedded")
+        
+        self._set_chunks(chunks, problem_texts)
+        if not chunks:
+            print("❌ No chunks were created")
+            return None
+        embeddings = np.vstack(blocks)
+        if cache is not None:
+            self.embedding_cache_stats = cache.stats()
+            print(f"📦 Embedding cache hit ratio: {self.embedding_cache_stats['hit_ratio']:.1%}, {encoded} chunks encoded")
+        print(f"✅ Created {len(chunks)} chunks from {len(problem_texts)} problems, embeddings shape: {embeddings.shape}")
+        return embeddings
+    
+    def _prepare_chunking(self) -> bool:
+        """
+        Resolve the token budget in token chunk mode and announce the chunking run
+        """
+        if self.chunk_mode == "tokens":
+            if self.get_embedding_model() is None:
+                print("❌ Token chunking needs the embedding model's tokenizer")
+                return False
+            if self.chunk_tokens is None:
+                self.chunk_tokens = self.model_token_budget()
+            print(f"🔄 Processing and chunking data into chunks of up to {self.chunk_tokens} tokens...")
+        else:
+            print("🔄 Processing and chunking data...")
+        return True
+    
+    def _set_chunks(self, chunks: List[Dict], problem_texts: List[Dict]) -> None:
         """
-        Create vector embeddings for all chunks
+        Install a freshly chunked corpus as the (unsaved) base
         """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        self.chunks_data = chunks
+        self._metadata_index = None
+        self._reset_lexical_index()
+        self.embeddings = None
+        self._set_problem_texts(problem_texts)
+        # A fresh corpus starts a new base that is not on disk yet
+        self._system_dir = None
+        self._reset_delta()
+    
+    def _chunk_problem(self, problem_data: Dict[str, Any], first_chunk_id: int) -> Tuple[Dict, List[Dict]]:
+        """
+        Split one problem into its text record and chunks numbered from first_chunk_id
+        """
+        # Combine problem and solution for comprehensive context
+        full_text = f"{problem_data['problem']} {problem_data['solution']}"
+        
+        problem_record = {
+            'id': problem_data['id'],
+            'problem': problem_data['problem'],
+            'solution': problem_data['solution']
+        }
+        
+        # Create chunks
+        text_chunks = self.split_text(full_text)
+        
+        chunks = []
+        for chunk_id, chunk_text in enumerate(text_chunks, first_chunk_id):
+            chunks.append({
+                'chunk_id': chunk_id,
+                'original_id': problem_data['id'],
+                'text': chunk_text,
+                'category': problem_data['category'],
+                'crop': problem_data['crop'],
+                'severity': problem_data.get('severity', 'medium'),
+                'season': problem_data.get('season', 'all'),
+                'region': problem_data.get('region', 'all'),
+                'chunk_type': 'problem_solution'
+            })
+        return problem_record, chunks
+    
+    def _set_problem_texts(self, problem_texts) -> None:
+        """
+        Install the problem text records (list or ChunkStore) and index them by problem id
+        """
+        self.problem_texts = problem_texts
+        if isinstance(problem_texts, ChunkStore):
+            problem_ids = problem_texts.values('id')
+        else:
+            problem_ids = [record['id'] for record in problem_texts]
+        self._problem_rows = {problem_id: row for row, problem_id in enumerate(problem_ids)}
+    
+    def _problem_texts_from_chunks(self) -> List[Dict]:
+        """
+        Recover problem text records from chunks saved with embedded problem/solution fields
+        """
+        records = {}
+        for chunk in self.chunks_data:
+            if 'problem' in chunk and chunk['original_id'] not in records:
+                records[chunk['original_id']] = {
+                    'id': chunk['original_id'],
+                    'problem': chunk['problem'],
+                    'solution': chunk['solution']
+                }
+        return list(records.values())
+    
+    def get_problem(self, original_id) -> Dict[str, Any]:
+        """
+        Problem-level record (id, problem, solution) for a chunk's original_id
+        """
+        if original_id in self._delta.problems:
+            return self._delta.problems[original_id]
+        row = self._problem_rows.get(original_id)
+        if row is None or original_id in self._delta.removed_problem_ids:
+            return {'id': original_id, 'problem': '', 'solution': ''}
+        return self.problem_texts[row]
+    
+    def create_embeddings(self, cache_dir: Optional[str] = "embedding_cache", num_workers: int = 0,
+                          threads_per_worker: int = 1, output_path: Optional[str] = None) -> np.ndarray:
+        """
+        Create vector embeddings for all chunks.
+        Embeddings are cached on disk in cache_dir by hash of (model name, chunk text),
+        so only new or changed chunks are encoded; pass cache_dir=None to disable.
+        num_workers > 0 (or -1 for one per core) streams the chunks in shards through a
+        process pool and writes them to a memory-mapped .npy at output_path, keeping
+        memory bounded for large corpora. The pool workers run the torch backend, so
+        the ONNX backends always encode in this process.
+        """
+        if num_workers and self.backend != "torch":
+            print(f"⚠️ Parallel embedding only runs the torch backend - encoding with {self.backend} in this process")
+            num_workers = 0
+        
+        if num_workers:
+            if not _import_sentence_transformers():
+                print("❌ Cannot create embeddings - sentence-transformers not available")
+                return None
+        elif self.get_embedding_model() is None:
             print("❌ Cannot create embeddings - sentence-transformers not available")
             return None
         
@@ -156,25 +940,96 @@ class FarmerRAGSystem:
         
         print("🔄 Creating embeddings for chunks...")
         
+        if num_workers:
+            cache = EmbeddingCache(cache_dir, self.encoder_id) if cache_dir else None
+            output_path = output_path or os.path.join(cache_dir or ".", "corpus_embeddings.npy")
+            embeddings = embed_texts_parallel(
+                (self.chunks_data[i]['text'] for i in range(len(self.chunks_data))),
+                len(self.chunks_data),
+                output_path,
+                self.model_name,
+                num_workers=None if num_workers < 0 else num_workers,
+                threads_per_worker=threads_per_worker,
+                cache=cache
+            )
+            if cache is not None:
+                self.embedding_cache_stats = cache.stats()
+                print(f"📦 Embedding cache hit ratio: {self.embedding_cache_stats['hit_ratio']:.1%}")
+            print(f"✅ Created embeddings with shape: {embeddings.shape}")
+            return embeddings
+        
         # Extract text from chunks
         texts = [chunk['text'] for chunk in self.chunks_data]
         
-        # Create embeddings
-        embeddings = self.embedding_model.encode(
-            texts, 
-            batch_size=32, 
-            show_progress_bar=True,
-            convert_to_numpy=True
-        )
+        if cache_dir:
+            embeddings = self._create_embeddings_cached(texts, cache_dir)
+        else:
+            # Create embeddings
+            embeddings = self.get_embedding_model().encode(
+                texts, 
+                batch_size=32, 
+                show_progress_bar=True,
+                convert_to_numpy=True
+            )
         
         print(f"✅ Created embeddings with shape: {embeddings.shape}")
         return embeddings
     
-    def build_vector_index(self, embeddings: np.ndarray) -> None:
+    def _create_embeddings_cached(self, texts: List[str], cache_dir: str) -> np.ndarray:
+        """
+        Embed texts through the on-disk embedding cache, encoding only the misses
+        """
+        cache = EmbeddingCache(cache_dir, self.encoder_id)
+        embeddings, encoded = self._encode_texts(texts, cache)
+        
+        self.embedding_cache_stats = cache.stats()
+        reused = self.embedding_cache_stats['hits']
+        print(f"📦 Embedding cache: {reused}/{len(texts)} chunks reused "
+              f"({self.embedding_cache_stats['hit_ratio']:.1%} hit ratio), {encoded} encoded")
+        return embeddings
+    
+    def _encode_texts(self, texts: List[str], cache: Optional[EmbeddingCache] = None,
+                      show_progress_bar: bool = True) -> Tuple[np.ndarray, int]:
+        """
+        Embed texts, taking cached vectors from cache and adding the new ones to it.
+        Returns the embeddings and the number of distinct texts encoded.
+        """
+        if cache is None:
+            embeddings = self.get_embedding_model().encode(
+                texts, batch_size=32, show_progress_bar=show_progress_bar, convert_to_numpy=True
+            )
+            return embeddings, len(texts)
+        
+        embeddings, missing = cache.lookup(texts)
+        
+        # Identical chunk texts are encoded once
+        missing_texts = list(dict.fromkeys(texts[i] for i in missing))
+        if missing_texts:
+            new_embeddings = self.get_embedding_model().encode(
+                missing_texts,
+                batch_size=32,
+                show_progress_bar=show_progress_bar,
+                convert_to_numpy=True
+            ).astype(np.float32)
+            cache.add(missing_texts, new_embeddings)
+            if embeddings is None:
+                embeddings = np.zeros((len(texts), new_embeddings.shape[1]), dtype=np.float32)
+            positions = {text: row for row, text in enumerate(missing_texts)}
+            for i in missing:
+                embeddings[i] = new_embeddings[positions[texts[i]]]
+        return embeddings, len(missing_texts)
+    
+    def build_vector_index(self, embeddings: np.ndarray, index_type: str = "flat", num_shards: int = 1,
+                           partition: str = "hash", **index_params) -> None:
         """
-        Build FAISS vector index for similarity search
+        Build FAISS vector index for similarity search.
+        index_type is one of INDEX_TYPES: "flat" (exact), "ivf_flat", "ivf_pq" or "hnsw";
+        index_params override that type's defaults (nlist, nprobe, pq_m, pq_bits,
+        hnsw_m, ef_construction, ef_search, quantization="fp16"/"int8").
+        num_shards > 1 splits the chunks over that many indexes, partitioned by
+        "hash" (of the problem id), "crop" or "category", searched in parallel.
         """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        if not _import_faiss():
             print("❌ Cannot build vector index - faiss not available")
             return
         
@@ -182,63 +1037,536 @@ class FarmerRAGSystem:
             print("❌ No embeddings provided")
             return
         
-        print("🔄 Building vector index...")
+        try:
+            config = resolve_index_config(index_type, len(embeddings), **index_params)
+        except ValueError as e:
+            print(f"❌ Invalid index configuration: {e}")
+            return
+        shard_config = None
+        if num_shards > 1:
+            if len(embeddings) != len(self.chunks_data):
+                print(f"❌ Cannot shard {len(embeddings)} embeddings over {len(self.chunks_data)} chunks")
+                return
+            shard_config = {"num_shards": num_shards, "partition": partition, "index_params": index_params}
         
-        # Create FAISS index
-        dimension = embeddings.shape[1]
-        self.vector_index = faiss.IndexFlatIP(dimension)  # Inner product similarity
+        quantization = f" ({config['quantization']})" if config.get("quantization") else ""
+        shards = f" in {num_shards} {partition} shards" if shard_config else ""
+        print(f"🔄 Building {index_type}{quantization} vector index{shards}...")
         
-        # Normalize embeddings for cosine similarity
+        # Normalize embeddings for cosine similarity (inner product on unit vectors)
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
         faiss.normalize_L2(embeddings)
         
-        # Add embeddings to index
-        self.vector_index.add(embeddings)
+        # Create, train and fill the FAISS index
+        try:
+            self.vector_index, config = self._create_index(embeddings, self.chunks_data, config, shard_config)
+        except ValueError as e:
+            print(f"❌ Cannot build {index_type} index: {e}")
+            return
+        self.index_config = config
+        self.shard_config = shard_config
+        # Kept so save_system() can store them and the index can be rebuilt without re-encoding
+        self.embeddings = embeddings
+        
+        # Every new index gets a new version so response caches keyed on it go stale
+        self.index_version = uuid.uuid4().hex
+        self._system_dir = None
+        self._reset_delta()
         
         print(f"✅ Built vector index with {self.vector_index.ntotal} vectors")
     
-    def query_to_vector(self, query: str) -> np.ndarray:
+    def _create_index(self, embeddings: np.ndarray, chunks, config: Dict[str, Any],
+                      shard_config: Optional[Dict[str, Any]]) -> Tuple[Any, Dict[str, Any]]:
         """
-        Convert query text to vector embedding
+        FAISS index (or ShardedIndex) over normalized embeddings whose rows match chunks,
+        and the index config to keep. Shard configs are resolved per shard size.
         """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE:
-            print("❌ Cannot convert query to vector - sentence-transformers not available")
-            return None
+        if shard_config is None:
+            return create_faiss_index(embeddings, config), config
+        
+        shard_rows = partition_rows(chunks, shard_config["num_shards"], shard_config["partition"])
+        indexes = []
+        for shard, rows in enumerate(shard_rows):
+            shard_index_config = resolve_index_config(config["type"], len(rows), **shard_config["index_params"])
+            indexes.append(create_faiss_index(np.ascontiguousarray(embeddings[rows]), shard_index_config))
+            print(f"   🧩 Shard {shard}: {len(rows)} vectors")
+        # Query-time settings (nprobe, ef_search) are shared; nlist is resolved for the largest shard
+        config = resolve_index_config(config["type"], max(len(rows) for rows in shard_rows),
+                                      **shard_config["index_params"])
+        return ShardedIndex(shard_rows, indexes, embeddings.shape[1], shard_config["partition"],
+                            on_load=self._apply_search_params), config
+    
+    def _apply_search_params(self, index) -> None:
+        apply_search_params(index, self.index_config)
+    
+    def rebuild_index_from_embeddings(self, index_type: str = "flat", num_shards: Optional[int] = None,
+                                      partition: Optional[str] = None, **index_params) -> bool:
+        """
+        Rebuild the vector index from the stored embeddings instead of re-encoding every
+        chunk, e.g. to switch index type or quantization or to replace a corrupt index.
+        Takes the same arguments as build_vector_index(); num_shards and partition default
+        to the current sharding. Call save_system() to persist.
+        """
+        if not self._delta.is_empty and not self._compact_delta():
+            return False
         
-        # Create embedding for query
-        query_embedding = self.embedding_model.encode([query], convert_to_numpy=True)
+        if self.embeddings is None:
+            print("❌ No stored embeddings - run create_embeddings() and build_vector_index() first")
+            return False
+        if len(self.embeddings) != len(self.chunks_data):
+            print(f"❌ Stored embeddings cover {len(self.embeddings)} chunks, the system has {len(self.chunks_data)}")
+            return False
         
-        # Normalize for cosine similarity
-        faiss.normalize_L2(query_embedding)
+        previous_version = self._index_version
+        if num_shards is None:
+            num_shards = self.shard_config["num_shards"] if self.shard_config else 1
+        if partition is None:
+            partition = self.shard_config["partition"] if self.shard_config else "hash"
         
-        return query_embedding
+        # A float32 copy: build_vector_index normalizes in place and stored embeddings may be float16
+        self.build_vector_index(np.array(self.embeddings, dtype=np.float32), index_type, num_shards, partition,
+                                **index_params)
+        return self._index_version != previous_version
+    
+    def query_to_vector(self, query: str) -> np.ndarray:
+        """
+        Convert query text to vector embedding
+        """
+        return self.queries_to_vectors([query])
     
-    def search_similar_chunks(self, query: str, top_k: int = 5) -> List[Dict]:
+    def normalize_query_text(self, query: str) -> str:
         """
-        Search for similar chunks using vector similarity
+        Canonical form of a query, used as the embedding cache key and encoded in its place.
+        Repeated whitespace never changes the embedding; case only does not when the
+        model lowercases its input (e.g. the uncased all-MiniLM-L6-v2).
         """
-        if not SENTENCE_TRANSFORMERS_AVAILABLE or self.vector_index is None:
-            print("❌ Vector search not available")
-            return []
+        query = " ".join(query.split())
+        return query.lower() if self._model_lowercases() else query
+    
+    def _model_lowercases(self) -> bool:
+        """
+        Whether the embedding model lowercases its input (do_lower_case on the tokenizer
+        or the sentence-transformers module). Unknown or unavailable models count as cased.
+        """
+        model = self.get_embedding_model()
+        if model is None:
+            return False
+        tokenizer = getattr(model, 'tokenizer', None)
+        if getattr(tokenizer, 'do_lower_case', False) or getattr(tokenizer, 'init_kwargs', {}).get('do_lower_case'):
+            return True
+        first_module = model._first_module() if hasattr(model, '_first_module') else None
+        return bool(getattr(first_module, 'do_lower_case', False))
+    
+    def queries_to_vectors(self, queries: List[str]) -> np.ndarray:
+        """
+        Convert several queries to vector embeddings in one batched forward pass.
+        Queries already in the embedding cache skip the model entirely.
+        """
+        if not _import_faiss():
+            print("❌ Cannot convert query to vector - faiss not available")
+            return None
         
-        # Convert query to vector
-        query_vector = self.query_to_vector(query)
-        if query_vector is None:
-            return []
+        keys = [self.normalize_query_text(query) for query in queries]
+        vectors = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+            else:
+                missing.append(key)
         
-        # Search for similar vectors
-        similarities, indices = self.vector_index.search(query_vector, top_k)
+        if missing:
+            if self.get_embedding_model() is None:
+                print("❌ Cannot convert query to vector - sentence-transformers not available")
+                return None
+            
+            # Create embeddings for all uncached queries at once
+            new_embeddings = self.embedding_model.encode(missing, convert_to_numpy=True).astype(np.float32)
+            
+            # Normalize for cosine similarity
+            faiss.normalize_L2(new_embeddings)
+            
+            for key, vector in zip(missing, new_embeddings):
+                # Copy each row so a cached vector does not pin the whole batch matrix
+                vector = vector.copy()
+                vector.flags.writeable = False
+                vectors[key] = vector
+                self.query_cache.put(key, vector)
         
-        # Get corresponding chunks
+        # Stack into a fresh matrix so callers can never modify cached vectors
+        return np.vstack([vectors[key] for key in keys])
+    
+    def _collect_chunks(self, similarities: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        """
+        Turn one row of FAISS search output into ranked chunk results
+        """
         results = []
-        for i, (similarity, idx) in enumerate(zip(similarities[0], indices[0])):
-            if idx < len(self.chunks_data):  # Valid index
-                chunk = self.chunks_data[idx].copy()
+        for i, (similarity, idx) in enumerate(zip(similarities, indices)):
+            if 0 <= idx < self._delta.num_rows:  # Valid index (FAISS pads with -1)
+                chunk = self._row_chunk(idx)
                 chunk['similarity_score'] = float(similarity)
                 chunk['rank'] = i + 1
                 results.append(chunk)
         
         return results
     
+    def _row_chunk(self, row: int) -> Dict[str, Any]:
+        """
+        Chunk dict for a row of the combined base + delta row space, safe to modify
+        """
+        if row >= len(self.chunks_data):
+            return dict(self._delta.chunk(row))
+        chunk = self.chunks_data[row]
+        # ChunkStore builds a fresh dict per lookup; in-memory chunks are shared
+        if not isinstance(self.chunks_data, ChunkStore):
+            chunk = dict(chunk)
+        return chunk
+    
+    def search_similar_chunks(self, query: str, top_k: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Search for similar chunks using vector similarity.
+        filters restricts the search to chunks whose metadata matches, e.g.
+        {"crop": "rice", "season": "kharif", "region": ["east", "north"]}.
+        """
+        return self.search_batch([query], top_k, filters)[0]
+    
+    def search_batch(self, queries: List[str], top_k: int = 5,
+                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict]]:
+        """
+        Search similar chunks for several queries with one encode call and one FAISS search,
+        then rerank each query's candidates when a reranker is set
+        """
+        if self.reranker is None:
+            return self._retrieve_batch(queries, top_k, filters)
+        
+        num_candidates = max(top_k, self.rerank_config["candidates"])
+        batch_candidates = self._retrieve_batch(queries, num_candidates, filters)
+        # An index edit drops the BM25 index; rebuild it before the clock starts
+        self._prepare_reranker()
+        
+        # The budget covers reranking only. Every query adds its budget; time a query
+        # leaves unused carries over to the next
+        start = time.perf_counter()
+        budget = self.rerank_config["time_budget_ms"] / 1000.0
+        return [
+            self._rerank(query, candidates, top_k, deadline=start + budget * (i + 1))
+            for i, (query, candidates) in enumerate(zip(queries, batch_candidates))
+        ]
+    
+    def _rerank(self, query: str, candidates: List[Dict], top_k: int, deadline: float) -> List[Dict]:
+        """
+        Reorder one query's first-stage candidates by reranker score, keeping the
+        first-stage order if the deadline passes first
+        """
+        if len(candidates) <= 1:
+            return candidates[:top_k]
+        
+        scores = None
+        if time.perf_counter() < deadline:
+            scores = self.reranker.score(query, [chunk['text'] for chunk in candidates], deadline)
+        if scores is None:
+            self.rerank_stats["skipped"] += 1
+            return candidates[:top_k]
+        
+        self.rerank_stats["reranked"] += 1
+        results = []
+        for rank, position in enumerate(np.argsort(-scores, kind='stable')[:top_k], 1):
+            chunk = candidates[position]
+            # similarity_score stays the first-stage score that confidence is computed from
+            chunk['rerank_score'] = float(scores[position])
+            chunk['first_stage_rank'] = chunk['rank']
+            chunk['rank'] = rank
+            results.append(chunk)
+        return results
+    
+    def _retrieve_batch(self, queries: List[str], top_k: int,
+                        filters: Optional[Dict[str, Any]]) -> List[List[Dict]]:
+        """
+        First-stage retrieval: dense, hybrid or lexical depending on retrieval_mode.
+        Without the embedding model (not installed or failing to load) or vector index,
+        the BM25 lexical index answers instead.
+        """
+        if not queries:
+            return []
+        
+        mode = self.retrieval_mode
+        if mode != "lexical" and (self.vector_index is None or not dependencies_available()
+                                  or self.get_embedding_model() is None):
+            if self.lexical_index is None:
+                print("❌ Vector search not available")
+                return [[] for _ in queries]
+            if not self._lexical_fallback_reported:
+                print("⚠️ Vector search not available - falling back to BM25 lexical search")
+                self._lexical_fallback_reported = True
+            mode = "lexical"
+        
+        # Resolve metadata filters and removed problems to row restrictions before touching the model
+        selected = self.select_chunks(filters)
+        if selected is not None and len(selected) == 0:
+            return [[] for _ in queries]
+        excluded = None
+        if selected is None and self._delta.deleted_rows:
+            deleted = self._delta.deleted_array()
+            excluded = deleted[:np.searchsorted(deleted, len(self.chunks_data))]
+            if len(excluded) == 0:
+                excluded = None
+        
+        if mode == "lexical":
+            results = []
+            for query in queries:
+                scores, rows = self._lexical_search(query, top_k, selected, excluded)
+                results.append(self._collect_chunks(scores, rows))
+            return results
+        
+        # Convert queries to a stacked matrix of vectors
+        query_vectors = self.queries_to_vectors(queries)
+        if query_vectors is None:
+            return [[] for _ in queries]
+        
+        if mode == "dense":
+            similarities, indices = self._dense_search(query_vectors, top_k, selected, excluded)
+            return [self._collect_chunks(similarities[row], indices[row]) for row in range(len(queries))]
+        
+        num_candidates = max(top_k, self.fusion["candidates"])
+        similarities, indices = self._dense_search(query_vectors, num_candidates, selected, excluded)
+        return [
+            self._fuse_results(queries[row], query_vectors[row], similarities[row], indices[row],
+                               top_k, num_candidates, selected, excluded)
+            for row in range(len(queries))
+        ]
+    
+    def _dense_search(self, query_vectors: np.ndarray, top_k: int, selected: Optional[np.ndarray],
+                      excluded: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nearest chunk rows from the base index merged with the delta, as FAISS-style
+        (similarities, indices) matrices padded with -1
+        """
+        num_base = len(self.chunks_data)
+        
+        # Search the base index
+        index = self.vector_index
+        delta_selected = None
+        if selected is not None:
+            split = int(np.searchsorted(selected, num_base))
+            selected, delta_selected = selected[:split], selected[split:]
+        
+        if isinstance(index, ShardedIndex):
+            # Scatter to the shards holding candidate rows, merge their top_k lists
+            if selected is None or len(selected):
+                similarities, indices = index.search(query_vectors, top_k, self._search_index, selected, excluded)
+            else:
+                similarities = np.full((len(query_vectors), top_k), -np.inf, dtype=np.float32)
+                indices = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        elif selected is None:
+            if excluded is None:
+                similarities, indices = index.search(query_vectors, top_k)
+            else:
+                similarities, indices = self._filtered_search(query_vectors, top_k, excluded=excluded)
+        else:
+            if len(selected):
+                similarities, indices = self._filtered_search(query_vectors, top_k, selected)
+            else:
+                similarities = np.full((len(query_vectors), top_k), -np.inf, dtype=np.float32)
+                indices = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        
+        # Merge in problems added since the base index was built
+        delta_index = self._delta.index
+        if delta_index is not None and delta_index.ntotal and (delta_selected is None or len(delta_selected)):
+            delta_similarities, delta_indices = self._delta.search(query_vectors, top_k, delta_selected)
+            similarities = np.hstack([similarities, delta_similarities])
+            indices = np.hstack([indices, delta_indices])
+            similarities[indices < 0] = -np.inf
+            order = np.argsort(-similarities, axis=1, kind='stable')[:, :top_k]
+            similarities = np.take_along_axis(similarities, order, axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+        
+        return similarities, indices
+    
+    def _lexical_search(self, query: str, top_k: int, selected: Optional[np.ndarray],
+                        excluded: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Best BM25 matches for one query as (scores, rows), with scores divided by the
+        query's maximum attainable score so they fall in 0..1 like cosine similarities
+        """
+        index = self.lexical_index
+        max_score = index.max_score(query) if index is not None else 0.0
+        if max_score == 0.0:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        
+        num_base = len(self.chunks_data)
+        if selected is None:
+            delta_rows = [row for row in range(num_base, self._delta.num_rows) if row not in self._delta.deleted_rows]
+        else:
+            split = int(np.searchsorted(selected, num_base))
+            selected, delta_rows = selected[:split], selected[split:].tolist()
+        scores, rows = BM25Index.top_k(index.score_all(query), top_k, selected, excluded)
+        
+        # Chunks added since the index was built are scored with the base term statistics
+        if delta_rows:
+            delta_scores = np.array([index.score_text(query, self._delta.chunk(row)['text']) for row in delta_rows])
+            scores = np.concatenate([scores, delta_scores])
+            rows = np.concatenate([rows, np.array(delta_rows, dtype=np.int64)])
+            order = np.argsort(-scores, kind='stable')
+            order = order[scores[order] > 0][:top_k]
+            scores, rows = scores[order], rows[order]
+        
+        return scores / max_score, rows
+    
+    def _row_vectors(self, rows: List[int]) -> Optional[np.ndarray]:
+        """
+        Normalized vectors of chunk rows without running the model (None when the base
+        index only keeps approximate codes and no embeddings are stored)
+        """
+        num_base = len(self.chunks_data)
+        base_rows = np.array([row for row in rows if row < num_base], dtype=np.int64)
+        base_vectors = None
+        if len(base_rows):
+            base_vectors = self._base_vectors(base_rows, reembed=False)
+            if base_vectors is None:
+                return None
+        
+        vectors, position = [], 0
+        for row in rows:
+            if row < num_base:
+                vectors.append(base_vectors[position])
+                position += 1
+            else:
+                vectors.append(self._delta.vector(row))
+        return np.vstack(vectors)
+    
+    def _fuse_results(self, query: str, query_vector: np.ndarray, similarities: np.ndarray, indices: np.ndarray,
+                      top_k: int, num_candidates: int, selected: Optional[np.ndarray],
+                      excluded: Optional[np.ndarray]) -> List[Dict]:
+        """
+        Combine one query's dense and BM25 candidates into a single ranking
+        """
+        valid = indices >= 0
+        dense = dict(zip(indices[valid].tolist(), similarities[valid].tolist()))
+        lexical_scores, lexical_rows = self._lexical_search(query, num_candidates, selected, excluded)
+        lexical = dict(zip(lexical_rows.tolist(), lexical_scores.tolist()))
+        
+        # Lexical-only candidates still get their cosine similarity when the vectors are at hand
+        missing = [row for row in lexical if row not in dense]
+        if missing:
+            vectors = self._row_vectors(missing)
+            if vectors is not None:
+                dense.update(zip(missing, (vectors @ query_vector).tolist()))
+        
+        candidates = list(dict.fromkeys(list(dense) + list(lexical)))
+        weight = self.fusion["dense_weight"]
+        blended = {
+            row: weight * dense.get(row, 0.0) + (1 - weight) * lexical.get(row, 0.0)
+            for row in candidates
+        }
+        
+        if self.fusion["method"] == "rrf":
+            rrf_k = self.fusion["rrf_k"]
+            fused = dict.fromkeys(candidates, 0.0)
+            for scores in (dense, lexical):
+                for rank, row in enumerate(sorted(scores, key=scores.get, reverse=True), 1):
+                    fused[row] += 1.0 / (rrf_k + rank)
+        else:
+            fused = blended
+        
+        results = []
+        for rank, row in enumerate(sorted(candidates, key=fused.get, reverse=True)[:top_k], 1):
+            chunk = self._row_chunk(row)
+            # The blend stays on the cosine-like 0..1 scale that confidence thresholds expect
+            chunk['similarity_score'] = float(blended[row])
+            chunk['dense_score'] = float(dense.get(row, 0.0))
+            chunk['lexical_score'] = float(lexical.get(row, 0.0))
+            chunk['rank'] = rank
+            results.append(chunk)
+        return results
+    
+    def select_chunks(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Chunk positions matching the metadata filters (None when nothing is filtered).
+        Positions of chunks added since the base index was built follow the base chunks;
+        removed problems never match.
+        """
+        if not filters:
+            return None
+        if self._metadata_index is None or self._metadata_index.num_chunks != len(self.chunks_data):
+            self._metadata_index = MetadataIndex(self.chunks_data)
+        selected = self._metadata_index.select(filters)
+        if selected is None:
+            return None
+        
+        if self._delta.chunks:
+            normalized = MetadataIndex.normalize_filters(filters)
+            added = [
+                row for row in range(len(self.chunks_data), self._delta.num_rows)
+                if MetadataIndex.matches(self._delta.chunk(row), normalized)
+            ]
+            selected = np.concatenate([selected, np.array(added, dtype=np.int64)])
+        if self._delta.deleted_rows:
+            selected = np.setdiff1d(selected, self._delta.deleted_array(), assume_unique=True)
+        return selected
+    
+    def _search_index(self, index, query_vectors: np.ndarray, top_k: int, selected: Optional[np.ndarray],
+                      excluded: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search one shard with shard-local selected/excluded ids
+        """
+        if selected is None and excluded is None:
+            return index.search(query_vectors, top_k)
+        return self._filtered_search(query_vectors, top_k, selected, excluded, index=index)
+    
+    def _filtered_search(self, query_vectors: np.ndarray, top_k: int, selected: Optional[np.ndarray] = None,
+                         excluded: Optional[np.ndarray] = None, index=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        FAISS search restricted to the selected chunk ids (or to everything but the excluded
+        ids) with an ID selector, so only the matching subset is scored. Approximate indexes
+        widen nprobe/efSearch until each query gets a full top_k; HNSW finally falls back to
+        exact search over the subset. index defaults to the (unsharded) vector index.
+        """
+        if index is None:
+            index = self.vector_index
+        index_type = self.index_config.get("type", "flat")
+        if selected is not None:
+            wanted = min(top_k, len(selected))
+            selector = faiss.IDSelectorBatch(selected)
+        else:
+            wanted = min(top_k, index.ntotal - len(excluded))
+            excluded_selector = faiss.IDSelectorBatch(excluded)
+            selector = faiss.IDSelectorNot(excluded_selector)
+        
+        if index_type in ("ivf_flat", "ivf_pq"):
+            ivf = faiss.extract_index_ivf(index)
+            probes = self.index_config.get("nprobe", ivf.nprobe)
+            while True:
+                params = faiss.SearchParametersIVF(sel=selector, nprobe=probes)
+                similarities, indices = index.search(query_vectors, top_k, params=params)
+                if probes >= ivf.nlist or np.all((indices >= 0).sum(axis=1) >= wanted):
+                    return similarities, indices
+                probes = min(probes * 4, ivf.nlist)
+        
+        if index_type == "hnsw":
+            ef_search = max(self.index_config.get("ef_search", 64), top_k)
+            for _ in range(3):
+                params = faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+                similarities, indices = index.search(query_vectors, top_k, params=params)
+                if np.all((indices >= 0).sum(axis=1) >= wanted):
+                    return similarities, indices
+                ef_search *= 4
+            
+            # Very selective filters starve graph traversal: score the subset exactly
+            if selected is None:
+                selected = np.setdiff1d(np.arange(index.ntotal), excluded, assume_unique=True)
+            subset_vectors = index.reconstruct_batch(selected)
+            scores = query_vectors @ subset_vectors.T
+            order = np.argsort(-scores, axis=1)[:, :top_k]
+            similarities = np.full((len(query_vectors), top_k), -np.inf, dtype=np.float32)
+            indices = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+            similarities[:, :order.shape[1]] = np.take_along_axis(scores, order, axis=1)
+            indices[:, :order.shape[1]] = selected[order]
+            return similarities, indices
+        
+        # Flat indexes are exhaustive over the selected ids
+        return index.search(query_vectors, top_k, params=faiss.SearchParameters(sel=selector))
+    
     def enhance_query(self, query: str) -> str:
         """
         Enhance user query with farming context
@@ -260,7 +1588,8 @@ class FarmerRAGSystem:
         
         return enhanced_query
     
-    def generate_response(self, query: str, top_k: int = 3) -> Dict[str, Any]:
+    def generate_response(self, query: str, top_k: int = 3,
+                          filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Generate response using RAG approach
         """
@@ -268,8 +1597,28 @@ class FarmerRAGSystem:
         enhanced_query = self.enhance_query(query)
         
         # Search for relevant chunks
-        relevant_chunks = self.search_similar_chunks(enhanced_query, top_k)
+        relevant_chunks = self.search_similar_chunks(enhanced_query, top_k, filters)
+        
+        return self._compose_response(query, enhanced_query, relevant_chunks)
+    
+    def generate_responses(self, queries: List[str], top_k: int = 3,
+                           filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Generate responses for several queries with one batched search
+        """
+        enhanced_queries = [self.enhance_query(query) for query in queries]
         
+        batch_chunks = self.search_batch(enhanced_queries, top_k, filters)
+        
+        return [
+            self._compose_response(query, enhanced_query, relevant_chunks)
+            for query, enhanced_query, relevant_chunks in zip(queries, enhanced_queries, batch_chunks)
+        ]
+    
+    def _compose_response(self, query: str, enhanced_query: str, relevant_chunks: List[Dict]) -> Dict[str, Any]:
+        """
+        Build the final response from retrieved chunks
+        """
         if not relevant_chunks:
             return {
                 "query": query,
@@ -285,18 +1634,19 @@ class FarmerRAGSystem:
         
         seen_solutions = set()
         for chunk in relevant_chunks:
-            if chunk['solution'] not in seen_solutions:
-                solutions.append(chunk['solution'])
-                problems.append(chunk['problem'])
+            problem_record = self.get_problem(chunk['original_id'])
+            if problem_record['solution'] not in seen_solutions:
+                solutions.append(problem_record['solution'])
+                problems.append(problem_record['problem'])
                 sources.append({
                     'problem_id': chunk['original_id'],
                     'category': chunk['category'],
                     'crop': chunk['crop'],
                     'similarity': chunk['similarity_score'],
-                    'problem': chunk['problem'],
-                    'solution': chunk['solution']
+                    'problem': problem_record['problem'],
+                    'solution': problem_record['solution']
                 })
-                seen_solutions.add(chunk['solution'])
+                seen_solutions.add(problem_record['solution'])
         
         # Generate comprehensive response
         if len(solutions) == 1:
@@ -327,38 +1677,330 @@ class FarmerRAGSystem:
             "num_sources": len(sources)
         }
     
-    def save_system(self, save_dir: str = "rag_system") -> None:
+    def _reset_delta(self) -> None:
+        """
+        Start an empty delta over the current base chunks
+        """
+        self._delta = IndexDelta(len(self.chunks_data), self._system_dir)
+        self._base_problem_rows = None
+        self._next_chunk_id = None
+    
+    def _base_rows_for_problem(self, problem_id) -> List[int]:
+        """
+        Base chunk rows belonging to a problem
+        """
+        if self._base_problem_rows is None:
+            if isinstance(self.chunks_data, ChunkStore):
+                original_ids = self.chunks_data.values('original_id')
+            else:
+                original_ids = [chunk['original_id'] for chunk in self.chunks_data]
+            rows = {}
+            for row, original_id in enumerate(original_ids):
+                rows.setdefault(original_id, []).append(row)
+            self._base_problem_rows = rows
+        return self._base_problem_rows.get(problem_id, [])
+    
+    def _problem_exists(self, problem_id) -> bool:
+        """
+        Whether a problem is currently searchable (in the base or added since)
+        """
+        if problem_id in self._delta.problems:
+            return True
+        return problem_id in self._problem_rows and problem_id not in self._delta.removed_problem_ids
+    
+    def _allocate_chunk_ids(self, count: int) -> int:
+        """
+        Reserve count new chunk ids (never reused, so chunk ids stay stable) and return the first
+        """
+        if self._next_chunk_id is None:
+            if isinstance(self.chunks_data, ChunkStore):
+                chunk_ids = self.chunks_data.values('chunk_id')
+            else:
+                chunk_ids = [chunk['chunk_id'] for chunk in self.chunks_data]
+            chunk_ids += [chunk['chunk_id'] for chunk in self._delta.chunks]
+            self._next_chunk_id = max(chunk_ids, default=-1) + 1
+        first_chunk_id = self._next_chunk_id
+        self._next_chunk_id += count
+        return first_chunk_id
+    
+    def _embed_problems(self, problems: List[Dict[str, Any]]) -> Optional[List[Tuple[Dict, List[Dict], np.ndarray]]]:
+        """
+        Chunk and embed problems in one batch: (text record, chunks, normalized vectors) per problem
+        """
+        if self.vector_index is None:
+            print("❌ No vector index - build or load a RAG system first")
+            return None
+        if self.get_embedding_model() is None:
+            print("❌ Cannot embed problems - sentence-transformers not available")
+            return None
+        
+        if not problems:
+            return []
+        
+        prepared = []
+        for problem_data in problems:
+            problem_record, chunks = self._chunk_problem(normalize_problem(problem_data), 0)
+            prepared.append((problem_record, chunks))
+        
+        texts = [chunk['text'] for _, chunks in prepared for chunk in chunks]
+        embeddings = self.embedding_model.encode(texts, batch_size=32, convert_to_numpy=True).astype(np.float32)
+        if embeddings.shape[1] != self.vector_index.d:
+            raise ValueError(f"Model produces {embeddings.shape[1]}-d embeddings but the index holds {self.vector_index.d}-d vectors")
+        faiss.normalize_L2(embeddings)
+        
+        results = []
+        offset = 0
+        for problem_record, chunks in prepared:
+            # Chunk ids are only handed out once embedding succeeded
+            first_chunk_id = self._allocate_chunk_ids(len(chunks))
+            for position, chunk in enumerate(chunks):
+                chunk['chunk_id'] = first_chunk_id + position
+            results.append((problem_record, chunks, embeddings[offset:offset + len(chunks)]))
+            offset += len(chunks)
+        return results
+    
+    def add_problems(self, problems: List[Dict[str, Any]]) -> int:
+        """
+        Add new problems without rebuilding the index: only their chunks are embedded,
+        into an ID-mapped delta index searched alongside the base index. Changes are
+        appended to the delta log of the system directory (when loaded or saved) and
+        folded into the base by compact(). Returns the number of chunks added.
+        """
+        problems = list(problems)
+        seen = set()
+        for problem_data in problems:
+            problem_id = problem_data['id']
+            if problem_id in seen or self._problem_exists(problem_id):
+                raise ValueError(f"Problem {problem_id} already exists - use update_problem() to change it")
+            seen.add(problem_id)
+        
+        prepared = self._embed_problems(problems)
+        if prepared is None:
+            return 0
+        
+        for problem_record, chunks, vectors in prepared:
+            self._delta.add(problem_record, chunks, vectors)
+        
+        num_chunks = sum(len(chunks) for _, chunks, _ in prepared)
+        print(f"✅ Added {len(problems)} problems ({num_chunks} chunks) to the index")
+        return num_chunks
+    
+    def update_problem(self, problem_data: Dict[str, Any]) -> int:
+        """
+        Replace an existing problem's text and metadata; its old chunks stop matching
+        and the new ones are embedded. Returns the number of chunks added.
+        """
+        problem_id = problem_data['id']
+        if not self._problem_exists(problem_id):
+            raise KeyError(f"Problem {problem_id} not found - use add_problems() to add it")
+        
+        # Embed first so a failure leaves the old version searchable
+        prepared = self._embed_problems([problem_data])
+        if prepared is None:
+            return 0
+        
+        self.remove_problem(problem_id)
+        problem_record, chunks, vectors = prepared[0]
+        self._delta.add(problem_record, chunks, vectors)
+        print(f"✅ Updated problem {problem_id} ({len(chunks)} chunks)")
+        return len(chunks)
+    
+    def remove_problem(self, problem_id) -> bool:
+        """
+        Remove a problem from search results. Returns False if it does not exist.
+        """
+        if not self._problem_exists(problem_id):
+            return False
+        self._delta.remove(problem_id, self._base_rows_for_problem(problem_id))
+        return True
+    
+    def _base_vectors(self, rows: np.ndarray, reembed: bool = True) -> Optional[np.ndarray]:
+        """
+        Normalized vectors of base chunk rows: taken from the stored embeddings, read back
+        from indexes that store them exactly, or re-embedded from the chunk text (unless reembed is False)
+        """
+        if self.embeddings is not None and len(self.embeddings) == len(self.chunks_data):
+            vectors = np.array(self.embeddings[rows], dtype=np.float32)
+            faiss.normalize_L2(vectors)
+            return vectors
+        
+        index = self.vector_index
+        index_type = self.index_config.get("type", "flat")
+        if not self.index_config.get("quantization") and index_type != "ivf_pq":
+            if index_type == "ivf_flat" and not isinstance(index, ShardedIndex):
+                faiss.extract_index_ivf(index).make_direct_map()
+            return index.reconstruct_batch(rows.astype(np.int64))
+        
+        if not reembed:
+            return None
+        if self.get_embedding_model() is None:
+            print("❌ Cannot re-embed chunks - sentence-transformers not available")
+            return None
+        print(f"🔄 Re-embedding {len(rows)} chunks from the {index_type} index...")
+        texts = [self.chunks_data[row]['text'] for row in rows]
+        embeddings = self.embedding_model.encode(texts, batch_size=32, show_progress_bar=True,
+                                                 convert_to_numpy=True).astype(np.float32)
+        faiss.normalize_L2(embeddings)
+        return embeddings
+    
+    def _compact_delta(self) -> bool:
+        """
+        Fold the delta into a new in-memory base index; live chunks keep their chunk ids
+        """
+        delta = self._delta
+        num_base = len(self.chunks_data)
+        base_rows = np.setdiff1d(np.arange(num_base, dtype=np.int64), delta.deleted_array(), assume_unique=True)
+        added_rows = [row for row in range(num_base, delta.num_rows) if row not in delta.deleted_rows]
+        if len(base_rows) + len(added_rows) == 0:
+            print("❌ Cannot compact - no chunks would remain in the index")
+            return False
+        
+        print(f"🔄 Compacting {delta.num_ops} index changes into a new base index...")
+        base_vectors = self._base_vectors(base_rows)
+        if base_vectors is None:
+            return False
+        vectors = np.ascontiguousarray(
+            np.vstack([base_vectors] + [delta.vector(row)[None, :] for row in added_rows]), dtype=np.float32
+        )
+        
+        chunks = [self._row_chunk(row) for row in base_rows] + [dict(delta.chunk(row)) for row in added_rows]
+        try:
+            vector_index, index_config = self._create_index(vectors, chunks, self.index_config, self.shard_config)
+        except ValueError as e:
+            print(f"❌ Cannot rebuild {self.index_config.get('type')} index: {e}")
+            return False
+        
+        problem_texts = [
+            self.problem_texts[row] for problem_id, row in self._problem_rows.items()
+            if problem_id not in delta.removed_problem_ids and problem_id not in delta.problems
+        ]
+        problem_texts.extend(delta.problems.values())
+        
+        self.vector_index = vector_index
+        self.index_config = index_config
+        self.embeddings = vectors
+        self.chunks_data = chunks
+        self._metadata_index = None
+        self._reset_lexical_index()
+        self._set_problem_texts(problem_texts)
+        self.index_version = uuid.uuid4().hex
+        # The saved base no longer matches memory until the next save
+        self._system_dir = None
+        self._reset_delta()
+        
+        print(f"✅ Compacted index holds {len(chunks)} chunks from {len(problem_texts)} problems")
+        return True
+    
+    def compact(self, save_dir: Optional[str] = None) -> bool:
+        """
+        Merge pending add/update/remove changes into the base index and save it
+        (to save_dir, or the directory the system was loaded from), clearing the delta log
+        """
+        save_dir = save_dir or self._system_dir
+        if not self._delta.is_empty and not self._compact_delta():
+            return False
+        if save_dir:
+            self.save_system(save_dir)
+        return True
+    
+    def save_system(self, save_dir: str = "rag_system", embeddings_dtype: Optional[str] = None) -> None:
         """
-        Save the complete RAG system to disk
+        Save the complete RAG system to disk.
+        The normalized embeddings are saved as embeddings.npy in embeddings_dtype
+        ("float32" or "float16"; default keeps their current dtype).
         """
+        if embeddings_dtype not in (None, "float32", "float16"):
+            print(f"❌ Unsupported embeddings dtype '{embeddings_dtype}'. Choose from: float32, float16")
+            return
+        
+        # The saved base always includes pending incremental changes
+        if not self._delta.is_empty and not self._compact_delta():
+            print("❌ Cannot save RAG system - pending index changes could not be compacted")
+            return
+        
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
         
         print(f"💾 Saving RAG system to {save_dir}/...")
         
-        # Save chunks data
-        with open(f"{save_dir}/chunks_data.json", 'w', encoding='utf-8') as f:
-            json.dump(self.chunks_data, f, indent=2, ensure_ascii=False)
+        # Save chunks data in the memory-mapped binary chunk store
+        write_chunk_store(self.chunks_data, f"{save_dir}/chunks.bin")
+        
+        # Save problem-level text once per problem
+        write_chunk_store(self.problem_texts, f"{save_dir}/problems.bin")
         
-        # Save vector index
-        if self.vector_index is not None:
+        # Save vector index: one file, or one pair of files per shard
+        shards_meta = None
+        if isinstance(self.vector_index, ShardedIndex):
+            shards_meta = dict(self.shard_config, files=self.vector_index.save(save_dir))
+            if os.path.exists(f"{save_dir}/vector_index.faiss"):
+                os.remove(f"{save_dir}/vector_index.faiss")
+        elif self.vector_index is not None:
             faiss.write_index(self.vector_index, f"{save_dir}/vector_index.faiss")
+            if os.path.isdir(f"{save_dir}/shards"):
+                shutil.rmtree(f"{save_dir}/shards")
+        
+        if self.index_version is None:
+            self.index_version = uuid.uuid4().hex
+        
+        # Save the BM25 index so lexical search works without the model
+        if self.lexical_index is not None:
+            self.lexical_index.save(f"{save_dir}/bm25_index.npz", self.index_version)
+        elif os.path.exists(f"{save_dir}/bm25_index.npz"):
+            os.remove(f"{save_dir}/bm25_index.npz")
+        
+        # Save embeddings so the index can be rebuilt without the model
+        embeddings_meta = None
+        if self.embeddings is not None and len(self.embeddings) == len(self.chunks_data):
+            dtype = embeddings_dtype or self.embeddings.dtype.name
+            self._save_embeddings(f"{save_dir}/embeddings.npy", dtype)
+            embeddings_meta = {"file": "embeddings.npy", "dtype": dtype, "shape": list(self.embeddings.shape)}
+        elif os.path.exists(f"{save_dir}/embeddings.npy"):
+            # Never leave embeddings from another corpus next to this index
+            os.remove(f"{save_dir}/embeddings.npy")
         
         # Save system metadata
         metadata = {
+            "index_version": self.index_version,
             "model_name": self.model_name,
             "chunk_size": self.chunk_size,
             "overlap_size": self.overlap_size,
+            "chunk_mode": self.chunk_mode,
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
             "num_chunks": len(self.chunks_data),
-            "num_problems": len(self.problems_data),
+            "index": self.index_config,
+            "shards": shards_meta,
+            "embedding_dim": self.vector_index.d if self.vector_index is not None else None,
+            "embeddings": embeddings_meta,
+            "lexical_index": "bm25_index.npz" if self.lexical_index is not None else None,
+            "num_problems": len(self.problem_texts),
             "created_date": datetime.now().isoformat()
         }
         
         with open(f"{save_dir}/metadata.json", 'w') as f:
             json.dump(metadata, f, indent=2)
         
+        # Later add/update/remove calls are logged next to this base
+        IndexDelta.delete_files(save_dir)
+        self._system_dir = save_dir
+        self._delta.save_dir = save_dir
+        
         print("✅ RAG system saved successfully")
     
+    def _save_embeddings(self, path: str, dtype: str, block_rows: int = 65536) -> None:
+        """
+        Write the embeddings as a .npy file block by block, swapping it in atomically
+        so a memory-mapped copy being read is never modified
+        """
+        tmp_path = f"{path}.tmp"
+        output = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.dtype(dtype), shape=self.embeddings.shape)
+        for start in range(0, len(self.embeddings), block_rows):
+            output[start:start + block_rows] = self.embeddings[start:start + block_rows]
+        output.flush()
+        del output
+        os.replace(tmp_path, path)
+    
     def load_system(self, save_dir: str = "rag_system") -> None:
         """
         Load a previously saved RAG system
@@ -366,23 +2008,71 @@ class FarmerRAGSystem:
         print(f"📂 Loading RAG system from {save_dir}/...")
         
         try:
-            # Load chunks data
-            with open(f"{save_dir}/chunks_data.json", 'r', encoding='utf-8') as f:
-                self.chunks_data = json.load(f)
+            # Load chunks data: map the binary chunk store, or read the legacy JSON dump
+            if os.path.exists(f"{save_dir}/chunks.bin"):
+                self.chunks_data = ChunkStore(f"{save_dir}/chunks.bin")
+            else:
+                with open(f"{save_dir}/chunks_data.json", 'r', encoding='utf-8') as f:
+                    self.chunks_data = json.load(f)
+            self._metadata_index = None
+            self._reset_lexical_index()
+            if os.path.exists(f"{save_dir}/bm25_index.npz"):
+                self._lexical_index_path = f"{save_dir}/bm25_index.npz"
+            
+            # Problem text is stored separately; older systems embedded it in every chunk
+            if os.path.exists(f"{save_dir}/problems.bin"):
+                self._set_problem_texts(ChunkStore(f"{save_dir}/problems.bin"))
+            else:
+                self._set_problem_texts(self._problem_texts_from_chunks())
+            
+            # Vector index is read lazily on first search (or warmup())
+            self.vector_index = None
+            if os.path.exists(f"{save_dir}/vector_index.faiss"):
+                self._vector_index_path = f"{save_dir}/vector_index.faiss"
             
-            # Load vector index
-            if SENTENCE_TRANSFORMERS_AVAILABLE and os.path.exists(f"{save_dir}/vector_index.faiss"):
-                self.vector_index = faiss.read_index(f"{save_dir}/vector_index.faiss")
+            # Embeddings are memory-mapped: pages are only read when an index is rebuilt
+            self.embeddings = None
+            if os.path.exists(f"{save_dir}/embeddings.npy"):
+                self.embeddings = np.load(f"{save_dir}/embeddings.npy", mmap_mode='r')
             
             # Load metadata
             with open(f"{save_dir}/metadata.json", 'r') as f:
                 metadata = json.load(f)
+                # Systems saved before versioning fall back to their creation date
+                self.index_version = metadata.get("index_version", metadata.get("created_date"))
                 self.model_name = metadata.get("model_name", self.model_name)
+                self.index_config = metadata.get("index", {"type": "flat"})
                 self.chunk_size = metadata.get("chunk_size", self.chunk_size)
                 self.overlap_size = metadata.get("overlap_size", self.overlap_size)
+                self.chunk_mode = metadata.get("chunk_mode", "characters")
+                self.chunk_tokens = metadata.get("chunk_tokens")
+                self.overlap_tokens = metadata.get("overlap_tokens", self.overlap_tokens)
+            
+            # A BM25 index saved for another version of the chunks is rebuilt on first use
+            if self._lexical_index_path and BM25Index.saved_version(self._lexical_index_path) != self.index_version:
+                self._lexical_index_path = None
+            
+            # Sharded indexes map their row lists now and read each shard on first search
+            shards_meta = metadata.get("shards")
+            self.shard_config = None
+            if shards_meta:
+                self.shard_config = {key: shards_meta[key] for key in ("num_shards", "partition", "index_params")}
+                self.vector_index = ShardedIndex.open(save_dir, shards_meta["files"], metadata.get("embedding_dim"),
+                                                      shards_meta["partition"], on_load=self._apply_search_params)
+            
+            # Replay problems added/updated/removed since the base was saved
+            self._system_dir = save_dir
+            self._reset_delta()
+            if os.path.exists(f"{save_dir}/delta_log.jsonl"):
+                dimension = metadata.get("embedding_dim")
+                if dimension is None and self.vector_index is not None:
+                    dimension = self.vector_index.d
+                self._delta = IndexDelta.replay(save_dir, len(self.chunks_data), self._base_rows_for_problem, dimension)
+                print(f"📝 Replayed {self._delta.num_ops} pending index changes")
             
             print("✅ RAG system loaded successfully")
-            print(f"📊 Loaded {len(self.chunks_data)} chunks, Vector index: {self.vector_index is not None}")
+            has_index = self._vector_index is not None or self._vector_index_path is not None
+            print(f"📊 Loaded {len(self.chunks_data)} chunks, Vector index: {has_index}")
             
         except Exception as e:
             print(f"❌ Error loading RAG system: {e}")
@@ -397,14 +2087,16 @@ def main():
     # Initialize RAG system
     rag_system = FarmerRAGSystem()
     
-    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+    if not dependencies_available():
         print("❌ Required dependencies not available. Please install:")
         print("pip install sentence-transformers faiss-cpu")
         return
     
-    # Load problems data
+    # Load problems data, falling back to the generator's part files
     data_file = "farmer_problems_dataset.json"
-    if not os.path.exists(data_file):
+    if not os.path.exists(data_file) and glob.glob("farmer_dataset_part_*.json"):
+        data_file = "farmer_dataset_part_*.json"
+    elif not os.path.exists(data_file):
         print(f"❌ Data file not found: {data_file}")
         print("Please run farmer_problems_generator.py first to create the dataset")
         return
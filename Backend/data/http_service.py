@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Engine HTTP Service
+One long-running asyncio HTTP/1.1 service in front of the Python engines,
+so the Express backend can keep a pool of keep-alive connections to a warm
+process instead of spawning an interpreter per request.
+
+Endpoints (request and response bodies are JSON, shaped like the stdin
+payloads and outputs of the one-shot scripts):
+    POST /rag/query         {"query", "language", "topK", "filters"}
+    POST /rag/batch         {"queries": ["...", {"query": "...", "topK": 5}], "language", "topK", "filters"}
+    POST /image/analyze     {"imagePath", "question", "language"}
+    POST /speech/transcribe {"audioPath", "language"}
+    POST /tts/synthesize    {"text", "language"}
+    GET  /healthz           readiness and pool status (503 until the RAG system is ready)
+    GET  /metrics           Prometheus text format
+
+RAG queries go through the micro-batching scheduler of query_rag.py, so
+concurrent queries share batched encodes. Image, speech and TTS requests run
+in bounded process pools whose workers create their engine once; each engine
+admits a bounded number of pending requests and answers 503 beyond that.
+
+Usage:
+    python http_service.py --port 8765
+    python http_service.py --host 0.0.0.0 --port 8765 --image-workers 4 --max-pending 32
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, Optional, Tuple
+
+from query_rag import QueryBatcher, _empty_query_response, load_warm_interface, parse_top_k
+
+# Engine name -> (module, engine class); every module exposes handle_request(request_data, engine)
+ENGINES = {
+    "image": ("analyze_image", "CropImageAnalyzer"),
+    "speech": ("speech_to_text", "SpeechToTextConverter"),
+    "tts": ("text_to_speech", "TextToSpeechConverter")
+}
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH_QUERIES = 256
+MAX_HEADERS = 100
+KEEPALIVE_SECONDS = 75.0
+
+# Request latency histogram buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+_worker_engines: Dict[str, Any] = {}
+
+def run_engine(name: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answer one request in a pool worker with the worker's engine, created on first use
+    """
+    module_name, class_name = ENGINES[name]
+    module = importlib.import_module(module_name)
+    if name not in _worker_engines:
+        _worker_engines[name] = getattr(module, class_name)()
+    return module.handle_request(request_data, _worker_engines[name])
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class ServiceMetrics:
+    """
+    Request counts and latency histograms per route, rendered in Prometheus text format
+    """
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, int], int] = {}
+        self.latency: Dict[str, list] = {}
+        self.latency_sum: Dict[str, float] = {}
+
+    def observe(self, route: str, status: int, seconds: float) -> None:
+        self.requests[(route, status)] = self.requests.get((route, status), 0) + 1
+        buckets = self.latency.setdefault(route, [0] * (len(LATENCY_BUCKETS) + 1))
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                buckets[i] += 1
+                break
+        else:
+            buckets[-1] += 1
+        self.latency_sum[route] = self.latency_sum.get(route, 0.0) + seconds
+
+    def render(self) -> list:
+        lines = [
+            "# HELP farmer_http_requests_total HTTP requests by route and status",
+            "# TYPE farmer_http_requests_total counter"
+        ]
+        for (route, status), count in sorted(self.requests.items()):
+            lines.append(f'farmer_http_requests_total{{route="{route}",status="{status}"}} {count}')
+        lines += [
+            "# HELP farmer_http_request_duration_seconds HTTP request latency by route",
+            "# TYPE farmer_http_request_duration_seconds histogram"
+        ]
+        for route, buckets in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += count
+                lines.append(f'farmer_http_request_duration_seconds_bucket{{route="{route}",le="{bound}"}} {cumulative}')
+            lines.append(f'farmer_http_request_duration_seconds_sum{{route="{route}"}} {self.latency_sum[route]:.6f}')
+            lines.append(f'farmer_http_request_duration_seconds_count{{route="{route}"}} {cumulative}')
+        return lines
+
+class EngineService:
+    """
+    Routes HTTP requests to the RAG scheduler and the engine process pools
+    """
+
+    def __init__(self, rag_interface, batch_window_ms: float = 5.0, max_batch_size: int = 32,
+                 workers: Optional[Dict[str, int]] = None, max_pending: int = 64):
+        self.rag_interface = rag_interface
+        self.batcher = QueryBatcher(rag_interface, batch_window_ms, max_batch_size)
+        workers = workers or {}
+        # Spawned workers do not inherit the loaded RAG system or the event loop
+        context = get_context("spawn")
+        self.pools = {
+            name: ProcessPoolExecutor(max(1, workers.get(name, 1)), mp_context=context)
+            for name in ENGINES
+        }
+        self.pool_sizes = {name: max(1, workers.get(name, 1)) for name in ENGINES}
+        self.max_pending = max_pending
+        self.pending = dict.fromkeys(ENGINES, 0)
+        self.rejected = dict.fromkeys(ENGINES, 0)
+        self.metrics = ServiceMetrics()
+        self.started_at = time.time()
+        self.routes = {
+            "/rag/query": ("POST", self.rag_query),
+            "/rag/batch": ("POST", self.rag_batch),
+            "/image/analyze": ("POST", lambda payload: self.run_engine("image", payload)),
+            "/speech/transcribe": ("POST", lambda payload: self.run_engine("speech", payload)),
+            "/tts/synthesize": ("POST", lambda payload: self.run_engine("tts", payload)),
+            "/healthz": ("GET", self.healthz),
+            "/metrics": ("GET", self.render_metrics)
+        }
+
+    @staticmethod
+    def _rag_request(item: Dict[str, Any], defaults: Dict[str, Any]) -> Tuple[str, str, int, Any]:
+        query = str(item.get('query', '')).strip()
+        language = item.get('language', defaults.get('language', 'en'))
+        try:
+            top_k = parse_top_k(item.get('topK', defaults.get('topK')))
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return query, language, top_k, item.get('filters', defaults.get('filters'))
+
+    async def rag_query(self, payload: Dict[str, Any]):
+        query, language, top_k, filters = self._rag_request(payload, {})
+        if not query:
+            return 400, _empty_query_response()
+        future = self.batcher.submit_future(query, language, top_k, filters)
+        return 200, await asyncio.wrap_future(future)
+
+    async def rag_batch(self, payload: Dict[str, Any]):
+        items = payload.get('queries')
+        if not isinstance(items, list) or not items:
+            raise HTTPError(400, '"queries" must be a non-empty list')
+        if len(items) > MAX_BATCH_QUERIES:
+            raise HTTPError(413, f'At most {MAX_BATCH_QUERIES} queries per batch')
+
+        requests = [self._rag_request(item if isinstance(item, dict) else {'query': item}, payload)
+                    for item in items]
+        futures = [
+            asyncio.wrap_future(self.batcher.submit_future(*request)) if request[0] else None
+            for request in requests
+        ]
+        results = []
+        for future in futures:
+            results.append(await future if future is not None else _empty_query_response())
+        return 200, {'results': results}
+
+    async def run_engine(self, name: str, payload: Dict[str, Any]):
+        """
+        Run one image/speech/TTS request in the engine's process pool
+        """
+        if self.pending[name] >= self.max_pending:
+            self.rejected[name] += 1
+            raise HTTPError(503, f'{name} engine is busy, retry later')
+        self.pending[name] += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.pools[name], run_engine, name, payload)
+        except ImportError as e:
+            raise HTTPError(503, f'{name} engine unavailable: {e}')
+        finally:
+            self.pending[name] -= 1
+        return 200, result
+
+    async def healthz(self, payload=None):
+        rag_system = self.rag_interface.rag_system
+        ready = bool(self.rag_interface.system_ready)
+        # Load balancers only route to a service answering 200
+        return 200 if ready else 503, {
+            'status': 'ready' if ready else 'degraded',
+            'ready': ready,
+            'num_chunks': len(rag_system.chunks_data) if rag_system else 0,
+            'index_version': rag_system.index_version if rag_system else None,
+            'scheduler': self.batcher.stats(),
+            'engines': {
+                name: {'workers': self.pool_sizes[name], 'pending': self.pending[name],
+                       'max_pending': self.max_pending, 'rejected': self.rejected[name]}
+                for name in ENGINES
+            },
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'pid': os.getpid()
+        }
+
+    async def render_metrics(self, payload=None):
+        lines = self.metrics.render()
+        lines += ["# HELP farmer_engine_pending Requests queued or running per engine",
+                  "# TYPE farmer_engine_pending gauge"]
+        lines += [f'farmer_engine_pending{{engine="{name}"}} {count}' for name, count in self.pending.items()]
+        lines += ["# HELP farmer_engine_rejected_total Requests refused with 503 per engine",
+                  "# TYPE farmer_engine_rejected_total counter"]
+        lines += [f'farmer_engine_rejected_total{{engine="{name}"}} {count}' for name, count in self.rejected.items()]
+
+        scheduler = self.batcher.stats()
+        lines += ["# HELP farmer_rag_queue_depth Queries waiting for the RAG scheduler",
+                  "# TYPE farmer_rag_queue_depth gauge",
+                  f"farmer_rag_queue_depth {scheduler['queue_depth']}",
+                  "# TYPE farmer_rag_batches_total counter",
+                  f"farmer_rag_batches_total {scheduler['batches']}",
+                  "# TYPE farmer_rag_queries_total counter",
+                  f"farmer_rag_queries_total {scheduler['queries']}",
+                  "# HELP farmer_rag_batch_size_total Batches by size bucket",
+                  "# TYPE farmer_rag_batch_size_total counter"]
+        lines += [f'farmer_rag_batch_size_total{{size="{bucket}"}} {count}'
+                  for bucket, count in scheduler['batch_size_histogram'].items()]
+        lines += ["# HELP farmer_rag_queue_depth_on_arrival_total Queries by queue depth seen on arrival",
+                  "# TYPE farmer_rag_queue_depth_on_arrival_total counter"]
+        lines += [f'farmer_rag_queue_depth_on_arrival_total{{depth="{bucket}"}} {count}'
+                  for bucket, count in scheduler['queue_depth_histogram'].items()]
+
+        rag_system = self.rag_interface.rag_system
+        if rag_system is not None:
+            query_cache = rag_system.query_cache.stats()
+            lines += ["# TYPE farmer_rag_query_cache_hits_total counter",
+                      f"farmer_rag_query_cache_hits_total {query_cache.get('hits', 0)}",
+                      "# TYPE farmer_rag_query_cache_misses_total counter",
+                      f"farmer_rag_query_cache_misses_total {query_cache.get('misses', 0)}"]
+        return 200, "\n".join(lines) + "\n"
+
+    async def dispatch(self, method: str, path: str, body: bytes):
+        """
+        (status, payload, extra headers) for one request
+        """
+        route = self.routes.get(path)
+        if route is None:
+            raise HTTPError(404, f'No route for {path}')
+        allowed, handler = route
+        if method != allowed:
+            return 405, {'error': f'{path} only accepts {allowed}'}, {'Allow': allowed}
+
+        payload = {}
+        if allowed == "POST":
+            try:
+                payload = json.loads(body or b'{}')
+            except (ValueError, UnicodeDecodeError) as e:
+                raise HTTPError(400, f'Invalid JSON body: {e}')
+            if not isinstance(payload, dict):
+                raise HTTPError(400, 'Request body must be a JSON object')
+        status, result = await handler(payload)
+        return status, result, {}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Serve HTTP/1.1 requests on one connection until it closes or idles out
+        """
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+
+                headers = {}
+                while len(headers) <= MAX_HEADERS:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                route = "unknown"
+                extra_headers = {}
+                keep_alive = False
+                try:
+                    if len(headers) > MAX_HEADERS:
+                        raise HTTPError(400, 'Too many headers')
+                    parts = request_line.decode('latin-1').split()
+                    if len(parts) != 3:
+                        raise HTTPError(400, 'Malformed request line')
+                    method, target, version = parts
+                    path = target.split('?', 1)[0]
+                    route = path if path in self.routes else "unknown"
+                    keep_alive = (headers.get('connection', '').lower() != 'close' if version == 'HTTP/1.1'
+                                  else headers.get('connection', '').lower() == 'keep-alive')
+
+                    if 'transfer-encoding' in headers:
+                        keep_alive = False
+                        raise HTTPError(411, 'Chunked request bodies are not supported, send Content-Length')
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length > MAX_BODY_BYTES:
+                        keep_alive = False
+                        raise HTTPError(413, f'Request body over {MAX_BODY_BYTES} bytes')
+                    body = await reader.readexactly(length) if length else b''
+
+                    status, result, extra_headers = await self.dispatch(method.upper(), path, body)
+                except HTTPError as e:
+                    status, result = e.status, {'error': str(e)}
+                except ValueError as e:
+                    status, result, keep_alive = 400, {'error': str(e)}, False
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    raise
+                except Exception as e:
+                    print(f"❌ {route} failed: {e}")
+                    status, result = 500, {'error': str(e)}
+
+                if isinstance(result, str):
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                    data = result.encode('utf-8')
+                else:
+                    content_type = 'application/json; charset=utf-8'
+                    data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+
+                response_headers = {
+                    'Content-Type': content_type,
+                    'Content-Length': str(len(data)),
+                    'Connection': 'keep-alive' if keep_alive else 'close'
+                }
+                response_headers.update(extra_headers)
+                head = f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n" + "".join(
+                    f"{name}: {value}\r\n" for name, value in response_headers.items()) + "\r\n"
+                writer.write(head.encode('latin-1') + data)
+                await writer.drain()
+                self.metrics.observe(route, status, time.perf_counter() - start)
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Peer went away, or sent a line longer than the stream limit
+            pass
+        finally:
+            writer.close()
+
+    def shutdown(self) -> None:
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+
+async def serve(host: str, port: int, service: EngineService) -> None:
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"✅ Engine service listening on http://{addresses}")
+    sys.stdout.flush()
+    async with server:
+        await server.serve_forever()
+
+def main():
+    """
+    Load the RAG system and serve the engines over HTTP
+    """
+    parser = argparse.ArgumentParser(description='Serve the RAG, image, speech and TTS engines over HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help='how long concurrent RAG queries are collected into one batch under load')
+    parser.add_argument('--max-batch-size', type=int, default=32, help='most RAG queries encoded together')
+    parser.add_argument('--image-workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help='image analysis worker processes')
+    parser.add_argument('--speech-workers', type=int, default=1, help='speech-to-text worker processes')
+    parser.add_argument('--tts-workers', type=int, default=1, help='text-to-speech worker processes')
+    parser.add_argument('--max-pending', type=int, default=64,
+                        help='requests queued or running per engine before answering 503')
+    args = parser.parse_args()
+
+    rag_interface = load_warm_interface()
+    service = EngineService(rag_interface, args.batch_window_ms, args.max_batch_size,
+                            {"image": args.image_workers, "speech": args.speech_workers, "tts": args.tts_workers},
+                            args.max_pending)
+    try:
+        asyncio.run(serve(args.host, args.port, service))
+    except KeyboardInterrupt:
+        print("\nEngine service stopped")
+    finally:
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
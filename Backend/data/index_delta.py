@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Incremental Index Delta
+Problems added, updated or removed after the base index was built
+
+The base system (chunks.bin, problems.bin, vector_index.faiss) is immutable
+between compactions. Edits go to a small delta next to it:
+    delta_log.jsonl      append-only log, one {"op": "add" | "remove", ...} per line
+    delta_vectors.f32    float32 embeddings of added chunks, in log order
+
+Chunk rows form one id space: base chunks keep rows 0..B-1 and added chunks
+get rows B, B+1, ... in an ID-mapped flat index, so search results from the
+base index and the delta can be merged directly. Removing a problem only
+marks its rows deleted. Compaction folds everything back into a new base.
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+LOG_FILE = "delta_log.jsonl"
+VECTORS_FILE = "delta_vectors.f32"
+
+class IndexDelta:
+    """
+    In-memory state of the delta over a base index of num_base_rows chunks,
+    mirrored to the delta files in save_dir when one is set
+    """
+
+    def __init__(self, num_base_rows: int = 0, save_dir: Optional[str] = None):
+        self.num_base_rows = num_base_rows
+        self.save_dir = save_dir
+        self.chunks: List[Dict[str, Any]] = []         # added chunks, row = num_base_rows + position
+        self.vectors: List[np.ndarray] = []            # normalized float32 vectors of added chunks
+        self.problems: Dict[Any, Dict[str, Any]] = {}  # problem id -> text record of added problems
+        self.problem_rows: Dict[Any, List[int]] = {}   # problem id -> rows of its added chunks
+        self.removed_problem_ids = set()               # problems whose base record is hidden
+        self.deleted_rows = set()                      # rows (base or added) no longer searchable
+        self.num_ops = 0
+        self.index = None                              # IndexIDMap2 over the live added rows
+        self._deleted_array = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.num_ops == 0
+
+    @property
+    def num_rows(self) -> int:
+        """Size of the row space: base chunks plus every chunk ever added"""
+        return self.num_base_rows + len(self.chunks)
+
+    def chunk(self, row: int) -> Dict[str, Any]:
+        return self.chunks[row - self.num_base_rows]
+
+    def vector(self, row: int) -> np.ndarray:
+        return self.vectors[row - self.num_base_rows]
+
+    def deleted_array(self) -> np.ndarray:
+        """Sorted deleted rows (cached until the next edit)"""
+        if self._deleted_array is None:
+            self._deleted_array = np.array(sorted(self.deleted_rows), dtype=np.int64)
+        return self._deleted_array
+
+    def add(self, record: Dict[str, Any], chunks: List[Dict[str, Any]], vectors: np.ndarray,
+            log: bool = True) -> List[int]:
+        """
+        Add one problem's text record and its chunks with their normalized vectors
+        """
+        import faiss
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(chunks), -1)
+        rows = list(range(self.num_rows, self.num_rows + len(chunks)))
+        if log:
+            self._append_log({"op": "add", "problem": record, "chunks": chunks}, vectors)
+
+        if rows:
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            self.index.add_with_ids(vectors, np.array(rows, dtype=np.int64))
+
+        self.chunks.extend(chunks)
+        self.vectors.extend(vectors)
+        self.problems[record['id']] = record
+        self.problem_rows[record['id']] = rows
+        self.num_ops += 1
+        return rows
+
+    def remove(self, problem_id, base_rows: Iterable[int], log: bool = True) -> int:
+        """
+        Hide a problem: its base rows and any added rows stop matching searches.
+        Returns the number of chunk rows deleted.
+        """
+        if log:
+            self._append_log({"op": "remove", "problem_id": problem_id})
+
+        added_rows = self.problem_rows.pop(problem_id, [])
+        self.problems.pop(problem_id, None)
+        if added_rows and self.index is not None:
+            self.index.remove_ids(np.array(added_rows, dtype=np.int64))
+
+        rows = [row for row in list(base_rows) + added_rows if row not in self.deleted_rows]
+        self.deleted_rows.update(rows)
+        self.removed_problem_ids.add(problem_id)
+        self._deleted_array = None
+        self.num_ops += 1
+        return len(rows)
+
+    def search(self, query_vectors: np.ndarray, top_k: int, selected: Optional[np.ndarray] = None):
+        """
+        Exact search over the live added chunks, optionally restricted to selected rows
+        """
+        import faiss
+
+        if selected is None:
+            return self.index.search(query_vectors, top_k)
+        selector = faiss.IDSelectorBatch(selected)
+        return self.index.search(query_vectors, top_k, params=faiss.SearchParameters(sel=selector))
+
+    def _append_log(self, entry: Dict[str, Any], vectors: Optional[np.ndarray] = None) -> None:
+        """
+        Persist one operation. Vectors are written before the log line, so a log
+        entry never refers to vectors that are not on disk.
+        """
+        if not self.save_dir:
+            return
+
+        if vectors is not None:
+            with open(os.path.join(self.save_dir, VECTORS_FILE), 'ab') as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        with open(os.path.join(self.save_dir, LOG_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @classmethod
+    def replay(cls, save_dir: str, num_base_rows: int, base_rows_for_problem,
+               dimension: Optional[int]) -> "IndexDelta":
+        """
+        Rebuild the delta of a saved system from its log.
+        base_rows_for_problem(problem_id) returns the base chunk rows of a problem.
+        """
+        delta = cls(num_base_rows, save_dir)
+        log_path = os.path.join(save_dir, LOG_FILE)
+        if not os.path.exists(log_path):
+            return delta
+
+        vectors_path = os.path.join(save_dir, VECTORS_FILE)
+        all_vectors = np.empty((0, dimension or 0), dtype=np.float32)
+        if dimension and os.path.exists(vectors_path) and os.path.getsize(vectors_path) >= dimension * 4:
+            all_vectors = np.memmap(vectors_path, dtype=np.float32, mode='r')
+            all_vectors = all_vectors[:len(all_vectors) // dimension * dimension].reshape(-1, dimension)
+
+        offset = 0
+        good_bytes = 0
+        with open(log_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated line")
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # A write interrupted mid-line: everything before it is intact
+                    print(f"⚠️ Ignoring truncated delta log entry at line {line_number}")
+                    break
+
+                if entry["op"] == "add":
+                    count = len(entry["chunks"])
+                    if offset + count > len(all_vectors):
+                        print(f"⚠️ Delta vectors missing for log line {line_number}, stopping replay")
+                        break
+                    delta.add(entry["problem"], entry["chunks"],
+                              np.array(all_vectors[offset:offset + count]), log=False)
+                    offset += count
+                elif entry["op"] == "remove":
+                    delta.remove(entry["problem_id"], base_rows_for_problem(entry["problem_id"]), log=False)
+                good_bytes += len(line)
+
+        # Drop any torn tail so later appends continue from a consistent state
+        del all_vectors
+        if good_bytes < os.path.getsize(log_path):
+            os.truncate(log_path, good_bytes)
+        if dimension and os.path.exists(vectors_path):
+            os.truncate(vectors_path, offset * dimension * 4)
+
+        return delta
+
+    @staticmethod
+    def delete_files(save_dir: str) -> None:
+        """Remove the delta files of a saved system (after they were compacted into the base)"""
+        for name in (LOG_FILE, VECTORS_FILE):
+            path = os.path.join(save_dir, name)
+            if os.path.exists(path):
+                os.remove(path)
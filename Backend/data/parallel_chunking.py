@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Parallel Chunking
+Fans problems out in batches to worker processes that chunk them with the
+same settings as the calling FarmerRAGSystem, and hands the chunked batches
+back in input order.
+
+Results are consumed in submission order, so chunk ids are numbered exactly
+as a serial pass would number them. Only a bounded number of batches is in
+flight, so a caller that embeds each batch as it arrives overlaps chunking
+with encoding while memory stays bounded. In token chunk mode every worker
+loads the embedding model for its tokenizer.
+"""
+
+import itertools
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from dataset_loader import normalize_problem
+
+# FarmerRAGSystem attributes that decide how a problem is chunked
+CHUNK_SETTINGS = ("model_name", "chunk_size", "overlap_size", "chunk_mode", "chunk_tokens", "overlap_tokens")
+
+_worker_system = None
+
+def chunk_settings(rag_system) -> Dict[str, Any]:
+    """The chunking settings of a FarmerRAGSystem"""
+    return {name: getattr(rag_system, name) for name in CHUNK_SETTINGS}
+
+def _init_worker(settings: Dict[str, Any]) -> None:
+    """Create the worker's chunker once"""
+    global _worker_system
+    from farmer_rag_system import FarmerRAGSystem
+    _worker_system = FarmerRAGSystem(settings["model_name"])
+    for name, value in settings.items():
+        setattr(_worker_system, name, value)
+
+def chunk_batch(rag_system, problems: List[Dict[str, Any]]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Problem records and chunks of a batch, chunk ids numbered from 0 within the batch
+    """
+    records, chunks = [], []
+    for problem_data in problems:
+        record, problem_chunks = rag_system._chunk_problem(normalize_problem(problem_data), len(chunks))
+        records.append(record)
+        chunks.extend(problem_chunks)
+    return records, chunks
+
+def _chunk_batch(problems: List[Dict[str, Any]]) -> Tuple[List[Dict], List[Dict]]:
+    return chunk_batch(_worker_system, problems)
+
+def iter_chunk_batches(rag_system, problems: Iterable[Dict[str, Any]], num_workers: int = 0,
+                       batch_size: int = 256) -> Iterator[Tuple[List[Dict], List[Dict]]]:
+    """
+    Yield (problem records, chunks) batch by batch in input order, with chunk ids numbered
+    consecutively from 0 across batches. num_workers=0 chunks in this process, -1 uses one
+    worker per core.
+    """
+    problems = iter(problems)
+    batches = iter(lambda: list(itertools.islice(problems, batch_size)), [])
+    next_chunk_id = 0
+
+    def renumber(records, chunks):
+        nonlocal next_chunk_id
+        for chunk in chunks:
+            chunk['chunk_id'] += next_chunk_id
+        next_chunk_id += len(chunks)
+        return records, chunks
+
+    if num_workers == 0:
+        for batch in batches:
+            yield renumber(*chunk_batch(rag_system, batch))
+        return
+
+    if num_workers < 0:
+        num_workers = os.cpu_count() or 1
+    max_in_flight = num_workers * 2
+
+    context = get_context("spawn")
+    with ProcessPoolExecutor(num_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(chunk_settings(rag_system),)) as pool:
+        in_flight = deque()
+        for batch in batches:
+            if len(in_flight) >= max_in_flight:
+                yield renumber(*in_flight.popleft().result())
+            in_flight.append(pool.submit(_chunk_batch, batch))
+        while in_flight:
+            yield renumber(*in_flight.popleft().result())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Parallel Corpus Embedding
+Streams chunk texts in shards through a pool of worker processes, each with
+its own copy of the embedding model, and writes the vectors straight into a
+memory-mapped .npy file.
+
+Only a bounded number of shards is in flight at once, so peak memory is set
+by shard_size and the worker count rather than by the corpus size. Each
+worker pins torch to threads_per_worker threads; by default the pool uses
+every core.
+"""
+
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Iterable, Optional
+
+import numpy as np
+
+_worker_model = None
+
+def _init_worker(model_name: str, threads_per_worker: int) -> None:
+    """Load the model once per worker process, limited to threads_per_worker threads"""
+    global _worker_model
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[variable] = str(threads_per_worker)
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _embedding_dimension() -> int:
+    return int(_worker_model.encode(["dimension probe"], convert_to_numpy=True).shape[1])
+
+def _encode_shard(start: int, positions, texts, batch_size: int):
+    """Encode one shard; positions are the shard-relative rows of texts"""
+    embeddings = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return start, positions, np.asarray(embeddings, dtype=np.float32)
+
+def embed_texts_parallel(texts: Iterable[str], num_texts: int, output_path: str, model_name: str,
+                         num_workers: Optional[int] = None, threads_per_worker: int = 1,
+                         shard_size: int = 2048, batch_size: int = 32, cache=None) -> np.ndarray:
+    """
+    Embed num_texts texts from an iterable into a (num_texts, dim) float32 .npy memmap at
+    output_path. Texts found in cache (an EmbeddingCache) are copied instead of encoded,
+    and newly encoded shards are added to it. Returns the memmap.
+    """
+    if num_workers is None:
+        num_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    max_in_flight = num_workers * 2
+    texts = iter(texts)
+
+    # Spawned workers start without the parent's torch/OpenMP state
+    context = get_context("spawn")
+    with ProcessPoolExecutor(num_workers, mp_context=context, initializer=_init_worker,
+                             initargs=(model_name, threads_per_worker)) as pool:
+        dimension = cache.dimension if cache is not None and cache.dimension else None
+        if dimension is None:
+            dimension = pool.submit(_embedding_dimension).result()
+
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        output = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=(num_texts, dimension))
+
+        in_flight = {}
+        pending_texts = {}
+        encoded = 0
+        reused = 0
+        next_report = 0
+
+        def collect(done):
+            nonlocal encoded
+            for future in done:
+                start, positions, embeddings = future.result()
+                output[start + positions] = embeddings
+                shard_texts = pending_texts.pop(future)
+                if cache is not None:
+                    cache.add(shard_texts, embeddings)
+                encoded += len(positions)
+                del in_flight[future]
+
+        for start in range(0, num_texts, shard_size):
+            shard = list(itertools.islice(texts, shard_size))
+            if len(shard) != min(shard_size, num_texts - start):
+                raise ValueError(f"Expected {num_texts} texts, the iterable ended after {start + len(shard)}")
+
+            positions = np.arange(len(shard))
+            if cache is not None:
+                cached, missing = cache.lookup(shard)
+                if cached is not None and len(missing) < len(shard):
+                    hit_rows = np.setdiff1d(positions, missing, assume_unique=True)
+                    output[start + hit_rows] = cached[hit_rows]
+                    reused += len(hit_rows)
+                positions = np.asarray(missing, dtype=np.int64)
+                shard = [shard[i] for i in missing]
+            if not len(positions):
+                continue
+
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = pool.submit(_encode_shard, start, positions, shard, batch_size)
+            in_flight[future] = start
+            pending_texts[future] = shard
+
+            if start >= next_report:
+                print(f"   🔄 {min(start + shard_size, num_texts)}/{num_texts} chunks dispatched to {num_workers} workers")
+                next_report = start + max(num_texts // 10, shard_size)
+
+        if in_flight:
+            collect(wait(in_flight).done)
+
+    output.flush()
+    print(f"✅ Embedded {encoded} chunks ({reused} from cache) into {output_path}")
+    return output
@@ -3,11 +3,28 @@
 """
 Query RAG System Integration
 Connects the chatbot to the existing RAG system for intelligent responses
+
+Usage:
+    echo '{"query": "..."}' | python query_rag.py      # one-shot query
+    python query_rag.py --serve                        # NDJSON over stdin/stdout
+    python query_rag.py --serve --socket /tmp/rag.sock # NDJSON over a Unix socket
+    python query_rag.py --serve --socket /tmp/rag.sock --batch-window-ms 5 --max-batch-size 32
+    python query_rag.py --serve --shard-servers 127.0.0.1:9100,127.0.0.1:9101
+
+Shard servers (see shard_server.py) can also be set with RAG_SHARD_SERVERS,
+and their per-shard timeout with RAG_SHARD_TIMEOUT_MS (default 500).
+RAG_ENCODER_BACKEND selects the query encoder backend (torch, onnx, onnx_int8).
 """
 
+import argparse
 import json
+import queue
 import sys
 import os
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 import warnings
 warnings.filterwarnings('ignore')
@@ -21,7 +38,7 @@ if sys.platform.startswith('win'):
 
 # Import the existing RAG system
 try:
-    from farmer_rag_system import FarmerRAGSystem
+    from farmer_rag_system import FarmerRAGSystem, LRUCache
     RAG_AVAILABLE = True
 except ImportError:
     RAG_AVAILABLE = False
@@ -32,14 +49,19 @@ class ChatbotRAGInterface:
     Interface between chatbot and RAG system
     """
     
-    def __init__(self):
+    def __init__(self, response_cache_size=512, shard_servers=None, shard_timeout_ms=None):
         self.rag_system = None
         self.system_ready = False
+        self.response_cache = None
+        self._cached_index_version = None
+        self.shard_coordinator = None
         
         if RAG_AVAILABLE:
+            # Processed responses keyed on (query, language, top_k, index_version)
+            self.response_cache = LRUCache(response_cache_size)
             try:
-                # Initialize RAG system
-                self.rag_system = FarmerRAGSystem()
+                # Initialize RAG system (RAG_ENCODER_BACKEND=onnx_int8 encodes queries on onnxruntime)
+                self.rag_system = FarmerRAGSystem(backend=os.environ.get('RAG_ENCODER_BACKEND', 'torch'))
                 
                 # Try to load existing system
                 rag_path = os.path.join(os.path.dirname(__file__), 'rag_system')
@@ -47,6 +69,13 @@ class ChatbotRAGInterface:
                     self.rag_system.load_system(rag_path)
                     self.system_ready = True
                     print("✅ RAG system loaded successfully")
+                    
+                    # Search the shards on shard servers instead of this process
+                    shard_servers = shard_servers or os.environ.get('RAG_SHARD_SERVERS')
+                    if shard_servers:
+                        if shard_timeout_ms is None:
+                            shard_timeout_ms = float(os.environ.get('RAG_SHARD_TIMEOUT_MS', 500))
+                        self._connect_shard_servers(shard_servers, shard_timeout_ms)
                 else:
                     print("⚠️ RAG system not found. Please run setup_rag_system.py")
                     
@@ -54,28 +83,109 @@ class ChatbotRAGInterface:
                 print(f"❌ Failed to initialize RAG system: {e}")
                 self.rag_system = None
         
-    def query_rag(self, query, language='en', top_k=3):
+    def _connect_shard_servers(self, shard_servers, shard_timeout_ms):
         """
-        Query the RAG system and return enhanced response
+        Replace the local sharded index with a coordinator that fans searches out to shard servers
         """
-        if not self.system_ready or not self.rag_system:
-            return self._fallback_response(query, language)
+        from shard_server import RemoteShardedIndex
         
+        if isinstance(shard_servers, str):
+            shard_servers = [server for server in shard_servers.split(',') if server.strip()]
         try:
-            # Enhance query for better results
-            enhanced_query = self._enhance_query(query, language)
-            
-            # Get RAG response
-            response = self.rag_system.generate_response(enhanced_query, top_k=top_k)
+            coordinator = RemoteShardedIndex.from_system(self.rag_system, shard_servers, shard_timeout_ms)
+        except ValueError as e:
+            print(f"❌ Shard servers not used: {e}")
+            return
+        # Know the servers before the first query, which may be the only one (single-shot mode)
+        coordinator.discover()
+        self.rag_system.vector_index = coordinator
+        self.shard_coordinator = coordinator
+        print(f"🔗 Searching {coordinator.num_shards} shards on {len(shard_servers)} shard servers, "
+              f"{shard_timeout_ms:g} ms per shard")
+    
+    def query_rag(self, query, language='en', top_k=3, filters=None):
+        """
+        Query the RAG system and return enhanced response.
+        filters optionally restricts retrieval by chunk metadata, e.g. {"crop": "rice", "season": "kharif"}
+        """
+        return self.query_rag_batch([(query, language, top_k, filters)])[0]
+    
+    def query_rag_batch(self, requests):
+        """
+        Answer several (query, language, top_k, filters) requests; the uncached ones that
+        share top_k and filters are encoded and searched in one batch
+        """
+        if not self.system_ready or not self.rag_system:
+            return [self._fallback_response(query, language) for query, language, _, _ in requests]
+        
+        responses = [None] * len(requests)
+        
+        # Responses are deterministic for a given index, so entries from an
+        # older index version are dropped as soon as the version changes
+        index_version = self.rag_system.index_version
+        if index_version != self._cached_index_version:
+            self.response_cache.clear()
+            self._cached_index_version = index_version
+        
+        groups = {}
+        cache_keys = [None] * len(requests)
+        for position, (query, language, top_k, filters) in enumerate(requests):
+            try:
+                filters_key = json.dumps(filters, sort_keys=True) if filters else None
+            except (TypeError, ValueError) as e:
+                responses[position] = self._fallback_response(query, language, error=f'Invalid filters: {e}')
+                continue
+            cache_key = (query, language, top_k, filters_key, index_version)
+            cache_keys[position] = cache_key
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response is not None:
+                responses[position] = dict(cached_response, timestamp=datetime.now().isoformat())
+            else:
+                groups.setdefault((top_k, filters_key), []).append(position)
+        
+        # A failing group (e.g. an unknown filter field) only fails the requests in that group
+        for positions in groups.values():
+            try:
+                self._answer_group(requests, positions, cache_keys, responses)
+            except Exception as e:
+                print(f"❌ RAG query failed: {e}")
+                for position in positions:
+                    query, language, _, _ = requests[position]
+                    responses[position] = self._fallback_response(query, language, error=str(e))
+        
+        return responses
+    
+    def _answer_group(self, requests, positions, cache_keys, responses):
+        """
+        Answer the requests at positions, which share top_k and filters, with one batched
+        encode and search; fills responses and the response cache
+        """
+        _, _, top_k, filters = requests[positions[0]]
+        
+        # Enhance queries for better results
+        enhanced_queries = [self._enhance_query(requests[position][0], requests[position][1])
+                            for position in positions]
+        
+        # Get RAG responses with one batched encode and search
+        rag_responses = self.rag_system.generate_responses(enhanced_queries, top_k=top_k, filters=filters)
+        missing_shards = self.shard_coordinator.pop_missing_shards() if self.shard_coordinator else []
+        
+        processed_responses = []
+        for position, response in zip(positions, rag_responses):
+            query, language, _, _ = requests[position]
             
             # Post-process response for chatbot
-            processed_response = self._process_response(response, query, language)
-            
-            return processed_response
-            
-        except Exception as e:
-            print(f"❌ RAG query failed: {e}")
-            return self._fallback_response(query, language, error=str(e))
+            processed_responses.append(self._process_response(response, query, language))
+        
+        for position, processed_response in zip(positions, processed_responses):
+            # Answers missing slow or unreachable shards are returned but not cached
+            if missing_shards:
+                processed_response['partial'] = True
+                processed_response['missing_shards'] = missing_shards
+                responses[position] = processed_response
+            else:
+                self.response_cache.put(cache_keys[position], processed_response)
+                responses[position] = dict(processed_response)
     
     def _enhance_query(self, query, language):
         """
@@ -219,10 +329,403 @@ class ChatbotRAGInterface:
             'timestamp': datetime.now().isoformat()
         }
 
+def _empty_query_response():
+    """
+    Response returned when a request carries no query text
+    """
+    return {
+        'query': '',
+        'response': 'No query provided',
+        'confidence': 0.0,
+        'sources': [],
+        'error': 'Empty query'
+    }
+
+def _error_response(query, error):
+    """
+    Response returned when a request could not be processed
+    """
+    return {
+        'query': query,
+        'response': f'RAG query processing failed: {error}',
+        'confidence': 0.0,
+        'sources': [],
+        'error': error,
+        'timestamp': datetime.now().isoformat()
+    }
+
+# Largest number of sources a request may ask for; larger topK values are capped
+MAX_TOP_K = 50
+
+def parse_top_k(value, default=3):
+    """
+    Validated topK of a request: a positive integer (not a bool or string), capped at MAX_TOP_K
+    """
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError('topK must be a positive integer')
+    return min(value, MAX_TOP_K)
+
+def _completed_future(result):
+    """Future that already holds result"""
+    future = Future()
+    future.set_result(result)
+    return future
+
+def _then(future, fn):
+    """Future of fn(result of future), completed as soon as future is"""
+    chained = Future()
+    
+    def done(source):
+        try:
+            chained.set_result(fn(source.result()))
+        except Exception as e:
+            chained.set_exception(e)
+    
+    future.add_done_callback(done)
+    return chained
+
+def _histogram_bucket(value):
+    """Power-of-two histogram bucket label: "1", "2", "3-4", "5-8", ..."""
+    if value <= 2:
+        return str(value)
+    upper = 1 << (value - 1).bit_length()
+    return f"{upper // 2 + 1}-{upper}"
+
+class QueryBatcher:
+    """
+    Micro-batching scheduler for concurrent queries. Callers block in submit() while one
+    scheduler thread collects queries for up to window_ms (or max_batch_size queries) and
+    answers them with one batched encode + search. A query arriving while the server is
+    idle is answered at once; the window is only waited on while the previous batch
+    held more than one query, i.e. under load.
+    """
+    
+    def __init__(self, rag_interface, window_ms=5.0, max_batch_size=32):
+        self.rag_interface = rag_interface
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.queue_depths = {}
+        self.batch_sizes = {}
+        self.batches = 0
+        self.queries = 0
+        self._under_load = False
+        self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+        self._thread.start()
+    
+    def submit(self, query, language='en', top_k=3, filters=None):
+        """
+        Queue one query and wait for its response
+        """
+        return self.submit_future(query, language, top_k, filters).result()
+    
+    def submit_future(self, query, language='en', top_k=3, filters=None):
+        """
+        Queue one query; returns a concurrent.futures.Future of its response
+        """
+        future = Future()
+        self.queue.put(((query, language, top_k, filters), future))
+        depth = self.queue.qsize()
+        with self.lock:
+            bucket = _histogram_bucket(max(depth, 1))
+            self.queue_depths[bucket] = self.queue_depths.get(bucket, 0) + 1
+        return future
+    
+    def _collect(self):
+        """
+        Block for the first queued query, then gather more until the window closes or the batch is full
+        """
+        batch = [self.queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if not self._under_load or remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        self._under_load = len(batch) > 1
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            requests = [request for request, _ in batch]
+            try:
+                responses = self.rag_interface.query_rag_batch(requests)
+            except Exception as e:
+                responses = [_error_response(query, str(e)) for query, _, _, _ in requests]
+            for (_, future), response in zip(batch, responses):
+                future.set_result(response)
+            
+            with self.lock:
+                self.batches += 1
+                self.queries += len(batch)
+                bucket = _histogram_bucket(len(batch))
+                self.batch_sizes[bucket] = self.batch_sizes.get(bucket, 0) + 1
+    
+    def stats(self):
+        """
+        Scheduler settings, current queue depth and histograms of queue depth on arrival and batch size
+        """
+        def ordered(histogram):
+            return dict(sorted(histogram.items(), key=lambda item: int(item[0].split('-')[-1])))
+        
+        with self.lock:
+            return {
+                'window_ms': round(self.window * 1000, 3),
+                'max_batch_size': self.max_batch_size,
+                'queue_depth': self.queue.qsize(),
+                'batches': self.batches,
+                'queries': self.queries,
+                'mean_batch_size': round(self.queries / self.batches, 2) if self.batches else 0.0,
+                'queue_depth_histogram': ordered(self.queue_depths),
+                'batch_size_histogram': ordered(self.batch_sizes)
+            }
+
+class RAGQueryServer:
+    """
+    Long-lived query server that keeps one ChatbotRAGInterface warm and
+    answers newline-delimited JSON requests over stdin/stdout or a Unix socket.
+
+    Request lines look like the one-shot stdin payload plus an optional id:
+        {"id": 1, "query": "yellow leaves in rice", "language": "en", "topK": 3,
+         "filters": {"crop": "rice", "season": "kharif"}}
+        {"id": 2, "type": "health"}
+    Every response line echoes the request id. Pipelined requests are batched
+    together and answered as they complete, not necessarily in order.
+    """
+    
+    def __init__(self, rag_interface, batch_window_ms=5.0, max_batch_size=32):
+        self.rag_interface = rag_interface
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.lock = threading.Lock()
+        # Concurrent queries share batched encodes; the scheduler thread is the only caller of the RAG system
+        self.batcher = QueryBatcher(rag_interface, batch_window_ms, max_batch_size)
+    
+    def health(self):
+        """
+        Health/readiness payload shared by the ready line and health requests
+        """
+        rag_system = self.rag_interface.rag_system
+        return {
+            'type': 'health',
+            'status': 'ready' if self.rag_interface.system_ready else 'degraded',
+            'ready': self.rag_interface.system_ready,
+            'num_chunks': len(rag_system.chunks_data) if rag_system else 0,
+            'index_version': rag_system.index_version if rag_system else None,
+            'query_cache': rag_system.query_cache.stats() if rag_system else None,
+            'response_cache': self.rag_interface.response_cache.stats() if rag_system else None,
+            'shard_servers': (self.rag_interface.shard_coordinator.stats()
+                              if self.rag_interface.shard_coordinator else None),
+            'scheduler': self.batcher.stats(),
+            'requests_served': self.requests_served,
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'pid': os.getpid()
+        }
+    
+    def handle_request(self, request_data):
+        """
+        Answer a single decoded request
+        """
+        return self.submit_request(request_data).result()
+    
+    def submit_request(self, request_data):
+        """
+        Start answering a single decoded request and return a Future of its response.
+        Queries wait in the batcher, so requests submitted back to back share a batch.
+        """
+        request_type = request_data.get('type', 'query')
+        
+        if request_type == 'health':
+            future = _completed_future(self.health())
+        elif request_type == 'query':
+            query = str(request_data.get('query', '')).strip()
+            language = request_data.get('language', 'en')
+            filters = request_data.get('filters')
+            
+            if not query:
+                future = _completed_future(_empty_query_response())
+            else:
+                future = self._submit_query(query, language, request_data.get('topK'), filters)
+        else:
+            future = _completed_future(_error_response('', f'Unknown request type: {request_type}'))
+        
+        if 'id' in request_data:
+            future = _then(future, lambda response: dict(response, id=request_data['id']))
+        return future
+    
+    def _submit_query(self, query, language, top_k, filters):
+        """
+        Queue one query on the batcher. An invalid topK gets its own error
+        response here and never reaches a shared batch.
+        """
+        try:
+            top_k = parse_top_k(top_k)
+        except ValueError as e:
+            return _completed_future(_error_response(query, str(e)))
+        
+        return _then(self.batcher.submit_future(query, language, top_k, filters), self._served)
+    
+    def _served(self, response):
+        with self.lock:
+            self.requests_served += 1
+        return response
+    
+    def handle_line(self, line):
+        """
+        Decode one request line and return the encoded response line
+        """
+        return self.submit_line(line).result()
+    
+    def submit_line(self, line):
+        """
+        Future of the encoded response line for one request line
+        """
+        try:
+            request_data = json.loads(line)
+            if not isinstance(request_data, dict):
+                raise ValueError('Request must be a JSON object')
+            future = self.submit_request(request_data)
+        except Exception as e:
+            future = _completed_future(_error_response('', str(e)))
+        
+        return _then(future, lambda response: json.dumps(response, ensure_ascii=False) + '\n')
+    
+    def serve_lines(self, lines, write):
+        """
+        Submit every request line without waiting for earlier answers, so pipelined
+        requests are batched together, and write(response_line) each response as it
+        completes (responses may come back out of order; clients match them by id).
+        Returns once every request read has been answered.
+        """
+        written = threading.Condition()
+        outstanding = 0
+        
+        def write_response(future):
+            nonlocal outstanding
+            with written:
+                write(future.result())
+                outstanding -= 1
+                written.notify_all()
+        
+        for line in lines:
+            if not line.strip():
+                continue
+            with written:
+                outstanding += 1
+            self.submit_line(line).add_done_callback(write_response)
+        
+        with written:
+            written.wait_for(lambda: outstanding == 0)
+    
+    def serve_stdio(self, instream, outstream):
+        """
+        Serve requests from instream until EOF, writing one response per line
+        """
+        outstream.write(json.dumps(dict(self.health(), type='ready')) + '\n')
+        outstream.flush()
+        
+        def write(response_line):
+            outstream.write(response_line)
+            outstream.flush()
+        
+        self.serve_lines(instream, write)
+    
+    def serve_socket(self, socket_path):
+        """
+        Serve requests on a Unix domain socket; the socket only appears once the system is loaded
+        """
+        if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+            raise RuntimeError('Unix sockets are not supported on this platform, use stdio mode')
+        
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        
+        query_server = self
+        
+        class LineHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                def write(response_line):
+                    self.wfile.write(response_line.encode('utf-8'))
+                    self.wfile.flush()
+                
+                query_server.serve_lines((raw_line.decode('utf-8') for raw_line in self.rfile), write)
+        
+        with socketserver.ThreadingUnixStreamServer(socket_path, LineHandler) as server:
+            server.daemon_threads = True
+            print(f"✅ RAG query server listening on {socket_path}", file=sys.stderr)
+            try:
+                server.serve_forever()
+            finally:
+                if os.path.exists(socket_path):
+                    os.unlink(socket_path)
+
+def load_warm_interface(shard_servers=None, shard_timeout_ms=None):
+    """
+    Load the RAG interface and pay the model/index load now, before announcing readiness
+    """
+    rag_interface = ChatbotRAGInterface(shard_servers=shard_servers, shard_timeout_ms=shard_timeout_ms)
+    
+    if rag_interface.system_ready:
+        try:
+            rag_interface.system_ready = rag_interface.rag_system.warmup()
+        except Exception as e:
+            print(f"❌ RAG warmup failed: {e}")
+            rag_interface.system_ready = False
+    return rag_interface
+
+def serve(socket_path=None, shard_servers=None, shard_timeout_ms=None, batch_window_ms=5.0, max_batch_size=32):
+    """
+    Load the RAG system once and answer requests until stopped
+    """
+    # Keep stdout clean for the protocol: status prints from the RAG system go to stderr
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+    
+    rag_interface = load_warm_interface(shard_servers, shard_timeout_ms)
+    server = RAGQueryServer(rag_interface, batch_window_ms, max_batch_size)
+    
+    if socket_path:
+        protocol_out.write(json.dumps(dict(server.health(), type='ready', socket=socket_path)) + '\n')
+        protocol_out.flush()
+        server.serve_socket(socket_path)
+    else:
+        server.serve_stdio(sys.stdin, protocol_out)
+
 def main():
     """
     Main function to process RAG queries
     """
+    parser = argparse.ArgumentParser(description='Query the farmer RAG system')
+    parser.add_argument('--serve', action='store_true',
+                        help='keep the RAG system loaded and answer newline-delimited JSON requests')
+    parser.add_argument('--socket', default=None,
+                        help='Unix socket path for --serve (default: stdin/stdout)')
+    parser.add_argument('--shard-servers', default=None,
+                        help='comma-separated host:port shard servers to search instead of local shards')
+    parser.add_argument('--shard-timeout-ms', type=float, default=None,
+                        help='per-shard search timeout (default: RAG_SHARD_TIMEOUT_MS or 500)')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0,
+                        help='--serve: how long concurrent queries are collected into one batch under load')
+    parser.add_argument('--max-batch-size', type=int, default=32,
+                        help='--serve: most queries encoded and searched together (1 disables batching)')
+    args = parser.parse_args()
+    
+    if args.serve:
+        serve(args.socket, args.shard_servers, args.shard_timeout_ms, args.batch_window_ms, args.max_batch_size)
+        return
+    
     try:
         # Read input from stdin
         input_data = sys.stdin.read()
@@ -230,36 +733,25 @@ def main():
         
         query = request_data.get('query', '').strip()
         language = request_data.get('language', 'en')
-        top_k = request_data.get('topK', 3)
+        top_k = parse_top_k(request_data.get('topK'))
+        filters = request_data.get('filters')
         
         if not query:
-            print(json.dumps({
-                'query': '',
-                'response': 'No query provided',
-                'confidence': 0.0,
-                'sources': [],
-                'error': 'Empty query'
-            }))
+            print(json.dumps(_empty_query_response()))
             return
         
         # Initialize RAG interface and process query
-        rag_interface = ChatbotRAGInterface()
-        result = rag_interface.query_rag(query, language, top_k)
+        rag_interface = ChatbotRAGInterface(shard_servers=args.shard_servers,
+                                            shard_timeout_ms=args.shard_timeout_ms)
+        result = rag_interface.query_rag(query, language, top_k, filters)
         
         # Output result as JSON
         print(json.dumps(result, ensure_ascii=False))
         
     except Exception as e:
         # Output error response
-        error_response = {
-            'query': request_data.get('query', '') if 'request_data' in locals() else '',
-            'response': f'RAG query processing failed: {str(e)}',
-            'confidence': 0.0,
-            'sources': [],
-            'error': str(e),
-            'timestamp': datetime.now().isoformat()
-        }
-        print(json.dumps(error_response))
+        query = request_data.get('query', '') if 'request_data' in locals() else ''
+        print(json.dumps(_error_response(query, str(e))))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
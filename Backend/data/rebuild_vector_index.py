@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Vector Index Rebuild
+Rebuilds a saved system's FAISS index from its stored embeddings.npy, so
+switching index type or quantization (or replacing a corrupt index) needs
+no embedding model and no re-encoding.
+
+Usage:
+    python rebuild_vector_index.py --system rag_system --type hnsw
+    python rebuild_vector_index.py --type ivf_flat --params '{"nprobe": 32, "quantization": "int8"}'
+    python rebuild_vector_index.py --type flat --embeddings-dtype float16   # also halve embeddings.npy
+    python rebuild_vector_index.py --type hnsw --shards 8 --partition crop  # one index per crop group
+"""
+
+import argparse
+import json
+import sys
+
+import farmer_rag_system
+from farmer_rag_system import FarmerRAGSystem, INDEX_TYPES
+from sharded_index import PARTITIONS
+
+def main():
+    """
+    Rebuild the vector index of a saved system and save it back
+    """
+    parser = argparse.ArgumentParser(description='Rebuild the FAISS index from stored embeddings')
+    parser.add_argument('--system', default='rag_system', help='saved RAG system directory')
+    parser.add_argument('--type', default='flat', choices=list(INDEX_TYPES), help='index type to build')
+    parser.add_argument('--params', default='{}', help='JSON object of index parameters, e.g. {"ef_search": 128}')
+    parser.add_argument('--shards', type=int, default=None, help='number of index shards (default: keep)')
+    parser.add_argument('--partition', default=None, choices=list(PARTITIONS),
+                        help='how chunks are assigned to shards (default: keep)')
+    parser.add_argument('--embeddings-dtype', default=None, choices=['float32', 'float16'],
+                        help='store embeddings.npy in this dtype (default: keep)')
+    parser.add_argument('--output', default=None, help='save to this directory instead of --system')
+    args = parser.parse_args()
+
+    if not farmer_rag_system.faiss_available():
+        print("❌ faiss is required: pip install faiss-cpu")
+        sys.exit(1)
+
+    rag_system = FarmerRAGSystem()
+    rag_system.load_system(args.system)
+
+    if not rag_system.rebuild_index_from_embeddings(args.type, args.shards, args.partition, **json.loads(args.params)):
+        sys.exit(1)
+
+    rag_system.save_system(args.output or args.system, embeddings_dtype=args.embeddings_dtype)
+
+if __name__ == "__main__":
+    main()
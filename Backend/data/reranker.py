@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Second-Stage Rerankers
+Re-score the first-stage candidates of a query with a more precise scorer
+
+Two scorers are available:
+    lexical         weighted overlap of query terms and bigrams with the chunk
+                    text; pure Python, microseconds per candidate
+    cross_encoder   a sentence-transformers CrossEncoder reading query and chunk
+                    together; much more precise, milliseconds per candidate
+
+Both return scores in 0..1 and can stop early at a deadline, so the caller
+can keep the first-stage order when the latency budget runs out.
+"""
+
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from bm25_index import BM25Index, tokenize
+
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+class LexicalOverlapReranker:
+    """
+    Fraction of the query's terms and bigrams found in the chunk. Terms are weighted by
+    their idf in lexical_index when one is set; terms absent from it cannot match and are ignored.
+    """
+
+    name = "lexical"
+
+    def __init__(self, lexical_index: Optional[BM25Index] = None, bigram_weight: float = 0.3):
+        self.lexical_index = lexical_index
+        self.bigram_weight = bigram_weight
+
+    def warmup(self) -> bool:
+        return True
+
+    def score(self, query: str, texts: Sequence[str], deadline: Optional[float] = None) -> Optional[np.ndarray]:
+        """Scores of texts for query, or None once the deadline (a time.perf_counter() value) passes"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if self.lexical_index is not None:
+            vocabulary, idf = self.lexical_index.vocabulary, self.lexical_index.idf
+            weights = {term: float(idf[vocabulary[term]]) for term in terms if term in vocabulary}
+        else:
+            weights = dict.fromkeys(terms, 1.0)
+        total_weight = sum(weights.values())
+        if not total_weight:
+            return np.zeros(len(texts))
+        bigrams = set(zip(terms, terms[1:]))
+
+        scores = np.zeros(len(texts))
+        for i, text in enumerate(texts):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            tokens = tokenize(text)
+            present = set(tokens)
+            coverage = sum(weight for term, weight in weights.items() if term in present) / total_weight
+            if bigrams:
+                phrase = len(bigrams & set(zip(tokens, tokens[1:]))) / len(bigrams)
+                coverage = (1 - self.bigram_weight) * coverage + self.bigram_weight * phrase
+            scores[i] = coverage
+        return scores
+
+class CrossEncoderReranker:
+    """
+    sentence-transformers CrossEncoder, loaded on first use; logits are squashed to 0..1
+    """
+
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, batch_size: int = 16):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = None
+        self.available = True
+
+    def warmup(self) -> bool:
+        """Load the model now so the first query's budget is not spent on it"""
+        if self.model is None and self.available:
+            try:
+                from sentence_transformers import CrossEncoder
+                print(f"🤖 Loading cross-encoder: {self.model_name}")
+                self.model = CrossEncoder(self.model_name)
+                self.model.predict([("warmup", "warmup")])
+            except Exception as e:
+                print(f"❌ Cross-encoder unavailable, reranking disabled: {e}")
+                self.model = None
+                self.available = False
+        return self.model is not None
+
+    def score(self, query: str, texts: Sequence[str], deadline: Optional[float] = None) -> Optional[np.ndarray]:
+        """Scores of texts for query, or None once the deadline (a time.perf_counter() value) passes"""
+        if not self.warmup():
+            return None
+        scores: List[np.ndarray] = []
+        for start in range(0, len(texts), self.batch_size):
+            if deadline is not None and time.perf_counter() > deadline:
+                return None
+            pairs = [(query, text) for text in texts[start:start + self.batch_size]]
+            scores.append(np.asarray(self.model.predict(pairs), dtype=np.float64).reshape(-1))
+        if not scores:
+            return np.zeros(0)
+        return 1.0 / (1.0 + np.exp(-np.concatenate(scores)))
+
+RERANKERS = {
+    "lexical": LexicalOverlapReranker,
+    "cross_encoder": CrossEncoderReranker
+}
@@ -149,11 +149,15 @@ def main():
             "total_chunks": len(chunks),
             "embedding_dimension": embeddings.shape[1] if embeddings is not None else 0,
             "model_name": rag_system.model_name,
+            "embedding_cache": rag_system.embedding_cache_stats,
             "status": "completed",
             "files_created": [
                 "farmer_problems_dataset.json",
-                "rag_system/chunks_data.json",
+                "rag_system/chunks.bin",
+                "rag_system/problems.bin",
                 "rag_system/vector_index.faiss",
+                "rag_system/embeddings.npy",
+                "rag_system/bm25_index.npz",
                 "rag_system/metadata.json"
             ]
         }
@@ -165,6 +169,8 @@ def main():
         print(f"📈 Total Problems: {summary['total_problems']}")
         print(f"🔧 Total Chunks: {summary['total_chunks']}")
         print(f"🤖 Model: {summary['model_name']}")
+        if summary['embedding_cache']:
+            print(f"📦 Embedding cache hit ratio: {summary['embedding_cache']['hit_ratio']:.1%}")
         print(f"📁 Files Created: {len(summary['files_created'])}")
         print(f"💾 Summary saved to: setup_summary.json")
         
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Shard Server
+Serves vector search for one shard of a saved, sharded RAG system over TCP,
+plus the coordinator that fans queries out to a set of such servers.
+
+Each server keeps a single shard index in memory, so an index too large for
+one machine is spread over one node per shard (a shard may run on several
+nodes as replicas). The protocol is newline-delimited JSON; vectors and id
+lists travel as base64-encoded little-endian arrays:
+    {"id": 1, "type": "search", "index_version": "...", "top_k": 5,
+     "vectors": {"dtype": "float32", "shape": [1, 384], "data": "..."},
+     "selected": null, "excluded": null}
+    {"id": 2, "type": "health"}
+Search requests and responses use shard-local ids; the coordinator maps them
+to chunk rows.
+
+The coordinator (RemoteShardedIndex) is a ShardedIndex whose shards are
+searched over the network. Every shard gets its own timeout, and a shard that
+is slow, down or serving another index version is left out of the merge, so
+the query is answered from the remaining shards.
+
+Usage:
+    python shard_server.py --system rag_system --shard 0 --port 9100
+    python shard_server.py --system rag_system --shard 1 --port 9101
+    RAG_SHARD_SERVERS=127.0.0.1:9100,127.0.0.1:9101 python query_rag.py --serve
+"""
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from farmer_rag_system import FarmerRAGSystem, faiss_available
+from sharded_index import ShardedIndex
+
+Address = Tuple[str, int]
+
+def encode_array(array: Optional[np.ndarray]) -> Optional[Dict[str, Any]]:
+    """JSON-safe form of an array"""
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array)
+    return {"dtype": array.dtype.str, "shape": list(array.shape),
+            "data": base64.b64encode(array.tobytes()).decode('ascii')}
+
+def decode_array(payload: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """Array from encode_array()"""
+    if payload is None:
+        return None
+    data = base64.b64decode(payload["data"])
+    return np.frombuffer(data, dtype=np.dtype(payload["dtype"])).reshape(payload["shape"])
+
+def parse_address(address: str) -> Address:
+    """'host:port' -> (host, port)"""
+    host, _, port = address.strip().rpartition(':')
+    if not host or not port.isdigit():
+        raise ValueError(f"Invalid shard server address '{address}', expected host:port")
+    return host, int(port)
+
+class ShardServer:
+    """
+    One shard of a saved sharded RAG system, answering search and health requests
+    """
+
+    def __init__(self, save_dir: str, shard: int):
+        with open(os.path.join(save_dir, "metadata.json"), 'r') as f:
+            metadata = json.load(f)
+        shards_meta = metadata.get("shards")
+        if not shards_meta:
+            raise ValueError(f"{save_dir} has no sharded index, rebuild it with rebuild_vector_index.py --shards N")
+        if not 0 <= shard < len(shards_meta["files"]):
+            raise ValueError(f"Shard {shard} does not exist, {save_dir} has {len(shards_meta['files'])} shards")
+        if not faiss_available():
+            raise RuntimeError("faiss is required: pip install faiss-cpu")
+
+        # The RAG system is only used for its (filtered) search routines
+        self.rag_system = FarmerRAGSystem(metadata.get("model_name", "all-MiniLM-L6-v2"))
+        self.rag_system.index_config = metadata.get("index", {"type": "flat"})
+        sharded = ShardedIndex.open(save_dir, shards_meta["files"], metadata.get("embedding_dim"),
+                                    shards_meta["partition"], on_load=self.rag_system._apply_search_params)
+
+        self.shard = shard
+        self.num_shards = sharded.num_shards
+        self.index = sharded.shard(shard)
+        self.index_version = metadata.get("index_version", metadata.get("created_date"))
+        self.started_at = time.time()
+        self.requests_served = 0
+        self.lock = threading.Lock()
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            'type': 'health',
+            'shard': self.shard,
+            'num_shards': self.num_shards,
+            'num_rows': int(self.index.ntotal),
+            'index_version': self.index_version,
+            'index_type': self.rag_system.index_config.get("type", "flat"),
+            'requests_served': self.requests_served,
+            'uptime_seconds': round(time.time() - self.started_at, 3),
+            'pid': os.getpid()
+        }
+
+    def search(self, request_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Top-k shard-local ids for the request's query vectors
+        """
+        version = request_data.get('index_version')
+        if version is not None and version != self.index_version:
+            raise ValueError(f"Index version mismatch: shard serves {self.index_version}, request wants {version}")
+
+        query_vectors = np.ascontiguousarray(decode_array(request_data['vectors']), dtype=np.float32)
+        selected = decode_array(request_data.get('selected'))
+        excluded = decode_array(request_data.get('excluded'))
+        top_k = int(request_data.get('top_k', 5))
+
+        similarities, indices = self.rag_system._search_index(self.index, query_vectors, top_k, selected, excluded)
+        with self.lock:
+            self.requests_served += 1
+        return {
+            'type': 'search',
+            'similarities': encode_array(np.asarray(similarities, dtype=np.float32)),
+            'indices': encode_array(np.asarray(indices, dtype=np.int64))
+        }
+
+    def handle_line(self, line: str) -> str:
+        """
+        Decode one request line and return the encoded response line
+        """
+        request_data = {}
+        try:
+            request_data = json.loads(line)
+            if not isinstance(request_data, dict):
+                raise ValueError('Request must be a JSON object')
+            request_type = request_data.get('type', 'search')
+            if request_type == 'health':
+                response = self.health()
+            elif request_type == 'search':
+                response = self.search(request_data)
+            else:
+                raise ValueError(f'Unknown request type: {request_type}')
+        except Exception as e:
+            response = {'type': 'error', 'error': str(e)}
+
+        if isinstance(request_data, dict) and 'id' in request_data:
+            response['id'] = request_data['id']
+        return json.dumps(response) + '\n'
+
+    def create_server(self, host: str, port: int) -> socketserver.ThreadingTCPServer:
+        """
+        Bound TCP server for this shard, one thread per connection (port 0 picks a free port)
+        """
+        shard_server = self
+
+        class LineHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                for raw_line in self.rfile:
+                    line = raw_line.decode('utf-8')
+                    if not line.strip():
+                        continue
+                    self.wfile.write(shard_server.handle_line(line).encode('utf-8'))
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingTCPServer):
+            allow_reuse_address = True
+            daemon_threads = True
+
+        return Server((host, port), LineHandler)
+
+    def serve(self, host: str, port: int) -> None:
+        """
+        Serve requests on a TCP socket until stopped
+        """
+        with self.create_server(host, port) as server:
+            bound_host, bound_port = server.server_address[:2]
+            print(f"✅ Shard {self.shard} of {self.num_shards} ({self.index.ntotal} rows, "
+                  f"version {self.index_version}) serving on {bound_host}:{bound_port}")
+            sys.stdout.flush()
+            server.serve_forever()
+
+class RemoteShardedIndex(ShardedIndex):
+    """
+    ShardedIndex whose shards are searched by shard servers. Servers announce which shard
+    they hold; several servers for one shard are used round-robin and as failover.
+    """
+
+    def __init__(self, shard_rows: List[np.ndarray], servers: Sequence[str], index_version: Optional[str],
+                 timeout_ms: float = 500.0, dimension: Optional[int] = None, partition: str = "hash",
+                 paths: Optional[List[str]] = None, retry_interval: float = 10.0):
+        # Shard searches wait on the network, so every shard gets its own thread
+        super().__init__(shard_rows, dimension=dimension, partition=partition, paths=paths,
+                         num_threads=len(shard_rows))
+        self.servers = [parse_address(server) for server in servers]
+        self.index_version = index_version
+        self.timeout = timeout_ms / 1000.0
+        self.retry_interval = retry_interval
+        self.replicas: Dict[int, List[Address]] = {}
+        self.counters = {"searches": 0, "partial": 0, "timeouts": 0, "errors": 0}
+        self._down = set()
+        self._idle: Dict[Address, List[Tuple[socket.socket, Any]]] = {}
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count()
+        self._round_robin = itertools.count()
+        self._last_discovery = None
+        self._discovery_lock = threading.Lock()
+        self._discovered = threading.Event()
+
+    @classmethod
+    def from_system(cls, rag_system, servers: Sequence[str], timeout_ms: float = 500.0) -> "RemoteShardedIndex":
+        """Coordinator for a loaded sharded RAG system, reusing its shard row lists"""
+        local = rag_system.vector_index
+        if not isinstance(local, ShardedIndex):
+            raise ValueError("Shard servers need a sharded RAG system, rebuild it with rebuild_vector_index.py --shards N")
+        coordinator = cls(local.shard_rows, servers, rag_system._index_version, timeout_ms, local._dimension,
+                          local.partition, local.paths)
+        coordinator.on_load = local.on_load
+        return coordinator
+
+    def load(self) -> None:
+        """Find out which server holds which shard, unless every shard already has one"""
+        if not self._discovered.is_set() or len(self.replicas) < self.num_shards:
+            self.discover()
+
+    def discover(self) -> None:
+        """
+        Ask every server for its shard; servers of another index version are ignored
+        """
+        self._last_discovery = time.monotonic()
+        replicas: Dict[int, List[Address]] = {}
+        for address in self.servers:
+            try:
+                health = self._call(address, {'type': 'health'}, time.monotonic() + self.timeout)
+            except (OSError, ValueError, RuntimeError) as e:
+                print(f"⚠️ Shard server {address[0]}:{address[1]} unreachable: {e}")
+                continue
+            if health.get('index_version') != self.index_version:
+                print(f"⚠️ Shard server {address[0]}:{address[1]} serves index version "
+                      f"{health.get('index_version')}, expected {self.index_version}")
+                continue
+            replicas.setdefault(int(health['shard']), []).append(address)
+
+        self.replicas = replicas
+        self._discovered.set()
+        missing = [shard for shard in range(self.num_shards) if shard not in replicas]
+        print(f"🔗 {self.num_shards - len(missing)}/{self.num_shards} shards reachable on {len(self.servers)} servers")
+        if missing:
+            print(f"⚠️ No server for shards {missing}, their rows are left out of results")
+
+    def _search_shard(self, shard, query_vectors, top_k, search_fn, local_selected, local_excluded):
+        """
+        Search one shard remotely within the timeout; None when no replica answered in time
+        """
+        if not self._discovered.is_set():
+            # First search before load(): find the servers now instead of answering from no shards
+            with self._discovery_lock:
+                if not self._discovered.is_set():
+                    self.discover()
+        deadline = time.monotonic() + self.timeout
+        replicas = self.replicas.get(shard, [])
+        if not replicas:
+            # Look for the shard again in the background; this query goes without it
+            with self._lock:
+                due = (self._last_discovery is None
+                       or time.monotonic() - self._last_discovery > self.retry_interval)
+                if due:
+                    self._last_discovery = time.monotonic()
+            if due:
+                threading.Thread(target=self.discover, name="shard-discovery", daemon=True).start()
+            return None
+
+        request = {
+            'type': 'search',
+            'index_version': self.index_version,
+            'top_k': top_k,
+            'vectors': encode_array(np.asarray(query_vectors, dtype=np.float32)),
+            'selected': encode_array(local_selected),
+            'excluded': encode_array(local_excluded)
+        }
+        first = next(self._round_robin)
+        for attempt in range(len(replicas)):
+            address = replicas[(first + attempt) % len(replicas)]
+            try:
+                response = self._call(address, request, deadline)
+                self._mark(shard, None)
+                return decode_array(response['similarities']), decode_array(response['indices'])
+            except socket.timeout:
+                self._mark(shard, f"no answer within {self.timeout * 1000:.0f} ms", "timeouts")
+                return None
+            except (OSError, ValueError, RuntimeError) as e:
+                self._mark(shard, str(e), "errors")
+                if time.monotonic() >= deadline:
+                    return None
+        return None
+
+    def search(self, query_vectors, top_k, search_fn=None, selected=None, excluded=None):
+        result = super().search(query_vectors, top_k, search_fn, selected, excluded)
+        with self._lock:
+            self.counters["searches"] += 1
+            if self._last_search.missing_shards:
+                self.counters["partial"] += 1
+        return result
+
+    def _mark(self, shard: int, error: Optional[str], counter: Optional[str] = None) -> None:
+        """Count a failure and report shards going down or coming back once"""
+        with self._lock:
+            if counter:
+                self.counters[counter] += 1
+            if error is not None and shard not in self._down:
+                self._down.add(shard)
+                print(f"⚠️ Shard {shard} unavailable ({error}), answering from the other shards")
+            elif error is None and shard in self._down:
+                self._down.discard(shard)
+                print(f"✅ Shard {shard} answering again")
+
+    def _call(self, address: Address, request: Dict[str, Any], deadline: float) -> Dict[str, Any]:
+        """
+        Send one request on a pooled connection and read its response line before the deadline
+        """
+        request_id = next(self._request_ids)
+        line = (json.dumps(dict(request, id=request_id)) + '\n').encode('utf-8')
+
+        with self._lock:
+            idle = self._idle.setdefault(address, [])
+            connection = idle.pop() if idle else None
+        if connection is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            sock = socket.create_connection(address, timeout=remaining)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = (sock, sock.makefile('rb'))
+
+        sock, reader = connection
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise socket.timeout("timed out")
+            sock.settimeout(remaining)
+            sock.sendall(line)
+            response_line = reader.readline()
+            if not response_line:
+                raise ConnectionError("shard server closed the connection")
+            response = json.loads(response_line)
+            if response.get('id') != request_id:
+                raise ValueError("response does not match the request")
+        except BaseException:
+            # The stream may hold a late answer: never reuse it
+            reader.close()
+            sock.close()
+            raise
+
+        with self._lock:
+            self._idle[address].append(connection)
+        if response.get('type') == 'error':
+            raise RuntimeError(response.get('error'))
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters,
+                        shards={shard: [f"{host}:{port}" for host, port in self.replicas.get(shard, [])]
+                                for shard in range(self.num_shards)},
+                        down=sorted(self._down),
+                        timeout_ms=round(self.timeout * 1000, 3))
+
+    def close(self) -> None:
+        """Close pooled connections"""
+        with self._lock:
+            for connections in self._idle.values():
+                for sock, reader in connections:
+                    reader.close()
+                    sock.close()
+            self._idle.clear()
+
+def main():
+    """
+    Serve one shard of a saved RAG system
+    """
+    parser = argparse.ArgumentParser(description='Serve one shard of a sharded RAG system over TCP')
+    parser.add_argument('--system', default='rag_system', help='saved RAG system directory')
+    parser.add_argument('--shard', type=int, required=True, help='shard number to serve')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=9100, help='TCP port (0 picks a free port)')
+    args = parser.parse_args()
+
+    try:
+        server = ShardServer(args.system, args.shard)
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    try:
+        server.serve(args.host, args.port)
+    except KeyboardInterrupt:
+        print(f"\nShard {args.shard} server stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Sharded Vector Index
+Splits the chunk rows of a RAG system over several independent FAISS indexes
+and searches them in parallel (scatter-gather).
+
+Rows are partitioned by a stable hash of the problem id, or by a metadata
+field (crop or category) so that a filtered search only touches the shards
+holding matching chunks. Each shard stores its own local FAISS ids plus the
+sorted global chunk rows they stand for; searches run shard by shard on a
+thread pool (faiss releases the GIL while searching) and the per-shard
+top-k lists are merged with a heap.
+
+On disk every shard is an independent pair of files, read on first use:
+    shards/shard_NNN.faiss      FAISS index of the shard
+    shards/shard_NNN.rows.npy   int64 global chunk rows, ascending
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# How chunk rows are assigned to shards
+PARTITIONS = ("hash", "crop", "category")
+
+SHARD_DIR = "shards"
+
+def partition_rows(chunks: Sequence[Dict[str, Any]], num_shards: int, partition: str = "hash") -> List[np.ndarray]:
+    """
+    Split chunk rows into at most num_shards ascending row arrays. "hash" spreads problems
+    evenly (all chunks of a problem share a shard); "crop"/"category" keep every value of
+    that field in one shard, packing values onto the least-filled shards, largest first.
+    Empty shards are dropped.
+    """
+    if partition not in PARTITIONS:
+        raise ValueError(f"Unknown partition '{partition}'. Choose from: {', '.join(PARTITIONS)}")
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+
+    field = 'original_id' if partition == "hash" else partition
+    if hasattr(chunks, 'values'):
+        values = chunks.values(field)
+    else:
+        values = [chunk.get(field) for chunk in chunks]
+
+    if partition == "hash":
+        # crc32 is stable across processes, unlike hash() on strings
+        codes = {value: zlib.crc32(str(value).encode('utf-8')) % num_shards for value in set(values)}
+        assignment = np.array([codes[value] for value in values], dtype=np.int64)
+    else:
+        counts: Dict[Any, int] = {}
+        for value in values:
+            counts[value] = counts.get(value, 0) + 1
+        sizes = [(0, shard) for shard in range(num_shards)]
+        shard_of_value = {}
+        for value in sorted(counts, key=lambda value: (-counts[value], str(value))):
+            size, shard = heapq.heappop(sizes)
+            shard_of_value[value] = shard
+            heapq.heappush(sizes, (size + counts[value], shard))
+        assignment = np.array([shard_of_value[value] for value in values], dtype=np.int64)
+
+    shards = [np.flatnonzero(assignment == shard) for shard in range(num_shards)]
+    return [rows.astype(np.int64) for rows in shards if len(rows)]
+
+class ShardedIndex:
+    """
+    Several FAISS indexes over disjoint sets of global chunk rows
+    """
+
+    def __init__(self, shard_rows: List[np.ndarray], indexes: Optional[List[Any]] = None,
+                 dimension: Optional[int] = None, partition: str = "hash", paths: Optional[List[str]] = None,
+                 on_load: Optional[Callable[[Any], None]] = None, num_threads: Optional[int] = None):
+        self.shard_rows = [np.asarray(rows, dtype=np.int64) for rows in shard_rows]
+        self.indexes = list(indexes) if indexes is not None else [None] * len(self.shard_rows)
+        self.paths = paths
+        self.partition = partition
+        self.on_load = on_load
+        self.num_threads = num_threads or min(len(self.shard_rows), os.cpu_count() or 1)
+        self._dimension = dimension
+        self._load_locks = [threading.Lock() for _ in self.shard_rows]
+        self._executor = None
+        self._last_search = threading.local()
+
+        # Global row -> (shard, local id)
+        self.ntotal = int(sum(len(rows) for rows in self.shard_rows))
+        num_rows = max((int(rows[-1]) + 1 for rows in self.shard_rows if len(rows)), default=0)
+        self.shard_of_row = np.full(num_rows, -1, dtype=np.int32)
+        self.local_of_row = np.full(num_rows, -1, dtype=np.int64)
+        for shard, rows in enumerate(self.shard_rows):
+            self.shard_of_row[rows] = shard
+            self.local_of_row[rows] = np.arange(len(rows))
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shard_rows)
+
+    @property
+    def d(self) -> int:
+        if self._dimension is None:
+            self._dimension = self.shard(0).d
+        return self._dimension
+
+    def shard(self, shard: int):
+        """FAISS index of one shard, read from disk on first access"""
+        if self.indexes[shard] is None:
+            with self._load_locks[shard]:
+                if self.indexes[shard] is None:
+                    import faiss
+                    index = faiss.read_index(self.paths[shard])
+                    if self.on_load is not None:
+                        self.on_load(index)
+                    self.indexes[shard] = index
+        return self.indexes[shard]
+
+    def load(self) -> None:
+        """Read every shard now (in parallel)"""
+        list(self._pool().map(self.shard, range(self.num_shards)))
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.num_threads, thread_name_prefix="shard-search")
+        return self._executor
+
+    def _local_rows(self, shard: int, rows: np.ndarray) -> np.ndarray:
+        """Local ids of the global rows that live in shard (ascending when rows are)"""
+        rows = rows[rows < len(self.shard_of_row)]
+        return self.local_of_row[rows[self.shard_of_row[rows] == shard]]
+
+    def search(self, query_vectors: np.ndarray, top_k: int, search_fn: Optional[Callable] = None,
+               selected: Optional[np.ndarray] = None,
+               excluded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scatter the search to every shard that holds candidate rows and merge the results.
+        search_fn(index, query_vectors, top_k, selected, excluded) runs on each shard with
+        shard-local ids (default: plain index.search); returns FAISS-style global results.
+        """
+        tasks = []
+        for shard in range(self.num_shards):
+            local_selected = local_excluded = None
+            if selected is not None:
+                local_selected = self._local_rows(shard, selected)
+                if not len(local_selected):
+                    continue
+            elif excluded is not None:
+                local_excluded = self._local_rows(shard, excluded)
+                if len(local_excluded) == len(self.shard_rows[shard]):
+                    continue
+                if not len(local_excluded):
+                    local_excluded = None
+            tasks.append((shard, local_selected, local_excluded))
+
+        def run(task):
+            shard, local_selected, local_excluded = task
+            result = self._search_shard(shard, query_vectors, top_k, search_fn, local_selected, local_excluded)
+            if result is None:
+                return None
+            similarities, indices = result
+            rows = self.shard_rows[shard]
+            return similarities, np.where(indices >= 0, rows[np.clip(indices, 0, None)], -1)
+
+        results = list(self._pool().map(run, tasks)) if len(tasks) > 1 else [run(task) for task in tasks]
+        self._last_search.missing_shards = [task[0] for task, result in zip(tasks, results) if result is None]
+        return self.merge([result for result in results if result is not None], len(query_vectors), top_k)
+
+    def pop_missing_shards(self) -> List[int]:
+        """Shards left out of this thread's last search (and forget them)"""
+        missing = getattr(self._last_search, "missing_shards", [])
+        self._last_search.missing_shards = []
+        return missing
+
+    def _search_shard(self, shard: int, query_vectors: np.ndarray, top_k: int, search_fn: Optional[Callable],
+                      local_selected: Optional[np.ndarray],
+                      local_excluded: Optional[np.ndarray]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (similarities, local ids) of one shard; None leaves the shard out of the merge
+        """
+        index = self.shard(shard)
+        if search_fn is None:
+            return index.search(query_vectors, top_k)
+        return search_fn(index, query_vectors, top_k, local_selected, local_excluded)
+
+    @staticmethod
+    def merge(results: List[Tuple[np.ndarray, np.ndarray]], num_queries: int,
+              top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Merge per-shard (similarities, indices) lists, each sorted best first, into a global top_k
+        """
+        similarities = np.full((num_queries, top_k), -np.inf, dtype=np.float32)
+        indices = np.full((num_queries, top_k), -1, dtype=np.int64)
+        for query in range(num_queries):
+            streams = [
+                zip(shard_similarities[query].tolist(), shard_indices[query].tolist())
+                for shard_similarities, shard_indices in results
+            ]
+            merged = heapq.merge(*streams, key=lambda hit: (-hit[0], hit[1]))
+            best = list(itertools.islice((hit for hit in merged if hit[1] >= 0), top_k))
+            for rank, (similarity, row) in enumerate(best):
+                similarities[query, rank] = similarity
+                indices[query, rank] = row
+        return similarities, indices
+
+    def reconstruct_batch(self, rows: np.ndarray) -> np.ndarray:
+        """Stored vectors of global rows (IVF shards get a direct map first)"""
+        import faiss
+        rows = np.asarray(rows, dtype=np.int64)
+        vectors = np.empty((len(rows), self.d), dtype=np.float32)
+        shards = self.shard_of_row[rows]
+        for shard in np.unique(shards):
+            index = self.shard(int(shard))
+            ivf = faiss.try_extract_index_ivf(index)
+            if ivf is not None:
+                ivf.make_direct_map()
+            positions = np.flatnonzero(shards == shard)
+            vectors[positions] = index.reconstruct_batch(self.local_of_row[rows[positions]])
+        return vectors
+
+    def reconstruct_n(self, start: int, count: int) -> np.ndarray:
+        return self.reconstruct_batch(np.arange(start, start + count))
+
+    def save(self, save_dir: str) -> List[Dict[str, Any]]:
+        """
+        Write every shard as its own index and rows file; shards already on disk at the
+        same location and never loaded are left as they are. Returns the shard manifest.
+        """
+        import faiss
+        shard_dir = os.path.join(save_dir, SHARD_DIR)
+        os.makedirs(shard_dir, exist_ok=True)
+        manifest = []
+        paths = []
+        for shard, rows in enumerate(self.shard_rows):
+            name = f"shard_{shard:03d}"
+            index_path = os.path.join(shard_dir, f"{name}.faiss")
+            unchanged = (self.indexes[shard] is None and self.paths is not None
+                         and os.path.abspath(self.paths[shard]) == os.path.abspath(index_path))
+            if not unchanged:
+                faiss.write_index(self.shard(shard), index_path)
+                np.save(os.path.join(shard_dir, f"{name}.rows.npy"), rows)
+            paths.append(index_path)
+            manifest.append({"index": f"{SHARD_DIR}/{name}.faiss", "rows": f"{SHARD_DIR}/{name}.rows.npy",
+                             "num_rows": int(len(rows))})
+
+        # Drop files of shards that no longer exist
+        keep = {os.path.basename(path) for entry in manifest for path in (entry["index"], entry["rows"])}
+        for file_name in os.listdir(shard_dir):
+            if file_name.startswith("shard_") and file_name not in keep:
+                os.remove(os.path.join(shard_dir, file_name))
+        return manifest
+
+    @classmethod
+    def open(cls, save_dir: str, manifest: List[Dict[str, Any]], dimension: Optional[int] = None,
+             partition: str = "hash", on_load: Optional[Callable[[Any], None]] = None) -> "ShardedIndex":
+        """Map a saved sharded index; shard indexes are read lazily"""
+        shard_rows = [np.load(os.path.join(save_dir, entry["rows"])) for entry in manifest]
+        paths = [os.path.join(save_dir, entry["index"]) for entry in manifest]
+        return cls(shard_rows, dimension=dimension, partition=partition, paths=paths, on_load=on_load)
@@ -318,6 +318,37 @@ def detect_language_from_audio(text):
     # Default to English
     return 'en'
 
+def handle_request(request_data, converter=None):
+    """
+    Transcribe the audio file named in one request payload ({"audioPath", "language"});
+    converter lets a long-running service reuse one SpeechToTextConverter
+    """
+    audio_path = request_data.get('audioPath')
+    language = request_data.get('language', 'en')
+    
+    if not audio_path or not os.path.exists(audio_path):
+        return {
+            'success': False,
+            'error': 'Audio file not found',
+            'text': '',
+            'confidence': 0.0
+        }
+    
+    # Initialize converter and process audio
+    converter = converter or SpeechToTextConverter()
+    result = converter.convert_audio_to_text(audio_path, language)
+    
+    # If successful, detect language if not specified
+    if result.get('success') and result.get('text'):
+        detected_lang = detect_language_from_audio(result['text'])
+        result['language_detected'] = detected_lang
+        
+        # Add processing metadata
+        result['processed_at'] = datetime.now().isoformat()
+        result['audio_file'] = os.path.basename(audio_path)
+    
+    return result
+
 def main():
     """
     Main function to process speech-to-text requests
@@ -327,30 +358,7 @@ def main():
         input_data = sys.stdin.read()
         request_data = json.loads(input_data)
         
-        audio_path = request_data.get('audioPath')
-        language = request_data.get('language', 'en')
-        
-        if not audio_path or not os.path.exists(audio_path):
-            print(json.dumps({
-                'success': False,
-                'error': 'Audio file not found',
-                'text': '',
-                'confidence': 0.0
-            }))
-            return
-        
-        # Initialize converter and process audio
-        converter = SpeechToTextConverter()
-        result = converter.convert_audio_to_text(audio_path, language)
-        
-        # If successful, detect language if not specified
-        if result.get('success') and result.get('text'):
-            detected_lang = detect_language_from_audio(result['text'])
-            result['language_detected'] = detected_lang
-            
-            # Add processing metadata
-            result['processed_at'] = datetime.now().isoformat()
-            result['audio_file'] = os.path.basename(audio_path)
+        result = handle_request(request_data)
         
         # Output result as JSON
         print(json.dumps(result, ensure_ascii=False))
@@ -0,0 +1,141 @@
+"""
+Shared fixtures for the RAG system tests.
+
+The tests run offline: a deterministic hashing encoder stands in for the
+sentence-transformers model, so retrieval results are reproducible without
+downloading model weights. faiss is required.
+
+Run from Backend/data:
+    python -m pytest tests
+"""
+
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+DATA_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if DATA_DIR not in sys.path:
+    sys.path.insert(0, DATA_DIR)
+
+from farmer_rag_system import FarmerRAGSystem
+
+DATASET_FILE = os.path.join(DATA_DIR, "farmer_problems_dataset.json")
+
+class WordTokenizer:
+    """
+    Stand-in for the model tokenizer: words split into pieces of up to 4 characters and
+    every other non-space character is a token of its own, with character offsets like
+    a fast Hugging Face tokenizer. do_lower_case tells whether the model is uncased.
+    """
+
+    PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+
+    def __init__(self, do_lower_case: bool):
+        self.do_lower_case = do_lower_case
+
+    def __call__(self, text, add_special_tokens=True, return_offsets_mapping=False):
+        offsets = [match.span() for match in self.PIECE.finditer(text)]
+        encoding = {'input_ids': [zlib.crc32(text[start:end].encode('utf-8')) % 30000 for start, end in offsets]}
+        if return_offsets_mapping:
+            encoding['offset_mapping'] = offsets
+        return encoding
+
+    def num_special_tokens_to_add(self) -> int:
+        return 2
+
+class HashingEncoder:
+    """
+    Bag-of-words encoder with the parts of the SentenceTransformer API the RAG system uses.
+    Every word and word pair is hashed into a few dimensions; counts how often it is called.
+    Like an uncased model it ignores case unless lowercase=False.
+    """
+
+    def __init__(self, dimension: int = 64, lowercase: bool = True):
+        self.dimension = dimension
+        self.lowercase = lowercase
+        self.tokenizer = WordTokenizer(do_lower_case=lowercase)
+        self.max_seq_length = 128
+        self.calls = 0
+        self.encoded_texts = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        self.calls += 1
+        self.encoded_texts.extend(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower() if self.lowercase else text)
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                digest = hashlib.md5(feature.encode('utf-8')).digest()
+                vectors[row, digest[0] % self.dimension] += 1.0
+                vectors[row, digest[1] % self.dimension] += 0.5
+        return vectors
+
+def build_system(problems, index_type="flat", num_shards=1, partition="hash", **index_params):
+    """In-memory RAG system over problems, embedded with a HashingEncoder"""
+    rag_system = FarmerRAGSystem()
+    rag_system.embedding_model = HashingEncoder()
+    rag_system.process_and_chunk_data(problems)
+    embeddings = rag_system.create_embeddings(cache_dir=None)
+    rag_system.build_vector_index(embeddings, index_type, num_shards, partition, **index_params)
+    return rag_system
+
+def result_ids(results):
+    """(chunk_id, rounded similarity) of search results"""
+    return [(chunk['chunk_id'], round(chunk['similarity_score'], 5)) for chunk in results]
+
+def assert_same_ranking(results, expected):
+    """
+    Same scores in the same order, and the same chunks apart from the order of equal scores
+    at the cut-off (ties may be broken differently by different indexes)
+    """
+    scores = [score for _, score in result_ids(results)]
+    expected_scores = [score for _, score in result_ids(expected)]
+    assert scores == pytest.approx(expected_scores, abs=1e-5)
+    if expected_scores:
+        cutoff = expected_scores[-1]
+        above = {chunk_id for chunk_id, score in result_ids(results) if score > cutoff + 1e-5}
+        expected_above = {chunk_id for chunk_id, score in result_ids(expected) if score > cutoff + 1e-5}
+        assert above == expected_above
+
+@pytest.fixture(scope="session")
+def dataset():
+    with open(DATASET_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+@pytest.fixture
+def problems(dataset):
+    """About 120 problems spread over the whole dataset (fresh copies, safe to modify)"""
+    return [dict(problem) for problem in dataset[::74]]
+
+@pytest.fixture
+def rag_system(problems):
+    return build_system(problems)
+
+@pytest.fixture
+def rag_interface(rag_system):
+    """ChatbotRAGInterface answering from rag_system"""
+    from query_rag import ChatbotRAGInterface
+    rag_interface = ChatbotRAGInterface(response_cache_size=16)
+    rag_interface.rag_system = rag_system
+    rag_interface.system_ready = True
+    return rag_interface
+
+@pytest.fixture
+def queries():
+    return [
+        "fungal infections in rice",
+        "pest attack on tomato leaves",
+        "soil is too dry for wheat",
+        "yellowing leaves in maize",
+        "best irrigation for vegetables",
+        "low market prices for cotton"
+    ]
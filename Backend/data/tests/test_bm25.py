@@ -0,0 +1,123 @@
+"""
+BM25 scoring, hybrid fusion and the saved BM25 index
+"""
+
+import math
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+from conftest import HashingEncoder, result_ids
+from farmer_rag_system import FarmerRAGSystem
+
+CORPUS = ["rice blast fungus on rice leaves", "rice water", "wheat rust", "Rust on wheat and rice stems!"]
+
+def reference_bm25(query, corpus, k1=1.2, b=0.75):
+    """Textbook Okapi BM25 with the non-negative (Lucene) idf"""
+    docs = [text.lower().replace("!", "").split() for text in corpus]
+    avg_length = sum(len(doc) for doc in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        score = 0.0
+        for term in dict.fromkeys(query.lower().split()):
+            doc_freq = sum(term in other for other in docs)
+            if not doc_freq:
+                continue
+            idf = math.log(1 + (len(docs) - doc_freq + 0.5) / (doc_freq + 0.5))
+            freq = doc.count(term)
+            score += idf * freq * (k1 + 1) / (freq + k1 * (1 - b + b * len(doc) / avg_length))
+        scores.append(score)
+    return scores
+
+@pytest.mark.parametrize("query", ["rice", "wheat rust", "Rice RICE leaves", "barley", "rust fungus rice"])
+def test_bm25_scores_tiny_corpus(query):
+    index = BM25Index.build(CORPUS)
+    scores = index.score_all(query)
+    assert scores.tolist() == pytest.approx(reference_bm25(query, CORPUS), rel=1e-5)
+    for doc, text in enumerate(CORPUS):
+        assert index.score_text(query, text) == pytest.approx(scores[doc], rel=1e-5)
+        assert scores[doc] <= index.max_score(query) + 1e-6
+
+def test_bm25_ranking_and_top_k():
+    index = BM25Index.build(CORPUS)
+    scores = index.score_all("rice")
+    # Length normalization: one "rice" in a two-word chunk beats two in a six-word chunk;
+    # chunks without the term never match
+    top_scores, top_rows = BM25Index.top_k(scores, 10)
+    assert top_rows.tolist() == [1, 0, 3]
+    assert list(top_scores) == sorted(top_scores, reverse=True)
+    assert BM25Index.top_k(scores, 1)[1].tolist() == [1]
+    assert BM25Index.top_k(scores, 10, selected=np.array([1, 2, 3]))[1].tolist() == [1, 3]
+    assert BM25Index.top_k(scores, 10, excluded=np.array([0]))[1].tolist() == [1, 3]
+
+def fused_order(rag_system, method, monkeypatch):
+    """_fuse_results for a fixed dense and lexical candidate list"""
+    rag_system.set_retrieval_mode("hybrid", method=method, dense_weight=0.7, rrf_k=60)
+    monkeypatch.setattr(rag_system, "_lexical_search",
+                        lambda *args: (np.array([1.0, 0.5, 0.4]), np.array([2, 1, 3])))
+    monkeypatch.setattr(rag_system, "_row_vectors", lambda rows: None)
+    results = rag_system._fuse_results("query", None, np.array([0.9, 0.8, 0.3]), np.array([0, 1, 2]),
+                                       top_k=4, num_candidates=4, selected=None, excluded=None)
+    return results
+
+def test_linear_and_rrf_fusion_order(rag_system, monkeypatch):
+    chunk_ids = [chunk['chunk_id'] for chunk in rag_system.chunks_data[:4]]
+
+    # linear: 0.7 * dense + 0.3 * lexical -> row 1 (0.71), 0 (0.63), 2 (0.51), 3 (0.12)
+    linear = fused_order(rag_system, "linear", monkeypatch)
+    assert [chunk['chunk_id'] for chunk in linear] == [chunk_ids[row] for row in (1, 0, 2, 3)]
+    assert [chunk['similarity_score'] for chunk in linear] == pytest.approx([0.71, 0.63, 0.51, 0.12])
+
+    # rrf: row 2 is 1st lexically and 3rd densely, 1/61 + 1/63 just beats row 1's 2/62
+    rrf = fused_order(rag_system, "rrf", monkeypatch)
+    assert [chunk['chunk_id'] for chunk in rrf] == [chunk_ids[row] for row in (2, 1, 0, 3)]
+    # similarity_score stays the linear blend either way
+    assert {chunk['chunk_id']: chunk['similarity_score'] for chunk in rrf} == {
+        chunk['chunk_id']: chunk['similarity_score'] for chunk in linear}
+    assert [chunk['rank'] for chunk in rrf] == [1, 2, 3, 4]
+
+def load(save_dir):
+    rag_system = FarmerRAGSystem()
+    rag_system.embedding_model = HashingEncoder()
+    rag_system.load_system(save_dir)
+    rag_system.set_retrieval_mode("lexical")
+    return rag_system
+
+def test_saved_bm25_index_round_trips(rag_system, queries, tmp_path):
+    rag_system.set_retrieval_mode("lexical")
+    expected = rag_system.search_batch(queries, 5)
+    save_dir = str(tmp_path / "rag_system")
+    rag_system.save_system(save_dir)
+    assert BM25Index.saved_version(f"{save_dir}/bm25_index.npz") == rag_system.index_version
+
+    loaded = load(save_dir)
+    index = loaded.lexical_index
+    original = rag_system.lexical_index
+    assert index is not original and len(index) == len(original)
+    assert index.vocabulary == original.vocabulary
+    for name in ("offsets", "docs", "impacts", "idf"):
+        assert np.array_equal(getattr(index, name), getattr(original, name))
+    assert (index.num_docs, index.avg_doc_length, index.k1, index.b) == pytest.approx(
+        (original.num_docs, original.avg_doc_length, original.k1, original.b))
+    for results, expected_results in zip(loaded.search_batch(queries, 5), expected):
+        assert result_ids(results) == result_ids(expected_results)
+
+def test_saved_bm25_index_of_another_version_is_rebuilt(rag_system, queries, tmp_path):
+    save_dir = str(tmp_path / "rag_system")
+    rag_system.save_system(save_dir)
+
+    # A BM25 index over other chunks of the same count, left behind by another build
+    other_texts = [" ".join(reversed(chunk['text'].split())) + " zzz" for chunk in rag_system.chunks_data]
+    BM25Index.build(other_texts).save(f"{save_dir}/bm25_index.npz", "another-version")
+
+    loaded = load(save_dir)
+    assert "zzz" not in loaded.lexical_index.vocabulary
+    rag_system.set_retrieval_mode("lexical")
+    for results, expected in zip(loaded.search_batch(queries, 5), rag_system.search_batch(queries, 5)):
+        assert result_ids(results) == result_ids(expected)
+
+    # Unstamped files from before versioning are rebuilt too
+    BM25Index.build(other_texts).save(f"{save_dir}/bm25_index.npz")
+    assert BM25Index.saved_version(f"{save_dir}/bm25_index.npz") is None
+    assert "zzz" not in load(save_dir).lexical_index.vocabulary
@@ -0,0 +1,80 @@
+"""
+Query embedding cache and processed response cache
+"""
+
+from conftest import HashingEncoder
+
+def test_query_cache_hits_skip_the_model(rag_system):
+    encoder = rag_system.embedding_model
+    first = rag_system.query_to_vector("pest attack on tomato leaves")
+    calls = encoder.calls
+    assert rag_system.query_cache.stats()["misses"] == 1
+
+    # Repeated whitespace normalizes to the same cache key
+    second = rag_system.query_to_vector("  pest attack   on tomato leaves ")
+    assert encoder.calls == calls
+    assert rag_system.query_cache.stats()["hits"] == 1
+    assert (first == second).all()
+
+def test_query_cache_batch_encodes_each_miss_once(rag_system):
+    encoder = rag_system.embedding_model
+    rag_system.query_to_vector("dry soil")
+    encoded = len(encoder.encoded_texts)
+    vectors = rag_system.queries_to_vectors(["dry soil", "stem borer", "stem borer", "late blight"])
+    assert vectors.shape[0] == 4
+    assert encoder.encoded_texts[encoded:] == ["stem borer", "late blight"]
+    assert (vectors[1] == vectors[2]).all()
+
+def test_cached_vectors_cannot_be_modified(rag_system):
+    vector = rag_system.query_to_vector("stem borer")
+    vector[:] = 0
+    assert rag_system.query_to_vector("stem borer").any()
+
+def test_response_cache_hit_and_miss(rag_interface):
+    first = rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    assert rag_interface.response_cache.stats()["misses"] == 1
+    second = rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    assert rag_interface.response_cache.stats()["hits"] == 1
+    assert second['response'] == first['response']
+
+    # Language, top_k and filters are part of the key
+    rag_interface.query_rag("stem borer in sugarcane", "en", 2)
+    rag_interface.query_rag("stem borer in sugarcane", "en", 3, {"crop": "sugarcane"})
+    assert rag_interface.response_cache.stats()["misses"] == 3
+
+def test_response_cache_invalidated_by_index_version(rag_interface, rag_system):
+    rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    assert len(rag_interface.response_cache) == 1
+
+    # Any index change bumps index_version
+    previous_version = rag_system.index_version
+    rag_system.add_problems([{
+        "id": 100000, "category": "pest_control", "crop": "sugarcane",
+        "problem": "Stem borer tunnels in sugarcane", "solution": "Release Trichogramma egg parasitoids."
+    }])
+    assert rag_system.index_version != previous_version
+
+    rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    stats = rag_interface.response_cache.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 2
+    assert len(rag_interface.response_cache) == 1
+
+def test_uncased_model_shares_cache_entries_across_case(rag_system):
+    encoder = rag_system.embedding_model
+    assert encoder.tokenizer.do_lower_case
+    encoded = len(encoder.encoded_texts)
+    first = rag_system.query_to_vector("Rice Blast")
+    second = rag_system.query_to_vector("rice blast")
+    assert encoder.encoded_texts[encoded:] == ["rice blast"]
+    assert (first == second).all()
+
+def test_cased_model_keeps_case(rag_system):
+    encoder = HashingEncoder(lowercase=False)
+    rag_system.embedding_model = encoder
+    upper = rag_system.query_to_vector("Rice  Blast")
+    lower = rag_system.query_to_vector("rice blast")
+    # The original case is what gets encoded, and each casing has its own entry
+    assert encoder.encoded_texts == ["Rice Blast", "rice blast"]
+    assert not (upper == lower).all()
+    assert (rag_system.query_to_vector("Rice Blast") == upper).all()
+    assert encoder.calls == 2
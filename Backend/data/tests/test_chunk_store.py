@@ -0,0 +1,60 @@
+"""
+Binary chunk store and problem text storage
+"""
+
+import numpy as np
+
+from chunk_store import ChunkStore, write_chunk_store
+from conftest import HashingEncoder, result_ids
+from farmer_rag_system import FarmerRAGSystem
+
+def test_chunk_store_round_trip(rag_system, tmp_path):
+    path = str(tmp_path / "chunks.bin")
+    assert write_chunk_store(rag_system.chunks_data, path) == len(rag_system.chunks_data)
+
+    store = ChunkStore(path)
+    try:
+        assert len(store) == len(rag_system.chunks_data)
+        assert list(store) == rag_system.chunks_data
+        assert store[-1] == rag_system.chunks_data[-1]
+        assert store.values('crop') == [chunk['crop'] for chunk in rag_system.chunks_data]
+        assert store.column('chunk_id').tolist() == [chunk['chunk_id'] for chunk in rag_system.chunks_data]
+    finally:
+        store.close()
+
+def test_chunk_store_missing_fields_and_shared_strings(tmp_path):
+    records = [
+        {"id": 1, "text": "same text", "crop": "rice"},
+        {"id": 2, "text": "same text"},
+        {"id": 3, "text": "other text", "crop": "wheat", "note": "late"}
+    ]
+    path = str(tmp_path / "records.bin")
+    write_chunk_store(records, path)
+    store = ChunkStore(path)
+    try:
+        assert list(store) == records
+        assert store.values('note') == [None, None, "late"]
+        text_refs = store.column('text')
+        assert text_refs[0] == text_refs[1]
+    finally:
+        store.close()
+
+def test_saved_system_round_trips(rag_system, queries, tmp_path):
+    save_dir = str(tmp_path / "rag_system")
+    rag_system.save_system(save_dir)
+
+    loaded = FarmerRAGSystem()
+    loaded.embedding_model = HashingEncoder()
+    loaded.load_system(save_dir)
+
+    assert isinstance(loaded.chunks_data, ChunkStore)
+    assert list(loaded.chunks_data) == rag_system.chunks_data
+    assert list(loaded.problem_texts) == rag_system.problem_texts
+    assert loaded.index_version == rag_system.index_version
+    for record in rag_system.problem_texts:
+        assert loaded.get_problem(record['id']) == record
+    assert np.allclose(loaded.embeddings, rag_system.embeddings)
+
+    for query in queries:
+        assert result_ids(loaded.search_similar_chunks(query, 5)) == result_ids(rag_system.search_similar_chunks(query, 5))
+        assert loaded.generate_response(query)['response'] == rag_system.generate_response(query)['response']
@@ -0,0 +1,60 @@
+"""
+chunk_text boundaries and parallel chunking
+"""
+
+import random
+
+import pytest
+
+from benchmark_chunking import reference_chunk_text
+from farmer_rag_system import FarmerRAGSystem
+
+WORDS = ["rice", "wheat", "apply", "neem", "oil", "every", "week", "drain", "the", "field", "before",
+         "sowing", "yellow", "leaves", "mean", "nitrogen", "deficiency", "use", "urea", "split", "doses"]
+
+def random_texts(count, seed=0):
+    """Sentences of short words with mixed punctuation and whitespace"""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 40)):
+            sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 18)))
+            parts.append(sentence + rng.choice([".", "!", "?", ",", ";", ""]))
+        texts.append("".join(part + rng.choice([" ", " ", " ", "\n", "\t", "  "]) for part in parts))
+    return texts
+
+def dataset_texts(dataset):
+    """Long texts made of consecutive dataset problems and solutions"""
+    return [" ".join(f"{problem['problem']} {problem['solution']}" for problem in dataset[start:start + 8])
+            for start in range(0, 800, 8)]
+
+@pytest.mark.parametrize("chunk_size,overlap", [(200, 50), (120, 30), (64, 0), (300, 100)])
+def test_chunk_text_matches_reference(dataset, chunk_size, overlap):
+    rag_system = FarmerRAGSystem()
+    for text in random_texts(300) + dataset_texts(dataset):
+        assert rag_system.chunk_text(text, chunk_size, overlap) == reference_chunk_text(text, chunk_size, overlap)
+
+def test_short_text_is_one_chunk():
+    assert FarmerRAGSystem().chunk_text("Drain the field.", 200, 50) == ["Drain the field."]
+
+def test_word_longer_than_chunk_is_kept_whole():
+    text = "intro " + "x" * 500 + " outro"
+    chunks = FarmerRAGSystem().chunk_text(text, 200, 50)
+    assert "".join(chunk.replace(" ", "") for chunk in chunks).count("x") >= 500
+    assert all(len(chunk) <= 220 for chunk in chunks)
+
+def test_parallel_chunking_matches_serial(dataset):
+    problems = [dict(problem) for problem in dataset[:300]]
+    for problem in problems[::3]:
+        problem['solution'] = " ".join([problem['solution']] * 6)
+
+    serial = FarmerRAGSystem()
+    serial_chunks = serial.process_and_chunk_data(problems)
+
+    parallel = FarmerRAGSystem()
+    parallel_chunks = parallel.process_and_chunk_data(iter(problems), num_workers=2, batch_size=16)
+
+    assert parallel_chunks == serial_chunks
+    assert parallel.problem_texts == serial.problem_texts
+    assert [chunk['chunk_id'] for chunk in parallel_chunks] == list(range(len(serial_chunks)))
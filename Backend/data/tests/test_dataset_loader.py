@@ -0,0 +1,102 @@
+"""
+Streaming dataset files: incremental JSON array parsing, JSON Lines and schema mapping
+"""
+
+import json
+
+import pytest
+
+from dataset_loader import ProblemFiles, iter_json_array, iter_records, normalize_problem, resolve_paths
+
+RECORDS = [
+    {"id": 1, "question": "Why do \"yellow\" leaves appear?", "answer": "Nitrogen \\ deficiency,\nuse urea.",
+     "crop": "rice", "score": -12.5e-3, "tags": ["a", "b", {"nested": [1, 2, 3]}], "done": True, "note": None},
+    {"id": 23456789, "problem": "Stem borer [tunnels] in {sugarcane}", "solution": "Release Trichogramma.",
+     "ratio": 0.125, "count": 1234567890123},
+    {"id": 3, "question": "Pani ka जल stress — kya karein?", "answer": "Mulch the field, irrigate at dawn."},
+    12345,
+    "a string element with \\\"escapes\\\"",
+    []
+]
+
+def write_json(path, data, **dump_args):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, **dump_args)
+    return str(path)
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 5, 7, 16, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_iter_json_array_across_block_boundaries(tmp_path, read_size, indent):
+    path = write_json(tmp_path / "part.json", RECORDS, indent=indent, ensure_ascii=False)
+    assert list(iter_json_array(path, read_size=read_size)) == RECORDS
+
+@pytest.mark.parametrize("read_size", [1, 4, 1 << 16])
+def test_iter_json_array_numbers_cut_at_the_boundary(tmp_path, read_size):
+    numbers = [1, 22, 333, 4444, -55555, 6.25, 1e21, 7]
+    path = tmp_path / "numbers.json"
+    path.write_text("[" + ",".join(json.dumps(number) for number in numbers) + "]", encoding='utf-8')
+    assert list(iter_json_array(str(path), read_size=read_size)) == numbers
+
+def test_iter_json_array_empty_and_malformed(tmp_path):
+    assert list(iter_json_array(write_json(tmp_path / "empty.json", []), read_size=1)) == []
+
+    (tmp_path / "object.json").write_text('{"id": 1}', encoding='utf-8')
+    with pytest.raises(ValueError, match="expected a JSON array"):
+        list(iter_json_array(str(tmp_path / "object.json")))
+
+    (tmp_path / "truncated.json").write_text('[{"id": 1}, {"id": 2', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(iter_json_array(str(tmp_path / "truncated.json"), read_size=4))
+
+    (tmp_path / "unterminated.json").write_text('[{"id": 1}, ', encoding='utf-8')
+    with pytest.raises(ValueError, match="unexpected end of file"):
+        list(iter_json_array(str(tmp_path / "unterminated.json"), read_size=4))
+
+    (tmp_path / "separator.json").write_text('[{"id": 1} {"id": 2}]', encoding='utf-8')
+    with pytest.raises(ValueError, match="malformed JSON array"):
+        list(iter_json_array(str(tmp_path / "separator.json"), read_size=3))
+
+def test_jsonl_records(tmp_path):
+    path = tmp_path / "part.jsonl"
+    path.write_text("\n".join(json.dumps(record) for record in RECORDS[:3]) + "\n\n", encoding='utf-8')
+    assert list(iter_records(str(path))) == RECORDS[:3]
+
+def test_question_answer_maps_to_problem_solution():
+    record = {"id": 7, "question": "Late blight?", "answer": "Spray mancozeb.", "crop": "potato"}
+    assert normalize_problem(record) == {"id": 7, "problem": "Late blight?", "solution": "Spray mancozeb.",
+                                         "crop": "potato"}
+
+    # Records already in the RAG schema pass through unchanged
+    record = {"id": 8, "problem": "Wilting", "solution": "Irrigate."}
+    assert normalize_problem(record) is record
+
+    # An explicit problem/solution wins over its alias
+    record = {"id": 9, "problem": "Wilting", "question": "ignored", "answer": "Irrigate."}
+    assert normalize_problem(record) == {"id": 9, "problem": "Wilting", "solution": "Irrigate."}
+
+    with pytest.raises(ValueError, match="Record 10"):
+        normalize_problem({"id": 10, "question": "No answer"})
+
+def test_resolve_paths_sorts_parts_naturally(tmp_path):
+    for part in (10, 2, 1, 33):
+        write_json(tmp_path / f"farmer_dataset_part_{part}.json", [])
+    pattern = str(tmp_path / "farmer_dataset_part_*.json")
+    names = [path.rsplit("/", 1)[-1] for path in resolve_paths(pattern)]
+    assert names == [f"farmer_dataset_part_{part}.json" for part in (1, 2, 10, 33)]
+
+    # Overlapping patterns list each file once; plain paths are kept as given
+    single = str(tmp_path / "farmer_dataset_part_2.json")
+    assert resolve_paths([single, pattern]) == [single] + [path for path in resolve_paths(pattern) if path != single]
+
+    with pytest.raises(FileNotFoundError):
+        resolve_paths(str(tmp_path / "missing_*.json"))
+
+def test_problem_files_stream_every_part(tmp_path):
+    write_json(tmp_path / "farmer_dataset_part_10.json", [RECORDS[1]])
+    write_json(tmp_path / "farmer_dataset_part_2.json", [RECORDS[0], RECORDS[2]])
+    problems = ProblemFiles(str(tmp_path / "farmer_dataset_part_*.json"))
+    ids = [problem['id'] for problem in problems]
+    assert ids == [1, 3, 23456789]
+    # Re-iterable, and every record is in the RAG schema
+    assert all('problem' in problem and 'solution' in problem for problem in problems)
+    assert [problem['id'] for problem in problems] == ids
@@ -0,0 +1,89 @@
+"""
+On-disk embedding cache of chunk vectors
+"""
+
+import numpy as np
+
+from conftest import HashingEncoder
+from embedding_cache import EmbeddingCache
+
+def test_cache_hits_are_bit_identical(rag_system, tmp_path):
+    cache_dir = str(tmp_path / "embedding_cache")
+    fresh = rag_system.create_embeddings(cache_dir=None)
+
+    first = rag_system.create_embeddings(cache_dir=cache_dir)
+    assert rag_system.embedding_cache_stats["hits"] == 0
+
+    # A new encoder must not be asked for anything the cache holds
+    rag_system.embedding_model = HashingEncoder()
+    cached = rag_system.create_embeddings(cache_dir=cache_dir)
+    assert rag_system.embedding_model.calls == 0
+    assert rag_system.embedding_cache_stats["misses"] == 0
+    assert cached.dtype == fresh.dtype == np.float32
+    assert np.array_equal(first, fresh)
+    assert np.array_equal(cached, fresh)
+
+def test_only_changed_chunks_are_encoded(rag_system, tmp_path):
+    cache_dir = str(tmp_path / "embedding_cache")
+    rag_system.create_embeddings(cache_dir=cache_dir)
+
+    changed = dict(rag_system.chunks_data[5], text="Completely new advice about drip irrigation")
+    rag_system.chunks_data[5] = changed
+    rag_system.embedding_model = HashingEncoder()
+    embeddings = rag_system.create_embeddings(cache_dir=cache_dir)
+    assert rag_system.embedding_model.encoded_texts == [changed['text']]
+    assert np.array_equal(embeddings[5], HashingEncoder().encode([changed['text']])[0])
+
+def test_cache_is_keyed_by_model(tmp_path):
+    texts = ["leaf spot", "stem rot"]
+    vectors = HashingEncoder().encode(texts)
+    EmbeddingCache(str(tmp_path), "model-a").add(texts, vectors)
+
+    cached, missing = EmbeddingCache(str(tmp_path), "model-a").lookup(texts)
+    assert missing == [] and np.array_equal(cached, vectors)
+    _, missing = EmbeddingCache(str(tmp_path), "model-b").lookup(texts)
+    assert missing == [0, 1]
+
+def test_torn_cache_tail_is_dropped(tmp_path):
+    texts = ["leaf spot", "stem rot"]
+    vectors = HashingEncoder().encode(texts)
+    cache = EmbeddingCache(str(tmp_path), "model-a")
+    cache.add(texts, vectors)
+    with open(cache.vectors_path, 'ab') as f:
+        f.write(b"\1" * 10)
+
+    reopened = EmbeddingCache(str(tmp_path), "model-a")
+    cached, missing = reopened.lookup(texts)
+    assert len(reopened) == 2 and missing == []
+    assert np.array_equal(cached, vectors)
+
+def test_parallel_path_keys_cache_like_serial_path(problems, tmp_path, monkeypatch):
+    import farmer_rag_system
+    from farmer_rag_system import FarmerRAGSystem
+
+    calls = []
+
+    def fake_embed_texts_parallel(texts, num_texts, output_path, model_name, cache=None, **kwargs):
+        texts = list(texts)
+        calls.append((model_name, cache.model_name))
+        return HashingEncoder().encode(texts)
+
+    monkeypatch.setattr(farmer_rag_system, "embed_texts_parallel", fake_embed_texts_parallel)
+    rag_system = FarmerRAGSystem()
+    rag_system.process_and_chunk_data(problems[:10])
+    rag_system.create_embeddings(cache_dir=str(tmp_path), num_workers=2)
+    assert calls == [(rag_system.model_name, rag_system.encoder_id)]
+    # Only the workers encode: the parent never loads the model
+    assert rag_system.embedding_model is None
+
+def test_parallel_embedding_keeps_onnx_backends_in_process(problems, tmp_path):
+    from farmer_rag_system import FarmerRAGSystem
+
+    rag_system = FarmerRAGSystem(backend="onnx")
+    rag_system.embedding_model = HashingEncoder()
+    rag_system.process_and_chunk_data(problems[:10])
+    embeddings = rag_system.create_embeddings(cache_dir=str(tmp_path), num_workers=2)
+    assert rag_system.embedding_model.calls == 1
+    assert embeddings.shape == (len(rag_system.chunks_data), 64)
+    assert EmbeddingCache(str(tmp_path), "all-MiniLM-L6-v2@onnx").lookup([rag_system.chunks_data[0]['text']])[1] == []
+    assert EmbeddingCache(str(tmp_path), "all-MiniLM-L6-v2").lookup([rag_system.chunks_data[0]['text']])[1] == [0]
@@ -0,0 +1,142 @@
+"""
+Routing, validation, backpressure and metrics of the engine HTTP service
+"""
+
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from http_service import MAX_BATCH_QUERIES, EngineService
+
+@pytest.fixture
+def service(rag_interface):
+    """EngineService listening on a free localhost port, run on its own event loop thread"""
+    service = EngineService(rag_interface, batch_window_ms=5.0, max_batch_size=8, max_pending=1)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(asyncio.start_server(service.handle_connection, '127.0.0.1', 0))
+    service.port = server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield service
+
+    async def stop():
+        server.close()
+        connections = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in connections:
+            task.cancel()
+        await asyncio.gather(*connections, return_exceptions=True)
+        await server.wait_closed()
+
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    service.shutdown()
+
+def request(service, method, path, payload=None):
+    """(status, headers, decoded body) of one request"""
+    connection = http.client.HTTPConnection('127.0.0.1', service.port, timeout=30)
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body, {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        data = response.read().decode('utf-8')
+        if response.getheader('Content-Type', '').startswith('application/json'):
+            data = json.loads(data)
+        return response.status, dict(response.getheaders()), data
+    finally:
+        connection.close()
+
+def test_rag_query(service, rag_interface):
+    status, _, result = request(service, 'POST', '/rag/query', {"query": "stem borer in sugarcane", "topK": 2})
+    assert status == 200
+    assert result['response'] == rag_interface.query_rag("stem borer in sugarcane", "en", 2)['response']
+
+    status, _, result = request(service, 'POST', '/rag/query', {"query": "  "})
+    assert status == 400 and result['error'] == 'Empty query'
+
+def test_unknown_route_and_wrong_method(service):
+    status, _, result = request(service, 'GET', '/nope')
+    assert status == 404 and 'error' in result
+
+    status, headers, result = request(service, 'GET', '/rag/query')
+    assert status == 405
+    assert headers['Allow'] == 'POST'
+    assert result['error'] == '/rag/query only accepts POST'
+
+    status, headers, _ = request(service, 'POST', '/healthz', {})
+    assert status == 405 and headers['Allow'] == 'GET'
+
+@pytest.mark.parametrize("top_k", ["5", -1, 0, 2.5])
+def test_bad_top_k_is_400(service, top_k):
+    status, _, result = request(service, 'POST', '/rag/query', {"query": "stem borer", "topK": top_k})
+    assert status == 400
+    assert result == {'error': 'topK must be a positive integer'}
+    assert service.batcher.stats()['queries'] == 0
+
+def test_invalid_json_is_400(service):
+    connection = http.client.HTTPConnection('127.0.0.1', service.port, timeout=30)
+    connection.request('POST', '/rag/query', '{"query": ', {'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read())['error'].startswith('Invalid JSON body')
+    connection.close()
+
+def test_rag_batch_shape(service, rag_interface):
+    payload = {"queries": ["stem borer in sugarcane", {"query": "late blight in potato", "topK": 1}, ""],
+               "topK": 2}
+    status, _, result = request(service, 'POST', '/rag/batch', payload)
+    assert status == 200
+    assert list(result) == ['results']
+    first, second, empty = result['results']
+    assert first['response'] == rag_interface.query_rag("stem borer in sugarcane", "en", 2)['response']
+    assert len(second['sources']) <= 1
+    assert empty['error'] == 'Empty query'
+
+    for bad in [{}, {"queries": []}, {"queries": "stem borer"}, {"queries": [{"query": "a", "topK": 0}]}]:
+        assert request(service, 'POST', '/rag/batch', bad)[0] == 400
+    too_many = {"queries": ["stem borer"] * (MAX_BATCH_QUERIES + 1)}
+    assert request(service, 'POST', '/rag/batch', too_many)[0] == 413
+
+def test_busy_engine_is_rejected(service):
+    # One image request already queued or running fills max_pending
+    service.pending['image'] = service.max_pending
+    status, _, result = request(service, 'POST', '/image/analyze', {"imagePath": "leaf.jpg"})
+    assert status == 503
+    assert result == {'error': 'image engine is busy, retry later'}
+    assert service.rejected['image'] == 1
+    service.pending['image'] = 0
+
+def test_healthz_follows_readiness(service, rag_interface):
+    status, _, health = request(service, 'GET', '/healthz')
+    assert status == 200
+    assert health['status'] == 'ready' and health['ready'] is True
+    assert health['num_chunks'] == len(rag_interface.rag_system.chunks_data)
+
+    rag_interface.system_ready = False
+    status, _, health = request(service, 'GET', '/healthz')
+    assert status == 503
+    assert health['status'] == 'degraded' and health['ready'] is False
+
+def test_metrics(service):
+    request(service, 'POST', '/rag/query', {"query": "stem borer in sugarcane"})
+    request(service, 'GET', '/rag/query')
+    service.pending['image'] = service.max_pending
+    request(service, 'POST', '/image/analyze', {"imagePath": "leaf.jpg"})
+    service.pending['image'] = 0
+
+    status, headers, text = request(service, 'GET', '/metrics')
+    assert status == 200
+    assert headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    lines = text.splitlines()
+    assert 'farmer_http_requests_total{route="/rag/query",status="200"} 1' in lines
+    assert 'farmer_http_requests_total{route="/rag/query",status="405"} 1' in lines
+    assert 'farmer_http_requests_total{route="/image/analyze",status="503"} 1' in lines
+    assert 'farmer_http_request_duration_seconds_count{route="/rag/query"} 2' in lines
+    assert 'farmer_engine_rejected_total{engine="image"} 1' in lines
+    assert any(line.startswith('farmer_rag_queries_total ') for line in lines)
+    assert 'farmer_rag_query_cache_misses_total 1' in lines
+    assert '# TYPE farmer_http_request_duration_seconds histogram' in lines
@@ -0,0 +1,35 @@
+"""
+ivf_pq codebooks are only trained when the corpus has enough vectors for them
+"""
+
+import pytest
+
+from conftest import build_system
+from farmer_rag_system import MIN_POINTS_PER_CENTROID, resolve_index_config
+
+def test_ivf_pq_scales_code_size_to_corpus():
+    # The full 8,850-vector corpus is short of 39 * 256 points for 8-bit codes
+    config = resolve_index_config("ivf_pq", 8850)
+    assert config["pq_bits"] == 7
+    assert 8850 >= MIN_POINTS_PER_CENTROID * 2 ** config["pq_bits"]
+    assert 8850 >= MIN_POINTS_PER_CENTROID * config["nlist"]
+
+    assert resolve_index_config("ivf_pq", 100000)["pq_bits"] == 8
+    assert resolve_index_config("ivf_pq", 624)["pq_bits"] == 4
+
+def test_ivf_pq_refuses_undertrained_codebooks():
+    with pytest.raises(ValueError, match="9984"):
+        resolve_index_config("ivf_pq", 8850, pq_bits=8)
+    with pytest.raises(ValueError, match="flat or ivf_flat"):
+        resolve_index_config("ivf_pq", 623)
+
+def test_ivf_pq_build_on_small_corpus(dataset, queries):
+    problems = [dict(problem) for problem in dataset[::10]]
+    rag_system = build_system(problems, "ivf_pq", pq_m=8)
+    num_vectors = rag_system.vector_index.ntotal
+    assert rag_system.index_config["pq_bits"] == (num_vectors // MIN_POINTS_PER_CENTROID).bit_length() - 1
+    assert all(len(results) == 5 for results in rag_system.search_batch(queries, 5))
+
+def test_ivf_pq_too_small_keeps_no_index(problems):
+    rag_system = build_system(problems, "ivf_pq", pq_m=8)
+    assert rag_system.vector_index is None
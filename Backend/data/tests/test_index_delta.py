@@ -0,0 +1,109 @@
+"""
+Incremental add/update/remove, delta log replay and compaction
+"""
+
+import os
+
+import pytest
+
+from conftest import HashingEncoder, result_ids
+from farmer_rag_system import FarmerRAGSystem
+from index_delta import LOG_FILE, VECTORS_FILE
+
+NEW_PROBLEMS = [
+    {"id": 200001, "category": "pest_control", "crop": "rice", "season": "kharif",
+     "problem": "Brown planthopper hopperburn in rice",
+     "solution": "Drain the field for a few days and avoid excess nitrogen. " * 6},
+    {"id": 200002, "category": "soil_issues", "crop": "wheat",
+     "problem": "Saline patches in wheat field", "solution": "Apply gypsum and leach with good water."}
+]
+
+QUERIES = ["brown planthopper hopperburn rice", "saline patches gypsum wheat", "fungal infections in rice"]
+
+def load(save_dir):
+    rag_system = FarmerRAGSystem()
+    rag_system.embedding_model = HashingEncoder()
+    rag_system.load_system(save_dir)
+    return rag_system
+
+def snapshot(rag_system):
+    return [result_ids(rag_system.search_similar_chunks(query, 5)) for query in QUERIES]
+
+def problem_ids(rag_system, query, top_k=10):
+    return {chunk['original_id'] for chunk in rag_system.search_similar_chunks(query, top_k)}
+
+@pytest.fixture
+def saved_system(rag_system, tmp_path):
+    save_dir = str(tmp_path / "rag_system")
+    rag_system.save_system(save_dir)
+    return load(save_dir), save_dir
+
+def apply_edits(rag_system, problems):
+    rag_system.add_problems(NEW_PROBLEMS)
+    updated = dict(problems[0], solution="Spray tricyclazole at panicle initiation.")
+    rag_system.update_problem(updated)
+    assert rag_system.remove_problem(problems[1]['id'])
+    assert not rag_system.remove_problem(999999)
+
+def test_edits_are_searchable(saved_system, problems):
+    rag_system, _ = saved_system
+    apply_edits(rag_system, problems)
+
+    assert 200001 in problem_ids(rag_system, QUERIES[0])
+    assert problems[1]['id'] not in problem_ids(rag_system, problems[1]['problem'], top_k=50)
+    assert rag_system.get_problem(problems[0]['id'])['solution'] == "Spray tricyclazole at panicle initiation."
+    with pytest.raises(ValueError):
+        rag_system.add_problems([NEW_PROBLEMS[0]])
+    with pytest.raises(KeyError):
+        rag_system.update_problem({"id": 999999, "category": "general", "crop": "rice",
+                                   "problem": "x", "solution": "y"})
+
+def test_delta_replays_on_load(saved_system, problems):
+    rag_system, save_dir = saved_system
+    apply_edits(rag_system, problems)
+    expected = snapshot(rag_system)
+
+    reloaded = load(save_dir)
+    assert reloaded.index_version == rag_system.index_version
+    assert snapshot(reloaded) == expected
+    assert reloaded.get_problem(problems[0]['id'])['solution'] == "Spray tricyclazole at panicle initiation."
+    assert problems[1]['id'] not in problem_ids(reloaded, problems[1]['problem'], top_k=50)
+
+def test_compaction_keeps_results(saved_system, problems):
+    rag_system, save_dir = saved_system
+    apply_edits(rag_system, problems)
+    expected = snapshot(rag_system)
+    version = rag_system.index_version
+
+    assert rag_system.compact()
+    assert rag_system.index_version != version
+    assert not os.path.exists(os.path.join(save_dir, LOG_FILE))
+    assert snapshot(rag_system) == expected
+
+    reloaded = load(save_dir)
+    assert snapshot(reloaded) == expected
+    assert len(reloaded.chunks_data) == len(rag_system.chunks_data)
+
+def test_torn_log_tail_is_recovered(saved_system, problems):
+    rag_system, save_dir = saved_system
+    rag_system.add_problems(NEW_PROBLEMS[:1])
+    expected = snapshot(rag_system)
+    log_path = os.path.join(save_dir, LOG_FILE)
+    vectors_path = os.path.join(save_dir, VECTORS_FILE)
+    log_size = os.path.getsize(log_path)
+    vectors_size = os.path.getsize(vectors_path)
+
+    # An add interrupted after its vectors and half of its log line were written
+    with open(vectors_path, 'ab') as f:
+        f.write(b"\0" * (rag_system.vector_index.d * 4))
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "add", "problem": {"id": 200002')
+
+    reloaded = load(save_dir)
+    assert snapshot(reloaded) == expected
+    assert os.path.getsize(log_path) == log_size
+    assert os.path.getsize(vectors_path) == vectors_size
+
+    # Later edits append after the intact entries and replay too
+    reloaded.add_problems(NEW_PROBLEMS[1:])
+    assert 200002 in problem_ids(load(save_dir), QUERIES[1])
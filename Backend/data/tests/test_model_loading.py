@@ -0,0 +1,51 @@
+"""
+Behavior when the embedding model cannot be loaded
+"""
+
+import pytest
+
+import farmer_rag_system
+
+class UnloadableModel:
+    """SentenceTransformer stand-in whose constructor fails like a model that cannot be downloaded"""
+    attempts = 0
+
+    def __init__(self, model_name, **kwargs):
+        UnloadableModel.attempts += 1
+        raise OSError(f"We couldn't connect to the Hub to load {model_name}")
+
+@pytest.fixture
+def unloadable_model(monkeypatch):
+    UnloadableModel.attempts = 0
+    monkeypatch.setattr(farmer_rag_system, "SentenceTransformer", UnloadableModel)
+    return UnloadableModel
+
+def test_load_failure_returns_none_once(unloadable_model):
+    rag_system = farmer_rag_system.FarmerRAGSystem()
+    assert rag_system.get_embedding_model() is None
+    assert rag_system.get_embedding_model() is None
+    assert unloadable_model.attempts == 1
+    assert "couldn't connect" in rag_system.embedding_model_error
+
+def test_search_survives_load_failure(rag_system, queries, unloadable_model):
+    rag_system.embedding_model = None
+    results = rag_system.search_batch(queries, top_k=3)
+    assert len(results) == len(queries)
+    assert isinstance(rag_system.warmup(), bool)
+    assert rag_system.generate_response(queries[0])['query'] == queries[0]
+
+@pytest.mark.parametrize("mode", ["dense", "hybrid"])
+def test_load_failure_falls_back_to_bm25(rag_system, queries, unloadable_model, mode):
+    lexical = farmer_rag_system.FarmerRAGSystem(retrieval_mode="lexical")
+    lexical._set_chunks(rag_system.chunks_data, rag_system.problem_texts)
+    expected = lexical.search_batch(queries, top_k=5)
+
+    rag_system.set_retrieval_mode(mode)
+    rag_system.embedding_model = None
+    results = rag_system.search_batch(queries, top_k=5)
+    assert any(results)
+    for query_results, expected_results in zip(results, expected):
+        assert [(chunk['chunk_id'], chunk['similarity_score']) for chunk in query_results] == \
+            [(chunk['chunk_id'], chunk['similarity_score']) for chunk in expected_results]
+    assert rag_system.warmup()
+    assert rag_system.generate_response(queries[0])['sources']
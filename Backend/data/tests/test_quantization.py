@@ -0,0 +1,71 @@
+"""
+fp16 / int8 scalar-quantized indexes: recall against exact search and saved configuration
+"""
+
+import faiss
+import numpy as np
+import pytest
+
+from conftest import HashingEncoder, build_system, result_ids
+from farmer_rag_system import FarmerRAGSystem
+
+TOP_K = 10
+
+# recall@10 the unquantized index type reaches on this corpus (ivf_flat probes 16 of 22 lists),
+# and what each code type may lose on top of it
+MIN_RECALL = {"flat": 1.0, "ivf_flat": 0.95, "hnsw": 0.99}
+QUANTIZATION_LOSS = {"fp16": 0.01, "int8": 0.02}
+BYTES_PER_DIMENSION = {"fp16": 2, "int8": 1}
+
+@pytest.fixture(scope="module")
+def corpus(dataset):
+    return [dict(problem) for problem in dataset[::10]]
+
+@pytest.fixture(scope="module")
+def recall_queries(dataset):
+    return [problem['problem'] for problem in dataset[5::40]] + ["fungal infections in rice",
+                                                                 "pest attack on tomato leaves"]
+
+def code_size(index):
+    """Bytes stored per vector by a scalar-quantized index"""
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    return index.code_size
+
+def recall_at_k(rag_system, queries, top_k):
+    """Share of the exact IndexFlatIP top_k rows that search_batch returns"""
+    exact = faiss.IndexFlatIP(rag_system.vector_index.d)
+    exact.add(np.array(rag_system.embeddings, dtype=np.float32))
+    _, expected = exact.search(rag_system.queries_to_vectors(queries), top_k)
+    rows = {chunk['chunk_id']: row for row, chunk in enumerate(rag_system.chunks_data)}
+    found = [{rows[chunk['chunk_id']] for chunk in results} & set(expected_rows)
+             for results, expected_rows in zip(rag_system.search_batch(queries, top_k), expected)]
+    return sum(len(hits) for hits in found) / (len(queries) * top_k)
+
+@pytest.mark.parametrize("quantization", ["fp16", "int8"])
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_quantized_recall(corpus, recall_queries, index_type, quantization):
+    rag_system = build_system(corpus, index_type, quantization=quantization)
+    index = rag_system.vector_index
+    assert rag_system.index_config["quantization"] == quantization
+    assert code_size(index) == index.d * BYTES_PER_DIMENSION[quantization]
+
+    recall = recall_at_k(rag_system, recall_queries, TOP_K)
+    assert recall >= MIN_RECALL[index_type] - QUANTIZATION_LOSS[quantization]
+
+@pytest.mark.parametrize("quantization", ["fp16", "int8"])
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_quantization_survives_save_and_load(problems, queries, tmp_path, index_type, quantization):
+    rag_system = build_system(problems, index_type, quantization=quantization)
+    expected = rag_system.search_batch(queries, 5)
+    save_dir = str(tmp_path / "rag_system")
+    rag_system.save_system(save_dir)
+
+    loaded = FarmerRAGSystem()
+    loaded.embedding_model = HashingEncoder()
+    loaded.load_system(save_dir)
+    assert loaded.index_config == rag_system.index_config
+    assert type(loaded.vector_index) is type(rag_system.vector_index)
+    assert code_size(loaded.vector_index) == code_size(rag_system.vector_index)
+    for results, expected_results in zip(loaded.search_batch(queries, 5), expected):
+        assert result_ids(results) == result_ids(expected_results)
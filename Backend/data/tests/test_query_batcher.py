@@ -0,0 +1,61 @@
+"""
+Micro-batched queries: a bad request only fails its own caller
+"""
+
+import threading
+import time
+
+from query_rag import QueryBatcher
+
+GOOD = [("pest in tomato", "en", 3, None), ("drainage rice", "en", 2, None), ("dry soil", "en", 3, {"crop": "wheat"})]
+BAD = ("bad", "en", 3, {"bogus": "x"})
+
+def test_bad_request_does_not_fail_its_batch(rag_interface):
+    expected = [rag_interface.query_rag(*request) for request in GOOD]
+    rag_interface.response_cache.clear()
+
+    responses = rag_interface.query_rag_batch([BAD] + GOOD)
+    assert "bogus" in responses[0]['error']
+    for response, expected_response in zip(responses[1:], expected):
+        assert 'error' not in response
+        assert response['response'] == expected_response['response']
+        assert response['sources'] == expected_response['sources']
+
+def test_failed_requests_are_not_cached(rag_interface):
+    rag_interface.query_rag_batch([BAD, GOOD[0]])
+    assert len(rag_interface.response_cache) == 1
+
+def test_unserializable_filters_only_fail_their_request(rag_interface):
+    responses = rag_interface.query_rag_batch([("bad", "en", 3, {"crop": {1, 2}}), GOOD[0]])
+    assert 'error' in responses[0]
+    assert 'error' not in responses[1]
+
+def test_batcher_isolates_failures_within_a_batch(rag_interface):
+    expected = [rag_interface.query_rag(*request)['response'] for request in GOOD]
+    rag_interface.response_cache.clear()
+
+    # Hold the scheduler on a first query so the others queue up into one batch
+    release = threading.Event()
+    batches = []
+    query_rag_batch = rag_interface.query_rag_batch
+
+    def recording_batch(requests):
+        if not batches:
+            release.wait(5)
+        batches.append(list(requests))
+        return query_rag_batch(requests)
+
+    rag_interface.query_rag_batch = recording_batch
+    batcher = QueryBatcher(rag_interface, window_ms=50, max_batch_size=8)
+    first = batcher.submit_future("stem borer", "en", 3, None)
+    while not batcher.queue.empty():
+        time.sleep(0.001)
+    futures = [batcher.submit_future(*BAD)] + [batcher.submit_future(*request) for request in GOOD]
+    release.set()
+
+    assert 'error' not in first.result(5)
+    responses = [future.result(5) for future in futures]
+    assert len(batches) == 2 and len(batches[1]) == 4
+    assert 'error' in responses[0]
+    assert [response['response'] for response in responses[1:]] == expected
+    assert all('error' not in response for response in responses[1:])
@@ -0,0 +1,88 @@
+"""
+Request validation in the NDJSON query server
+"""
+
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from query_rag import MAX_TOP_K, RAGQueryServer, parse_top_k
+
+@pytest.fixture
+def server(rag_interface):
+    return RAGQueryServer(rag_interface)
+
+def test_parse_top_k():
+    assert parse_top_k(None) == 3
+    assert parse_top_k(5) == 5
+    assert parse_top_k(10 ** 9) == MAX_TOP_K
+    for value in ("5", -1, 0, 2.5, True, [3]):
+        with pytest.raises(ValueError):
+            parse_top_k(value)
+
+@pytest.mark.parametrize("top_k", ["5", -1, 0, 2.5, True])
+def test_invalid_top_k_gets_its_own_error(server, top_k):
+    response = server.handle_request({"id": 7, "query": "stem borer", "topK": top_k})
+    assert response['id'] == 7
+    assert response['error'] == 'topK must be a positive integer'
+    assert server.batcher.stats()['queries'] == 0
+
+def test_huge_top_k_is_capped(server, rag_interface):
+    response = server.handle_request({"id": 1, "query": "stem borer", "topK": 10 ** 9})
+    assert 'error' not in response
+    expected = rag_interface.query_rag("stem borer", "en", MAX_TOP_K)
+    assert response['sources'] == expected['sources']
+
+def test_valid_requests_still_answered(server):
+    lines = [
+        json.dumps({"id": 1, "query": "stem borer", "topK": "3"}),
+        json.dumps({"id": 2, "query": "stem borer"}),
+        json.dumps({"id": 3, "query": "stem borer", "topK": 2, "filters": {"bogus": 1}})
+    ]
+    responses = [json.loads(server.handle_line(line)) for line in lines]
+    assert [response['id'] for response in responses] == [1, 2, 3]
+    assert 'error' in responses[0] and 'error' not in responses[1] and 'error' in responses[2]
+    assert responses[1]['sources']
+
+def test_pipelined_stdio_requests_share_a_batch(rag_interface):
+    queries = ["stem borer", "late blight in potato", "dry soil", "yellow leaves in maize"]
+    expected = [rag_interface.query_rag(query, "en", 3)['response'] for query in queries]
+    rag_interface.response_cache.clear()
+
+    # Hold the scheduler on a first query until every stdio line has been read
+    release = threading.Event()
+    batches = []
+    query_rag_batch = rag_interface.query_rag_batch
+
+    def recording_batch(requests):
+        if not batches:
+            release.wait(2)
+        batches.append(len(requests))
+        return query_rag_batch(requests)
+
+    rag_interface.query_rag_batch = recording_batch
+    server = RAGQueryServer(rag_interface, batch_window_ms=50, max_batch_size=8)
+    first = server.batcher.submit_future("drainage in rice", "en", 3, None)
+    while not server.batcher.queue.empty():
+        time.sleep(0.001)
+
+    def instream():
+        yield from (json.dumps({"id": i, "query": query}) + "\n" for i, query in enumerate(queries))
+        yield json.dumps({"id": "h", "type": "health"}) + "\n"
+        release.set()
+
+    outstream = io.StringIO()
+    server.serve_stdio(instream(), outstream)
+    first.result(5)
+
+    assert batches == [1, len(queries)]
+    ready, *lines = [json.loads(line) for line in outstream.getvalue().splitlines()]
+    assert ready['type'] == 'ready'
+    responses = {response['id']: response for response in lines}
+    assert sorted(responses, key=str) == sorted([*range(len(queries)), "h"], key=str)
+    # The health request did not wait behind the queued queries
+    assert lines[0]['id'] == "h"
+    assert [responses[i]['response'] for i in range(len(queries))] == expected
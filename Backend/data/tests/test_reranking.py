@@ -0,0 +1,68 @@
+"""
+Second-stage reranking and its per-query time budget
+"""
+
+import time
+
+import numpy as np
+
+import farmer_rag_system
+from conftest import result_ids
+
+def first_stage(rag_system, queries, top_k):
+    reranker, rag_system.reranker = rag_system.reranker, None
+    try:
+        return rag_system.search_batch(queries, top_k)
+    finally:
+        rag_system.reranker = reranker
+
+def test_reranking_reorders_candidates(rag_system, queries):
+    rag_system.set_reranker("lexical", candidates=20, time_budget_ms=5000)
+    candidates = first_stage(rag_system, queries, 20)
+    reranked = rag_system.search_batch(queries, 5)
+    assert rag_system.rerank_stats == {"reranked": len(queries), "skipped": 0}
+
+    changed = 0
+    for query, results, query_candidates in zip(queries, reranked, candidates):
+        scores = rag_system.reranker.score(query, [chunk['text'] for chunk in query_candidates])
+        expected = [query_candidates[position]['chunk_id'] for position in np.argsort(-scores, kind='stable')[:5]]
+        assert [chunk['chunk_id'] for chunk in results] == expected
+        assert [chunk['rank'] for chunk in results] == [1, 2, 3, 4, 5]
+        assert [chunk['rerank_score'] for chunk in results] == sorted(
+            (chunk['rerank_score'] for chunk in results), reverse=True)
+        changed += expected != [chunk['chunk_id'] for chunk in query_candidates[:5]]
+    assert changed
+
+def test_exhausted_budget_keeps_first_stage_order(rag_system, queries):
+    expected = first_stage(rag_system, queries, 5)
+    rag_system.set_reranker("lexical", candidates=20, time_budget_ms=1e-9)
+    results = rag_system.search_batch(queries, 5)
+    assert rag_system.rerank_stats == {"reranked": 0, "skipped": len(queries)}
+    for query_results, query_expected in zip(results, expected):
+        assert result_ids(query_results) == result_ids(query_expected)
+        assert all('rerank_score' not in chunk for chunk in query_results)
+
+def test_budget_starts_after_retrieval(rag_system, queries):
+    rag_system.set_reranker("lexical", candidates=20, time_budget_ms=100)
+    retrieve_batch = rag_system._retrieve_batch
+
+    def slow_retrieve_batch(*args):
+        time.sleep(0.3)
+        return retrieve_batch(*args)
+
+    rag_system._retrieve_batch = slow_retrieve_batch
+    rag_system.search_batch(queries, 5)
+    assert rag_system.rerank_stats == {"reranked": len(queries), "skipped": 0}
+
+def test_bm25_index_is_built_outside_the_budget(rag_system, queries, monkeypatch):
+    rag_system.set_reranker("lexical", candidates=20, time_budget_ms=100)
+    assert rag_system.reranker.lexical_index is rag_system._lexical_index is not None
+
+    # An index edit drops the BM25 index; a slow rebuild must not eat the rerank budget
+    build = farmer_rag_system.BM25Index.build
+    monkeypatch.setattr(farmer_rag_system.BM25Index, "build",
+                        staticmethod(lambda texts: time.sleep(0.3) or build(texts)))
+    rag_system._reset_lexical_index()
+    rag_system.search_batch(queries, 5)
+    assert rag_system.rerank_stats == {"reranked": len(queries), "skipped": 0}
+    assert rag_system.reranker.lexical_index is rag_system._lexical_index is not None
@@ -0,0 +1,53 @@
+"""
+Batched search returns what one search per query returns
+"""
+
+import numpy as np
+import pytest
+
+from conftest import build_system, result_ids
+
+def test_search_batch_matches_single_queries(rag_system, queries):
+    batch = rag_system.search_batch(queries, top_k=5)
+    assert len(batch) == len(queries)
+    for query, results in zip(queries, batch):
+        single = rag_system.search_similar_chunks(query, top_k=5)
+        assert [chunk_id for chunk_id, _ in result_ids(results)] == [chunk_id for chunk_id, _ in result_ids(single)]
+        assert [chunk['similarity_score'] for chunk in results] == pytest.approx(
+            [chunk['similarity_score'] for chunk in single], abs=1e-5)
+
+def test_search_batch_with_filters_matches_single_queries(rag_system, queries):
+    filters = {"category": ["pest_control", "soil_issues"]}
+    batch = rag_system.search_batch(queries, top_k=4, filters=filters)
+    for query, results in zip(queries, batch):
+        assert result_ids(results) == result_ids(rag_system.search_similar_chunks(query, 4, filters))
+        assert all(chunk['category'] in filters["category"] for chunk in results)
+
+def test_generate_responses_matches_generate_response(rag_system, queries):
+    responses = rag_system.generate_responses(queries, top_k=3)
+    for query, response in zip(queries, responses):
+        single = rag_system.generate_response(query, top_k=3)
+        assert response['response'] == single['response']
+        assert response['confidence'] == pytest.approx(single['confidence'])
+        assert [source['problem_id'] for source in response['sources']] == \
+            [source['problem_id'] for source in single['sources']]
+
+def test_empty_batch(rag_system):
+    assert rag_system.search_batch([], top_k=3) == []
+
+def test_padding_rows_are_skipped(problems):
+    # top_k beyond the corpus size makes FAISS pad every result row with -1
+    rag_system = build_system(problems[:4])
+    num_chunks = len(rag_system.chunks_data)
+    for results in rag_system.search_batch(["rice disease", "water logging"], top_k=num_chunks + 10):
+        chunk_ids = [chunk['chunk_id'] for chunk in results]
+        assert len(chunk_ids) == num_chunks
+        assert sorted(chunk_ids) == sorted(chunk['chunk_id'] for chunk in rag_system.chunks_data)
+        assert [chunk['rank'] for chunk in results] == list(range(1, num_chunks + 1))
+
+def test_collect_chunks_skips_padding(rag_system):
+    similarities = np.array([0.9, 0.5, -np.inf, -np.inf], dtype=np.float32)
+    indices = np.array([3, 1, -1, -1], dtype=np.int64)
+    results = rag_system._collect_chunks(similarities, indices)
+    assert [chunk['chunk_id'] for chunk in results] == [rag_system.chunks_data[3]['chunk_id'],
+                                                         rag_system.chunks_data[1]['chunk_id']]
@@ -0,0 +1,115 @@
+"""
+Shard servers on localhost answer like the local sharded index
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import HashingEncoder, build_system, result_ids
+from farmer_rag_system import FarmerRAGSystem
+from shard_server import RemoteShardedIndex, ShardServer
+
+@pytest.fixture
+def saved_dir(problems, tmp_path):
+    save_dir = str(tmp_path / "rag_system")
+    build_system(problems, num_shards=2).save_system(save_dir)
+    return save_dir
+
+def load_saved(saved_dir):
+    rag_system = FarmerRAGSystem()
+    rag_system.embedding_model = HashingEncoder()
+    rag_system.load_system(saved_dir)
+    return rag_system
+
+@pytest.fixture
+def local_system(saved_dir):
+    return load_saved(saved_dir)
+
+@pytest.fixture
+def shard_servers(saved_dir):
+    """Both shards served on free localhost ports: (ShardServer, 'host:port') pairs"""
+    started = []
+    for shard in range(2):
+        shard_server = ShardServer(saved_dir, shard)
+        server = shard_server.create_server('127.0.0.1', 0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        host, port = server.server_address[:2]
+        started.append((shard_server, server, f"{host}:{port}"))
+    yield [(shard_server, address) for shard_server, _, address in started]
+    for _, server, _ in started:
+        server.shutdown()
+        server.server_close()
+
+def remote_system(saved_dir, servers, timeout_ms=2000):
+    rag_system = load_saved(saved_dir)
+    coordinator = RemoteShardedIndex.from_system(rag_system, servers, timeout_ms)
+    rag_system.vector_index = coordinator
+    return rag_system, coordinator
+
+def test_remote_search_matches_local(saved_dir, local_system, shard_servers, queries):
+    rag_system, coordinator = remote_system(saved_dir, [address for _, address in shard_servers])
+    vectors = local_system.queries_to_vectors(queries)
+
+    # The very first search finds the servers itself; load() is never called
+    similarities, indices = coordinator.search(vectors, 5)
+    assert coordinator.pop_missing_shards() == []
+    expected_similarities, expected_indices = local_system.vector_index.search(vectors, 5)
+    assert indices.tolist() == expected_indices.tolist()
+    assert np.allclose(similarities, expected_similarities, atol=1e-5)
+
+    for filters in [None, {"crop": "rice"}]:
+        for results, expected in zip(rag_system.search_batch(queries, 5, filters),
+                                     local_system.search_batch(queries, 5, filters)):
+            assert result_ids(results) == result_ids(expected)
+    assert coordinator.stats()["partial"] == 0
+    coordinator.close()
+
+def test_interface_discovers_servers_before_the_first_query(saved_dir, local_system, shard_servers, rag_interface):
+    rag_interface.rag_system = load_saved(saved_dir)
+    rag_interface._connect_shard_servers(",".join(address for _, address in shard_servers), 2000)
+    assert sorted(rag_interface.shard_coordinator.replicas) == [0, 1]
+
+    # The first query of a one-shot run is answered from every shard
+    result = rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    assert 'missing_shards' not in result
+    rag_interface.shard_coordinator = None
+    rag_interface.rag_system = local_system
+    rag_interface.response_cache.clear()
+    expected = rag_interface.query_rag("stem borer in sugarcane", "en", 3)
+    assert result['sources'] and result['sources'] == expected['sources']
+    assert result['response'] == expected['response']
+
+def test_slow_shard_times_out_and_the_rest_answers(saved_dir, local_system, shard_servers, queries):
+    slow_server, _ = shard_servers[1]
+    search = slow_server.search
+    slow_server.search = lambda request_data: time.sleep(0.5) or search(request_data)
+
+    rag_system, coordinator = remote_system(saved_dir, [address for _, address in shard_servers], timeout_ms=150)
+    coordinator.load()
+    vectors = local_system.queries_to_vectors(queries)
+    similarities, indices = coordinator.search(vectors, 5)
+    assert coordinator.pop_missing_shards() == [1]
+    assert coordinator.stats()["timeouts"] == 1 and coordinator.stats()["partial"] == 1
+
+    # What is left is the top-k of shard 0 alone
+    local = local_system.vector_index
+    expected_similarities, expected_ids = local.shard(0).search(vectors, 5)
+    assert indices.tolist() == local.shard_rows[0][expected_ids].tolist()
+    assert np.allclose(similarities, expected_similarities, atol=1e-5)
+    coordinator.close()
+
+def test_unreachable_server_leaves_its_shard_out(saved_dir, shard_servers, queries):
+    _, address = shard_servers[0]
+    rag_system, coordinator = remote_system(saved_dir, [address, "127.0.0.1:1"], timeout_ms=300)
+    coordinator.load()
+    assert sorted(coordinator.replicas) == [0]
+
+    batch = rag_system.search_batch(queries, 5)
+    assert coordinator.pop_missing_shards() == [1]
+    shard_zero = set(rag_system.vector_index.shard_rows[0].tolist())
+    rows = {chunk['chunk_id'] for results in batch for chunk in results}
+    assert rows and rows <= {rag_system.chunks_data[row]['chunk_id'] for row in shard_zero}
+    coordinator.close()
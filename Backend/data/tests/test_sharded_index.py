@@ -0,0 +1,61 @@
+"""
+Sharded indexes answer like the unsharded index
+"""
+
+import pytest
+
+from conftest import HashingEncoder, assert_same_ranking, build_system
+from farmer_rag_system import FarmerRAGSystem
+from sharded_index import ShardedIndex, partition_rows
+
+FILTERS = [None, {"crop": "rice"}, {"category": ["pest_control", "market_economic"]}, {"season": "rabi"}]
+
+@pytest.fixture
+def unsharded(problems):
+    return build_system(problems)
+
+@pytest.mark.parametrize("partition", ["hash", "crop", "category"])
+def test_sharded_search_matches_unsharded(problems, unsharded, queries, partition):
+    sharded = build_system(problems, num_shards=3, partition=partition)
+    assert isinstance(sharded.vector_index, ShardedIndex)
+    assert sharded.vector_index.ntotal == unsharded.vector_index.ntotal
+
+    for filters in FILTERS:
+        batch = sharded.search_batch(queries, 8, filters)
+        expected = unsharded.search_batch(queries, 8, filters)
+        for results, expected_results in zip(batch, expected):
+            assert_same_ranking(results, expected_results)
+
+def test_sharded_search_skips_removed_problems(problems, unsharded, queries):
+    sharded = build_system(problems, num_shards=4)
+    for rag_system in (sharded, unsharded):
+        for problem in problems[:20]:
+            rag_system.remove_problem(problem['id'])
+
+    removed = {problem['id'] for problem in problems[:20]}
+    for results, expected_results in zip(sharded.search_batch(queries, 8), unsharded.search_batch(queries, 8)):
+        assert_same_ranking(results, expected_results)
+        assert not removed & {chunk['original_id'] for chunk in results}
+
+def test_saved_sharded_system_matches_unsharded(problems, unsharded, queries, tmp_path):
+    save_dir = str(tmp_path / "rag_system")
+    build_system(problems, num_shards=3).save_system(save_dir)
+
+    loaded = FarmerRAGSystem()
+    loaded.embedding_model = HashingEncoder()
+    loaded.load_system(save_dir)
+    assert isinstance(loaded.vector_index, ShardedIndex)
+    for results, expected_results in zip(loaded.search_batch(queries, 8), unsharded.search_batch(queries, 8)):
+        assert_same_ranking(results, expected_results)
+
+def test_partitions_cover_every_row_once(unsharded):
+    num_rows = len(unsharded.chunks_data)
+    for partition in ("hash", "crop", "category"):
+        shards = partition_rows(unsharded.chunks_data, 3, partition)
+        rows = sorted(row for shard in shards for row in shard.tolist())
+        assert rows == list(range(num_rows))
+    crop_shards = partition_rows(unsharded.chunks_data, 3, "crop")
+    shard_crops = [{unsharded.chunks_data[row]['crop'] for row in shard} for shard in crop_shards]
+    for a in range(len(shard_crops)):
+        for b in range(a + 1, len(shard_crops)):
+            assert not shard_crops[a] & shard_crops[b]
@@ -0,0 +1,85 @@
+"""
+Token-budget chunking with the model tokenizer's offset mapping
+"""
+
+import pytest
+
+from conftest import HashingEncoder
+from farmer_rag_system import FarmerRAGSystem
+from test_chunking import dataset_texts, random_texts
+
+@pytest.fixture
+def token_system():
+    rag_system = FarmerRAGSystem()
+    rag_system.embedding_model = HashingEncoder()
+    return rag_system
+
+def num_tokens(rag_system, text):
+    return len(rag_system.embedding_model.tokenizer(text, add_special_tokens=False)['input_ids'])
+
+def chunk_spans(text, chunks):
+    """
+    (start, end) of every chunk in text: the first occurrence that starts after the
+    previous chunk's start and ends after its end (repeated sentences occur more than once)
+    """
+    spans = []
+    start, end = -1, 0
+    for chunk in chunks:
+        start = text.index(chunk, start + 1)
+        while start + len(chunk) <= end:
+            start = text.index(chunk, start + 1)
+        end = start + len(chunk)
+        spans.append((start, end))
+    return spans
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(16, 4), (32, 8), (50, 0), (126, 32)])
+def test_chunks_fit_the_budget_and_cover_the_text(token_system, dataset, max_tokens, overlap_tokens):
+    for text in random_texts(200) + dataset_texts(dataset):
+        chunks = token_system.chunk_text_tokens(text, max_tokens, overlap_tokens)
+        assert chunks
+        assert all(num_tokens(token_system, chunk) <= max_tokens for chunk in chunks)
+
+        spans = chunk_spans(text, chunks)
+        covered = set()
+        for start, end in spans:
+            covered.update(range(start, end))
+        assert all(position in covered for position, char in enumerate(text) if not char.isspace())
+
+        for (previous_start, previous_end), (start, end) in zip(spans, spans[1:]):
+            # Every chunk reaches past the previous one and starts on a word
+            assert start > previous_start and end > previous_end
+            assert text[start - 1].isspace()
+            if overlap_tokens == 0:
+                assert start >= previous_end
+            else:
+                assert num_tokens(token_system, text[start:previous_end]) <= overlap_tokens
+
+def test_chunks_end_on_sentences_when_they_fit(token_system):
+    sentence = "Drain the field before sowing wheat."
+    text = " ".join([sentence] * 12)
+    chunks = token_system.chunk_text_tokens(text, 40, 0)
+    assert len(chunks) > 1
+    assert all(chunk.endswith(".") for chunk in chunks)
+    assert "".join(chunk.replace(" ", "") for chunk in chunks) == text.replace(" ", "")
+
+def test_text_within_budget_is_one_chunk(token_system):
+    assert token_system.chunk_text_tokens("  Drain the field.  ", 16) == ["Drain the field."]
+    assert token_system.chunk_text_tokens("   ", 16) == []
+
+def test_word_longer_than_budget_is_split(token_system):
+    text = "intro " + "x" * 100 + " outro"
+    chunks = token_system.chunk_text_tokens(text, 8, 2)
+    assert all(num_tokens(token_system, chunk) <= 8 for chunk in chunks)
+    assert "".join(chunks).count("x") >= 100
+    assert chunks[-1].endswith("outro")
+
+def test_token_mode_chunking_of_problems(token_system, problems):
+    token_system.set_chunk_mode("tokens", 24, 6)
+    chunks = token_system.process_and_chunk_data(problems)
+    assert len(chunks) > len(problems)
+    assert all(num_tokens(token_system, chunk['text']) <= 24 for chunk in chunks)
+
+    # Without a budget the model's own limit is used (max sequence length minus special tokens)
+    token_system.set_chunk_mode("tokens")
+    token_system.process_and_chunk_data(problems)
+    assert token_system.chunk_tokens == 126
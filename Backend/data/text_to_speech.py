@@ -332,6 +332,34 @@ class TextToSpeechConverter:
             'audioPath': ''
         }
 
+def handle_request(request_data, converter=None):
+    """
+    Synthesize the text of one request payload ({"text", "language"});
+    converter lets a long-running service reuse one TextToSpeechConverter
+    """
+    text = request_data.get('text', '')
+    language = request_data.get('language', 'en')
+    
+    if not text or not text.strip():
+        return {
+            'success': False,
+            'error': 'No text provided',
+            'audioUrl': '',
+            'audioPath': ''
+        }
+    
+    # Initialize converter and process text
+    converter = converter or TextToSpeechConverter()
+    result = converter.convert_text_to_speech(text, language)
+    
+    # Add processing metadata
+    if result.get('success'):
+        result['processed_at'] = datetime.now().isoformat()
+        result['text_length'] = len(text)
+        result['word_count'] = len(text.split())
+    
+    return result
+
 def main():
     """
     Main function to process text-to-speech requests
@@ -341,27 +369,7 @@ def main():
         input_data = sys.stdin.read()
         request_data = json.loads(input_data)
         
-        text = request_data.get('text', '')
-        language = request_data.get('language', 'en')
-        
-        if not text or not text.strip():
-            print(json.dumps({
-                'success': False,
-                'error': 'No text provided',
-                'audioUrl': '',
-                'audioPath': ''
-            }))
-            return
-        
-        # Initialize converter and process text
-        converter = TextToSpeechConverter()
-        result = converter.convert_text_to_speech(text, language)
-        
-        # Add processing metadata
-        if result.get('success'):
-            result['processed_at'] = datetime.now().isoformat()
-            result['text_length'] = len(text)
-            result['word_count'] = len(text.split())
+        result = handle_request(request_data)
         
         # Output result as JSON
         print(json.dumps(result, ensure_ascii=False))
@@ -297,7 +297,7 @@ router.get('/status', (req, res) => {
             const ragFiles = fs.readdirSync(ragSystemPath);
             status.rag_files = ragFiles;
             status.vector_index_exists = ragFiles.includes('vector_index.faiss');
-            status.chunks_data_exists = ragFiles.includes('chunks_data.json');
+            status.chunks_data_exists = ragFiles.includes('chunks.bin') || ragFiles.includes('chunks_data.json');
         }
 
         res.json({